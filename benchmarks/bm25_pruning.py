@@ -0,0 +1,61 @@
+"""
+Benchmarks BlockMaxBM25 pruning against exhaustive BM25 scoring.
+
+Run from the repository root:
+    python -m benchmarks.bm25_pruning --docs 1000000 --queries 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from rag_agent.vector_search.bm25_pruning import BlockMaxBM25
+from rag_agent.vector_search.metrics import LatencyHistogram
+from .synthetic_bm25 import build_zipf_index, sample_queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--vocab", type=int, default=100_000)
+    parser.add_argument("--doc-length", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--terms-per-query", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--block-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        index = build_zipf_index(os.path.join(tmp_dir, "bm25"), args.docs, args.vocab, args.doc_length)
+        print(f"Built {args.docs} documents, {len(index.postings_docs)} postings in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        evaluator = BlockMaxBM25(index, block_size=args.block_size)
+        print(f"Computed block maxima in {time.perf_counter() - start:.2f}s")
+
+        queries = sample_queries(args.vocab, args.queries, args.terms_per_query)
+        latencies = {"exhaustive": LatencyHistogram(), "block_max": LatencyHistogram()}
+        mismatches = 0
+        for term_ids in queries:
+            start = time.perf_counter()
+            expected_docs, expected_scores = index.top_k(term_ids, args.top_k)
+            latencies["exhaustive"].record(time.perf_counter() - start)
+            start = time.perf_counter()
+            docs, scores = evaluator.top_k(term_ids, args.top_k)
+            latencies["block_max"].record(time.perf_counter() - start)
+            if not np.allclose(np.sort(scores), np.sort(expected_scores), rtol=1e-5):
+                mismatches += 1
+
+        for name, histogram in latencies.items():
+            print(f"{name:>10}: p50 {histogram.quantile(0.5) * 1e3:8.3f} ms  p99 {histogram.quantile(0.99) * 1e3:8.3f} ms")
+        print(f"   speedup: {latencies['exhaustive'].total / latencies['block_max'].total:.1f}x (total time)")
+        stats = evaluator.stats()
+        print(f"   skipped: {stats['skipped_postings_ratio']:.1%} of the query term postings, "
+              f"{stats['candidates_pruned']} of {stats['candidates_pruned'] + stats['candidates_scored']} "
+              f"candidates pruned by block maxima")
+        print(f"mismatches: {mismatches} of {len(queries)} queries")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmarks ShardedBM25 worker processes against single-process BM25 scoring.
+
+Run from the repository root:
+    python -m benchmarks.bm25_sharding --docs 1000000 --shards 1 2 4 8
+
+Sharding only pays off with at least as many idle cores as shards; the core
+count of the machine is printed with the results.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from rag_agent.vector_search.bm25_shards import ShardedBM25
+from rag_agent.vector_search.metrics import LatencyHistogram
+from .synthetic_bm25 import build_zipf_index, sample_queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--vocab", type=int, default=100_000)
+    parser.add_argument("--doc-length", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = build_zipf_index(os.path.join(tmp_dir, "bm25"), args.docs, args.vocab, args.doc_length)
+        print(f"{args.docs} documents, {len(index.postings_docs)} postings, {os.cpu_count()} cores")
+        queries = sample_queries(args.vocab, args.queries)
+
+        baseline = LatencyHistogram()
+        expected = []
+        for term_ids in queries:
+            start = time.perf_counter()
+            expected.append(index.top_k(term_ids, args.top_k))
+            baseline.record(time.perf_counter() - start)
+        print(f"{'in-process':>10}: p50 {baseline.quantile(0.5) * 1e3:8.3f} ms  p99 {baseline.quantile(0.99) * 1e3:8.3f} ms")
+
+        for num_shards in args.shards:
+            shards = ShardedBM25(index, num_shards=num_shards)
+            histogram = LatencyHistogram()
+            mismatches = 0
+            for term_ids, (_, expected_scores) in zip(queries, expected):
+                start = time.perf_counter()
+                _, scores = shards.top_k(term_ids, args.top_k)
+                histogram.record(time.perf_counter() - start)
+                # Documents tied at the k-th score may differ, the scores may not
+                mismatches += not np.array_equal(scores, expected_scores)
+            shards.close()
+            print(f"{num_shards:>3} shards: p50 {histogram.quantile(0.5) * 1e3:8.3f} ms  "
+                  f"p99 {histogram.quantile(0.99) * 1e3:8.3f} ms  "
+                  f"speedup {baseline.total / histogram.total:.2f}x  mismatches {mismatches}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
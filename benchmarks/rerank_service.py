@@ -0,0 +1,94 @@
+"""
+Compares concurrent reranking with and without the micro-batching rerank service.
+
+Run from the repository root:
+    python -m benchmarks.rerank_service
+    python -m benchmarks.rerank_service --random-model   # offline, MiniLM-L6 shape
+
+Every client thread reranks small candidate sets one request at a time, once by
+calling a shared Reranker under a lock and once through a RerankServer on a UNIX
+socket, which merges the requests arriving within --max-wait-ms into one batch.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import torch
+from rag_agent.vector_search.metrics import LatencyHistogram
+from rag_agent.vector_search.rerank_service import RerankServer, remote_reranker
+from rag_agent.vector_search.reranker import Reranker
+from .synthetic_cross_encoder import build_random_cross_encoder, mixed_length_pairs
+
+
+def run(reranker: Reranker, workloads, lock=None) -> tuple:
+    histogram = LatencyHistogram()
+    scores = [None] * len(workloads)
+
+    def client(i):
+        scores[i] = []
+        for query, texts in workloads[i]:
+            start = time.perf_counter()
+            if lock is None:
+                scores[i].append(reranker._predict([[query, text] for text in texts]))
+            else:
+                with lock:
+                    scores[i].append(reranker._predict([[query, text] for text in texts]))
+            histogram.record(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(workloads))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    num_pairs = sum(len(texts) for workload in workloads for _, texts in workload)
+    return num_pairs / elapsed, histogram, np.concatenate([s for client_scores in scores for s in client_scores])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--random-model", action="store_true", help="use random weights instead of --model")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=8, help="requests per client")
+    parser.add_argument("--candidates", type=int, default=4, help="candidates per request")
+    parser.add_argument("--max-words", type=int, default=60)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = build_random_cross_encoder(os.path.join(tmp_dir, "model")) if args.random_model else args.model
+        reranker = Reranker(model)
+        workloads = [
+            mixed_length_pairs(args.requests, args.candidates, max_words=args.max_words, seed=seed)
+            for seed in range(args.clients)
+        ]
+        reranker._predict([[workloads[0][0][0], text] for text in workloads[0][0][1]])
+        print(f"{model}: {args.clients} clients x {args.requests} requests x {args.candidates} candidates, "
+              f"{torch.get_num_threads()} threads")
+
+        server = RerankServer(reranker, os.path.join(tmp_dir, "rerank.sock"), max_wait_ms=args.max_wait_ms).start()
+        try:
+            # A shared model needs a lock: its fast tokenizer fails when called from several threads
+            results = {
+                "direct": run(reranker, workloads, lock=threading.Lock()),
+                "service": run(remote_reranker(server.socket_path), workloads),
+            }
+        finally:
+            server.close()
+        for name, (rate, histogram, _) in results.items():
+            print(f"{name:>8}: {rate:7.1f} pairs/s  p50 {histogram.quantile(0.5) * 1e3:7.1f} ms  "
+                  f"p99 {histogram.quantile(0.99) * 1e3:7.1f} ms per request")
+        stats = server.batcher.stats()
+        print(f"          {stats['batches']} service batches, {stats['mean_requests_per_batch']:.1f} requests per batch, "
+              f"max |score delta| {np.abs(results['direct'][2] - results['service'][2]).max():.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares the latency and scores of the PyTorch, ONNX and ONNX int8 Reranker backends.
+
+Run from the repository root:
+    python -m benchmarks.reranker_backends
+    python -m benchmarks.reranker_backends --random-model   # offline, MiniLM-L6 shape
+
+Scores are compared with the PyTorch backend on the benchmark pairs; the rank
+correlation is computed per query, which is what reranking depends on.
+"""
+import argparse
+import os
+import tempfile
+import time
+import torch
+from rag_agent.vector_search.metrics import LatencyHistogram
+from rag_agent.vector_search.onnx_cross_encoder import score_deltas
+from rag_agent.vector_search.reranker import Reranker
+from .synthetic_cross_encoder import build_random_cross_encoder, mixed_length_pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--random-model", action="store_true", help="use random weights instead of --model")
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--candidates", type=int, default=32)
+    parser.add_argument("--max-words", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=None, help="torch and ONNX Runtime intra-op threads")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = build_random_cross_encoder(os.path.join(tmp_dir, "model")) if args.random_model else args.model
+        onnx_path = os.path.join(tmp_dir, "onnx")
+        start = time.perf_counter()
+        rerankers = {"torch": Reranker(model)}
+        for backend in ("onnx", "onnx-int8"):
+            rerankers[backend] = Reranker(model, backend=backend, onnx_path=onnx_path, num_threads=args.threads)
+        print(f"{model}: loaded and exported in {time.perf_counter() - start:.1f}s, {torch.get_num_threads()} threads")
+
+        workload = mixed_length_pairs(args.queries, args.candidates, max_words=args.max_words)
+        scores = {}
+        for backend, reranker in rerankers.items():
+            reranker._predict([[workload[0][0], text] for text in workload[0][1][:4]])
+            histogram = LatencyHistogram()
+            scores[backend] = []
+            for query, texts in workload:
+                start = time.perf_counter()
+                scores[backend].append(reranker._predict([[query, text] for text in texts]))
+                histogram.record(time.perf_counter() - start)
+            line = (f"{backend:>9}: p50 {histogram.quantile(0.5) * 1e3:8.1f} ms  "
+                    f"p99 {histogram.quantile(0.99) * 1e3:8.1f} ms per query of {args.candidates} candidates")
+            if backend != "torch":
+                per_query = [score_deltas(ref, own) for ref, own in zip(scores["torch"], scores[backend])]
+                line += (f"  max |delta| {max(d['max_abs_delta'] for d in per_query):.1e}"
+                         f"  min rank corr {min(d['rank_correlation'] for d in per_query):.3f}")
+            print(line)
+        sizes = {name: os.path.getsize(os.path.join(onnx_path, name)) / 1e6 for name in sorted(os.listdir(onnx_path))
+                 if name.endswith(".onnx")}
+        print("   models: " + ", ".join(f"{name} {size:.0f} MB" for name, size in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares reranking on the calling thread with the process-pool execution mode.
+
+Run from the repository root:
+    python -m benchmarks.reranker_process_pool --workers 4
+    python -m benchmarks.reranker_process_pool --random-model   # offline, MiniLM-L6 shape
+
+While the queries are reranked, a second thread runs pure-Python work standing
+in for retrieval and request handling; its throughput shows how much of the
+process the reranker leaves to the rest of a threaded server.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import torch
+from rag_agent.vector_search.model_registry import ModelRegistry
+from rag_agent.vector_search.reranker import Reranker
+from .synthetic_cross_encoder import build_random_cross_encoder, mixed_length_pairs
+
+
+def run(reranker: Reranker, workload, busy: bool) -> tuple:
+    stop = threading.Event()
+    iterations = [0]
+
+    def request_handling():
+        while not stop.is_set():
+            sum(i * i for i in range(1000))
+            iterations[0] += 1
+
+    thread = threading.Thread(target=request_handling)
+    if busy:
+        thread.start()
+    start = time.perf_counter()
+    scores = [reranker._predict([[query, text] for text in texts]) for query, texts in workload]
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if busy:
+        thread.join()
+    num_pairs = sum(len(texts) for _, texts in workload)
+    return num_pairs / elapsed, iterations[0] / elapsed, np.concatenate(scores)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--random-model", action="store_true", help="use random weights instead of --model")
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = build_random_cross_encoder(os.path.join(tmp_dir, "model")) if args.random_model else args.model
+        workload = mixed_length_pairs(args.queries, args.candidates)
+        print(f"{model}: {args.queries} queries x {args.candidates} candidates, {os.cpu_count()} cores")
+
+        # The constructor forks the pool before the calling thread's reranker has run any inference
+        pooled = Reranker(model, num_workers=args.workers, registry=ModelRegistry())
+        pool = pooled.model
+        local = Reranker(model, registry=ModelRegistry())
+        try:
+            results = {}
+            for name, reranker in (("thread", local), (f"{args.workers} procs", pooled)):
+                reranker._predict([[workload[0][0], text] for text in workload[0][1][:8]])
+                idle_rate, _, scores = run(reranker, workload, busy=False)
+                busy_rate, other_rate, _ = run(reranker, workload, busy=True)
+                results[name] = scores
+                print(f"{name:>9}: idle {idle_rate:7.1f} pairs/s  with a busy thread {busy_rate:7.1f} pairs/s, "
+                      f"busy thread {other_rate:8.1f} iterations/s")
+        finally:
+            pool.close()
+        local_scores, pooled_scores = results.values()
+        print(f"           max |score delta| {np.abs(local_scores - pooled_scores).max():.1e}, "
+              f"torch threads {torch.get_num_threads()}")
+
+
+if __name__ == "__main__":
+    main()
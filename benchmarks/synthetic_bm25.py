@@ -0,0 +1,58 @@
+"""Synthetic BM25 indexes with a Zipfian vocabulary for the lexical benchmarks."""
+from typing import List
+import numpy as np
+from rag_agent.vector_search.bm25_index import MmapBM25Index, write_index
+
+
+def build_zipf_index(
+    path: str,
+    num_docs: int,
+    vocab_size: int,
+    doc_length: int,
+    exponent: float = 1.1,
+    seed: int = 0
+) -> MmapBM25Index:
+    """
+    Writes an index of random documents whose terms follow a Zipf distribution.
+
+    The postings are generated directly, without tokenizing any text, so indexes
+    with millions of documents are built in seconds. Document lengths vary
+    uniformly between half and one and a half times `doc_length`.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = 1.0 / np.arange(1, vocab_size + 1) ** exponent
+    probabilities /= probabilities.sum()
+    doc_lengths = rng.integers(doc_length // 2, doc_length * 3 // 2 + 1, size=num_docs)
+    token_terms = rng.choice(vocab_size, size=int(doc_lengths.sum()), p=probabilities)
+    token_docs = np.repeat(np.arange(num_docs, dtype=np.int64), doc_lengths)
+
+    pairs, term_freqs = np.unique(token_terms.astype(np.int64) * num_docs + token_docs, return_counts=True)
+    postings_indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs // num_docs, minlength=vocab_size), out=postings_indptr[1:])
+    # Zero-padded names keep the term dictionary sorted in term ID order
+    width = len(str(vocab_size))
+    write_index(
+        path,
+        terms=[f"t{term_id:0{width}d}".encode("utf-8") for term_id in range(vocab_size)],
+        postings_indptr=postings_indptr,
+        postings_docs=pairs % num_docs,
+        postings_tf=term_freqs,
+        doc_lengths=doc_lengths,
+        corpus_lines=[b'{"text": ""}\n'] * num_docs,
+        k1=1.5,
+        b=0.75,
+        language="en",
+        stemmer_language=None,
+        token_pattern=r"(?u)\b\w\w+\b",
+    )
+    return MmapBM25Index(path)
+
+
+def sample_queries(vocab_size: int, num_queries: int, terms_per_query: int = 3, seed: int = 1) -> List[List[int]]:
+    """Samples queries mixing one frequent term with rarer ones, like keyword searches."""
+    rng = np.random.default_rng(seed)
+    frequent = max(1, vocab_size // 1000)
+    return [
+        [int(rng.integers(0, frequent))] + rng.integers(frequent, vocab_size // 10, size=terms_per_query - 1).tolist()
+        for _ in range(num_queries)
+    ]
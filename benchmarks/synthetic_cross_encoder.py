@@ -0,0 +1,50 @@
+"""Randomly initialized cross-encoders and mixed-length passages for the reranker benchmarks."""
+from typing import List, Tuple
+import os
+import numpy as np
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+# The shape of cross-encoder/ms-marco-MiniLM-L-6-v2
+MINILM_L6 = dict(hidden_size=384, num_hidden_layers=6, num_attention_heads=12, intermediate_size=1536)
+
+
+def build_random_cross_encoder(path: str, vocab_size: int = 30522, seed: int = 0) -> str:
+    """
+    Saves a randomly initialized cross-encoder with the architecture of MiniLM-L6.
+
+    Inference cost depends on the architecture and sequence lengths only, so the
+    model stands in for the real checkpoint when it cannot be downloaded. Words
+    "w0", "w1", ... are single tokens of its vocabulary.
+    """
+    os.makedirs(path, exist_ok=True)
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        special = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+        f.write("\n".join(special + [f"w{i}" for i in range(vocab_size - len(special))]))
+    BertTokenizerFast(vocab_file=vocab_file, model_max_length=512).save_pretrained(path)
+
+    import torch
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=vocab_size, max_position_embeddings=512, num_labels=1, **MINILM_L6)
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+def mixed_length_pairs(
+    num_queries: int,
+    candidates_per_query: int,
+    min_words: int = 8,
+    max_words: int = 400,
+    seed: int = 0
+) -> List[Tuple[str, List[str]]]:
+    """Returns queries with candidate passages whose lengths are spread log-uniformly."""
+    rng = np.random.default_rng(seed)
+
+    def words(n: int) -> str:
+        return " ".join(f"w{i}" for i in rng.integers(0, 20000, size=n))
+
+    lengths = np.exp(rng.uniform(np.log(min_words), np.log(max_words), size=(num_queries, candidates_per_query)))
+    return [
+        (words(int(rng.integers(3, 12))), [words(int(n)) for n in row])
+        for row in lengths
+    ]
@@ -0,0 +1,196 @@
+from collections import Counter, deque
+from llama_index.core.schema import NodeWithScore
+from typing import Any, Deque, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveDepth:
+    """
+    Per-query retrieval depth and rerank cutoff policy for HybridRetriever.
+
+    Retrieval starts at the shallowest depth and only moves to the next one when the
+    candidate pool looks weak: the vector and BM25 branches barely agree, or a
+    branch's scores are flat so its top hits are not separated from the tail. After
+    reranking, the output is cut at a clear elbow in the cross-encoder scores.
+    Counters record how often each depth and each output size were used.
+
+    What counts as flat depends on the scorer: dense cosine scores of a top-k list
+    are usually within a few percent of each other, while BM25 scores spread widely.
+    By default the relative gap between a branch's best and worst score is therefore
+    compared with the gaps that branch showed for earlier queries at the same depth,
+    and only the flattest `flat_quantile` of them count as flat.
+    """
+    def __init__(
+        self,
+        depths: Sequence[int] = (5, 10, 20),
+        min_overlap: float = 0.2,
+        min_score_gap: Optional[float] = None,
+        flat_quantile: float = 0.1,
+        calibration_window: int = 1000,
+        min_calibration: int = 100,
+        rerank_top_k: int = 5,
+        min_rerank_k: int = 1,
+        elbow_ratio: float = 0.5
+    ):
+        """
+        Initializes the policy.
+
+        Args:
+            depths: The increasing similarity_top_k values tried for both branches.
+            min_overlap: The minimum share of nodes found by both branches (relative to the
+                         smaller branch) for the pool to count as strong.
+            min_score_gap: An optional fixed minimum relative gap between a branch's best
+                           and worst score for its ranking to count as decisive. If None,
+                           the threshold is calibrated per branch and depth instead.
+            flat_quantile: The share of a branch's recent queries whose score gap counts as
+                           flat when the threshold is calibrated.
+            calibration_window: The number of recent score gaps kept per branch and depth.
+            min_calibration: The number of score gaps a branch must have shown at a depth
+                             before the calibrated rule flags it; until then only the
+                             overlap rule widens.
+            rerank_top_k: The maximum number of nodes returned after reranking.
+            min_rerank_k: The minimum number of nodes kept when cutting at an elbow.
+            elbow_ratio: The share of the reranked score range a single drop must exceed
+                         to count as an elbow.
+
+        Raises:
+            ValueError: If depths is empty or not strictly increasing.
+        """
+        if not depths or any(b <= a for a, b in zip(depths, depths[1:])):
+            raise ValueError("depths must be a non-empty, strictly increasing sequence")
+        self.depths = tuple(depths)
+        self.min_overlap = min_overlap
+        self.min_score_gap = min_score_gap
+        self.flat_quantile = flat_quantile
+        self.calibration_window = calibration_window
+        self.min_calibration = min_calibration
+        self.rerank_top_k = rerank_top_k
+        self.min_rerank_k = min_rerank_k
+        self.elbow_ratio = elbow_ratio
+        self._lock = threading.Lock()
+        self.depth_counts: Counter = Counter()
+        self.rerank_cut_counts: Counter = Counter()
+        self._score_gaps: Dict[Tuple[Any, int], Deque[float]] = {}
+
+    def is_weak(self, depth: int, branch_results: Mapping[Any, List[NodeWithScore]]) -> bool:
+        """
+        Decides whether the candidate pool retrieved at a depth should be widened.
+
+        Args:
+            depth: The depth the branches were queried with.
+            branch_results: The nodes returned by every branch that ran, by branch name.
+
+        Returns:
+            True if a deeper retrieval is likely to improve the pool.
+        """
+        return bool(self.weak_branches(depth, branch_results))
+
+    def weak_branches(self, depth: int, branch_results: Mapping[Any, List[NodeWithScore]]) -> FrozenSet[Any]:
+        """
+        Returns the branches whose results should be retrieved at the next depth.
+
+        Low overlap widens every branch, flat scores widen only the flat branch, and a
+        branch that returned fewer nodes than asked is never widened because a deeper
+        query returns nothing new. Every call also records the branches' score gaps
+        for the calibrated flat-score threshold.
+
+        Args:
+            depth: The depth the branches were queried with.
+            branch_results: The nodes returned by every branch that ran, by branch name.
+
+        Returns:
+            The names of the branches to widen; empty if the pool is strong.
+        """
+        gaps = {branch: self._score_gap(results) for branch, results in branch_results.items()}
+        thresholds = {branch: self._flat_threshold(branch, depth, gap) for branch, gap in gaps.items()}
+        # Branches that ran out of documents cannot get any deeper
+        deeper = {branch for branch, results in branch_results.items() if len(results) >= depth}
+        if not deeper:
+            return frozenset()
+
+        non_empty = [results for results in branch_results.values() if results]
+        if len(non_empty) >= 2:
+            id_sets = [{node.node_id for node in results} for results in non_empty]
+            shared = set.intersection(*id_sets)
+            overlap = len(shared) / min(len(ids) for ids in id_sets)
+            if overlap < self.min_overlap:
+                logger.debug(f"Branch overlap {overlap:.2f} below {self.min_overlap} at depth {depth}")
+                return frozenset(deeper)
+
+        flat = set()
+        for branch in deeper:
+            gap, threshold = gaps[branch], thresholds[branch]
+            if gap is not None and threshold is not None and gap < threshold:
+                logger.debug(f"Relative score gap {gap:.3f} of the {branch} branch below {threshold:.3f} at depth {depth}")
+                flat.add(branch)
+        return frozenset(flat)
+
+    @staticmethod
+    def _score_gap(results: List[NodeWithScore]) -> Optional[float]:
+        """Returns the gap between the best and worst score relative to the best one."""
+        if len(results) < 2:
+            return None
+        scores = np.array([node.score if node.score is not None else 0.0 for node in results])
+        top = scores.max()
+        return float((top - scores.min()) / max(abs(top), 1e-9))
+
+    def _flat_threshold(self, branch: Any, depth: int, gap: Optional[float]) -> Optional[float]:
+        """
+        Returns the gap below which a branch counts as flat, and records its current gap.
+
+        The calibrated threshold is taken over the gaps seen before this query, so a
+        query is judged against the branch's usual score distribution at this depth.
+        """
+        if self.min_score_gap is not None:
+            return self.min_score_gap
+        if gap is None:
+            return None
+        with self._lock:
+            history = self._score_gaps.setdefault((branch, depth), deque(maxlen=self.calibration_window))
+            threshold = None
+            if len(history) >= self.min_calibration:
+                threshold = float(np.quantile(history, self.flat_quantile))
+            history.append(gap)
+        return threshold
+
+    def cut(self, reranked_nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        """
+        Cuts the reranked nodes at the largest score drop if it is a clear elbow.
+
+        Args:
+            reranked_nodes: The nodes in descending reranked-score order.
+
+        Returns:
+            The nodes up to the elbow, or all of them if there is no clear elbow.
+        """
+        keep = len(reranked_nodes)
+        if keep > self.min_rerank_k:
+            scores = np.array([node.score if node.score is not None else 0.0 for node in reranked_nodes])
+            score_range = scores[0] - scores[-1]
+            if score_range > 0:
+                drops = scores[:-1] - scores[1:]
+                # A cut after position i keeps i + 1 nodes; never keep fewer than min_rerank_k
+                drops[:self.min_rerank_k - 1] = 0.0
+                elbow = int(np.argmax(drops))
+                if drops[elbow] > self.elbow_ratio * score_range:
+                    keep = elbow + 1
+        with self._lock:
+            self.rerank_cut_counts[keep] += 1
+        return reranked_nodes[:keep]
+
+    def record_depth(self, depth: int) -> None:
+        """Counts the depth a query was finally answered with."""
+        with self._lock:
+            self.depth_counts[depth] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns how often each retrieval depth and each rerank output size were used."""
+        with self._lock:
+            return {
+                "depth_counts": dict(self.depth_counts),
+                "rerank_cut_counts": dict(self.rerank_cut_counts),
+            }
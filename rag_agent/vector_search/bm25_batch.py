@@ -0,0 +1,98 @@
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.retrievers.bm25 import BM25Retriever
+from scipy import sparse
+from typing import List
+import bm25s
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def doc_term_matrix(bm25: bm25s.BM25) -> sparse.csc_matrix:
+    """Returns the precomputed per-token document scores of a bm25s index as a (num_docs, vocab_size) matrix."""
+    indptr = bm25.scores["indptr"]
+    return sparse.csc_matrix(
+        (bm25.scores["data"], bm25.scores["indices"], indptr),
+        shape=(int(bm25.scores["num_docs"]), len(indptr) - 1)
+    )
+
+
+def query_token_ids(retriever: BM25Retriever, queries: List[str]) -> List[List[int]]:
+    """Tokenizes queries like BM25Retriever does and maps the tokens to vocabulary IDs."""
+    query_tokens = bm25s.tokenize(
+        queries,
+        stemmer=retriever.stemmer if not retriever.skip_stemming else None,
+        token_pattern=retriever.token_pattern,
+        return_ids=False,
+        show_progress=False,
+    )
+    return [retriever.bm25.get_tokens_ids(tokens) for tokens in query_tokens]
+
+
+def bm25_retrieve_batch(retriever: BM25Retriever, queries: List[str]) -> List[List[NodeWithScore]]:
+    """
+    Scores many queries against a BM25Retriever index with one sparse matrix product.
+
+    The bm25s index keeps the precomputed per-token document scores as a CSC matrix
+    of shape (num_docs, vocab_size). The queries are turned into a (num_queries,
+    vocab_size) term-count matrix, so the scores of every query against every
+    document are a single sparse product instead of one scoring pass per query.
+
+    Args:
+        retriever: The BM25 retriever whose index is queried.
+        queries: The query strings.
+
+    Returns:
+        One list of nodes per query, ordered by descending BM25 score. Documents that
+        share no term with a query are not returned.
+    """
+    if not queries:
+        return []
+
+    bm25 = retriever.bm25
+    doc_term_scores = doc_term_matrix(bm25)
+    num_docs, vocab_size = doc_term_scores.shape
+
+    rows, cols = [], []
+    for row, token_ids in enumerate(query_token_ids(retriever, queries)):
+        rows.extend([row] * len(token_ids))
+        cols.extend(token_ids)
+    # Duplicate (row, col) entries are summed, so repeated query terms count twice as in bm25s
+    query_terms = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=doc_term_scores.dtype), (rows, cols)),
+        shape=(len(queries), vocab_size)
+    )
+
+    scores = (query_terms @ doc_term_scores.T).tocsr()
+    if bm25.nonoccurrence_array is not None:
+        # BM25L/BM25+ give every document a baseline score, so densify per query
+        baseline = query_terms @ bm25.nonoccurrence_array
+        scores = sparse.csr_matrix(scores.toarray() + baseline[:, np.newaxis])
+    # The mask comes last so masked documents lose the baseline score as well
+    if retriever.corpus_weight_mask:
+        scores = scores.multiply(np.asarray(retriever.corpus_weight_mask)[np.newaxis, :]).tocsr()
+
+    top_k = retriever.similarity_top_k
+    results = []
+    for row in range(len(queries)):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        doc_ids = scores.indices[start:end]
+        doc_scores = scores.data[start:end]
+        positive = doc_scores > 0
+        doc_ids, doc_scores = doc_ids[positive], doc_scores[positive]
+        if len(doc_scores) > top_k:
+            top = np.argpartition(-doc_scores, top_k - 1)[:top_k]
+            doc_ids, doc_scores = doc_ids[top], doc_scores[top]
+        order = np.argsort(-doc_scores, kind="stable")
+        results.append([
+            NodeWithScore(
+                node=metadata_dict_to_node(retriever.corpus[int(doc_ids[i])]),
+                score=float(doc_scores[i])
+            )
+            for i in order
+        ])
+
+    logger.debug(f"Scored {len(queries)} queries against {num_docs} BM25 documents in one batch.")
+    return results
@@ -0,0 +1,459 @@
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks.base import CallbackManager
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import bm25s
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import numpy as np
+import Stemmer
+from .candidates import top_indices
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+PARAMS_FILENAME = "params.json"
+
+
+def _write_blob(path: str, items: Sequence[bytes]) -> np.ndarray:
+    """Writes byte strings back to back and returns their (len(items) + 1) start offsets."""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in items], out=offsets[1:])
+    with open(path, "wb") as f:
+        for item in items:
+            f.write(item)
+    return offsets
+
+
+def _map_file(path: str) -> Any:
+    """Maps a file read-only; empty files cannot be mapped and become empty bytes."""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def tokenize_queries(
+    queries: List[str],
+    language: str,
+    stemmer: Optional[Stemmer.Stemmer],
+    token_pattern: str
+) -> List[List[str]]:
+    """Tokenizes queries the way the indexed documents were tokenized."""
+    return bm25s.tokenize(
+        queries,
+        stopwords=language,
+        stemmer=stemmer,
+        token_pattern=token_pattern,
+        return_ids=False,
+        show_progress=False,
+    )
+
+
+def write_index(
+    path: str,
+    terms: Sequence[bytes],
+    postings_indptr: np.ndarray,
+    postings_docs: np.ndarray,
+    postings_tf: np.ndarray,
+    doc_lengths: np.ndarray,
+    corpus_lines: Sequence[bytes],
+    k1: float,
+    b: float,
+    language: str,
+    stemmer_language: Optional[str],
+    token_pattern: str
+) -> None:
+    """
+    Writes the files of a MmapBM25Index directory.
+
+    The files are written to a temporary directory next to `path` which then
+    replaces `path`, so readers never see a partially written index. An existing
+    index is renamed aside before the swap and deleted after it.
+
+    Args:
+        path: The index directory; an existing index there is replaced.
+        terms: The sorted UTF-8 encoded vocabulary.
+        postings_indptr: The CSR row pointers of the postings, one row per term.
+        postings_docs: The document ID of every posting, ascending within a term.
+        postings_tf: The term frequency of every posting.
+        doc_lengths: The number of indexed tokens of every document.
+        corpus_lines: One newline-terminated JSON node dictionary per document.
+        k1: The BM25 term frequency saturation.
+        b: The BM25 document length normalization.
+        language: The stopword language.
+        stemmer_language: The PyStemmer language, or None if tokens are not stemmed.
+        token_pattern: The regular expression matching a token.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".bm25-", dir=parent)
+    old_path = None
+    try:
+        arrays = {
+            "term_offsets": _write_blob(os.path.join(tmp_path, "terms.bin"), terms),
+            "postings_indptr": np.asarray(postings_indptr, dtype=np.int64),
+            "postings_docs": np.asarray(postings_docs, dtype=np.int32),
+            "postings_tf": np.asarray(postings_tf, dtype=np.int32),
+            "doc_lengths": np.asarray(doc_lengths, dtype=np.int32),
+            "corpus_offsets": _write_blob(os.path.join(tmp_path, "corpus.jsonl"), corpus_lines),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        params = {
+            "format_version": FORMAT_VERSION,
+            "k1": k1,
+            "b": b,
+            "language": language,
+            "stemmer_language": stemmer_language,
+            "token_pattern": token_pattern,
+            "num_docs": len(arrays["doc_lengths"]),
+            "avg_doc_length": float(arrays["doc_lengths"].mean()) if len(arrays["doc_lengths"]) else 0.0,
+        }
+        with open(os.path.join(tmp_path, PARAMS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(params, f, indent=2)
+
+        if os.path.exists(path):
+            # The old index is only renamed aside, so `path` is missing for the instant
+            # between two renames instead of while a whole directory is deleted
+            old_path = tempfile.mkdtemp(prefix=".bm25-old-", dir=parent)
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if old_path is not None and not os.path.exists(path):
+            os.replace(old_path, path)
+        raise
+    if old_path is not None:
+        # Processes that still map the old files keep reading them until they reopen
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+class MmapBM25Index:
+    """
+    A read-only BM25 index stored as flat arrays and opened through mmap.
+
+    The index directory holds:
+        params.json          format version, BM25 and tokenizer settings, corpus statistics
+        terms.bin            the sorted vocabulary as concatenated UTF-8 strings
+        term_offsets.npy     byte offsets of every term in terms.bin; a term ID is its sorted position
+        postings_indptr.npy  CSR row pointers: the postings of term t are [indptr[t], indptr[t + 1])
+        postings_docs.npy    the document ID of every posting, ascending within a term
+        postings_tf.npy      the term frequency of every posting
+        doc_lengths.npy      the number of indexed tokens of every document
+        corpus.jsonl         one node dictionary per line
+        corpus_offsets.npy   byte offsets of every line in corpus.jsonl
+
+    Opening the index maps these files instead of reading them, so startup does
+    not depend on the corpus size, pages are loaded on first use, and every worker
+    process opening the same directory shares one copy in the page cache. Queries
+    are scored from the raw postings with the Lucene BM25 variant used by bm25s,
+    so the scores match those of BM25Retriever on the same nodes.
+    """
+    def __init__(self, path: str):
+        """
+        Opens an index directory written by `build`.
+
+        Args:
+            path: The index directory.
+
+        Raises:
+            ValueError: If the directory holds an unsupported format version.
+        """
+        self.path = path
+        with open(os.path.join(path, PARAMS_FILENAME), encoding="utf-8") as f:
+            params = json.load(f)
+        if params.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format version: {params.get('format_version')}")
+
+        self.k1 = params["k1"]
+        self.b = params["b"]
+        self.language = params["language"]
+        self.stemmer_language = params["stemmer_language"]
+        self.token_pattern = params["token_pattern"]
+        self.num_docs = params["num_docs"]
+        self.avg_doc_length = params["avg_doc_length"]
+        self.stemmer = Stemmer.Stemmer(self.stemmer_language) if self.stemmer_language else None
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.term_offsets = load("term_offsets")
+        self.postings_indptr = load("postings_indptr")
+        self.postings_docs = load("postings_docs")
+        self.postings_tf = load("postings_tf")
+        self.doc_lengths = load("doc_lengths")
+        self.corpus_offsets = load("corpus_offsets")
+        self._terms = _map_file(os.path.join(path, "terms.bin"))
+        self._corpus = _map_file(os.path.join(path, "corpus.jsonl"))
+        self.vocab_size = len(self.term_offsets) - 1
+        logger.info(f"Opened BM25 index at {path}: {self.num_docs} documents, {self.vocab_size} terms")
+
+    @classmethod
+    def build(
+        cls,
+        nodes: Sequence[BaseNode],
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        language: str = "en",
+        stemmer_language: Optional[str] = "english",
+        token_pattern: str = r"(?u)\b\w\w+\b",
+        show_progress: bool = False
+    ) -> "MmapBM25Index":
+        """
+        Tokenizes the nodes like BM25Retriever does and writes the index to a directory.
+
+        Args:
+            nodes: The nodes to index.
+            path: The index directory; an existing index there is replaced.
+            k1: The BM25 term frequency saturation.
+            b: The BM25 document length normalization.
+            language: The stopword language.
+            stemmer_language: The PyStemmer language, or None to skip stemming.
+            token_pattern: The regular expression matching a token.
+            show_progress: Whether to show the tokenizer progress bar.
+
+        Returns:
+            The opened index.
+
+        Raises:
+            ValueError: If no nodes are given.
+        """
+        if not nodes:
+            raise ValueError("No nodes to index")
+
+        doc_tokens = bm25s.tokenize(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes],
+            stopwords=language,
+            stemmer=Stemmer.Stemmer(stemmer_language) if stemmer_language else None,
+            token_pattern=token_pattern,
+            return_ids=False,
+            show_progress=show_progress,
+        )
+        num_docs = len(nodes)
+        doc_lengths = np.fromiter((len(tokens) for tokens in doc_tokens), dtype=np.int32, count=num_docs)
+        # The vocabulary grows in first-seen order, then term IDs are remapped to sorted order
+        vocabulary: Dict[str, int] = {}
+        first_seen_ids = np.fromiter(
+            (vocabulary.setdefault(token, len(vocabulary)) for tokens in doc_tokens for token in tokens),
+            dtype=np.int64,
+            count=int(doc_lengths.sum()),
+        )
+        encoded_terms = [term.encode("utf-8") for term in vocabulary]
+        order = sorted(range(len(encoded_terms)), key=encoded_terms.__getitem__)
+        terms = [encoded_terms[i] for i in order]
+        sorted_ids = np.empty(len(order), dtype=np.int64)
+        sorted_ids[order] = np.arange(len(order))
+        token_term_ids = sorted_ids[first_seen_ids]
+
+        # Counting (term, document) pairs yields postings sorted by term, then document
+        token_doc_ids = np.repeat(np.arange(num_docs, dtype=np.int64), doc_lengths)
+        pairs, term_freqs = np.unique(token_term_ids.astype(np.int64) * num_docs + token_doc_ids, return_counts=True)
+        postings_indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // num_docs, minlength=len(terms)), out=postings_indptr[1:])
+
+        write_index(
+            path,
+            terms=terms,
+            postings_indptr=postings_indptr,
+            postings_docs=pairs % num_docs,
+            postings_tf=term_freqs,
+            doc_lengths=doc_lengths,
+            corpus_lines=[
+                json.dumps(node_to_metadata_dict(node) | {"node_id": node.node_id}).encode("utf-8") + b"\n"
+                for node in nodes
+            ],
+            k1=k1,
+            b=b,
+            language=language,
+            stemmer_language=stemmer_language,
+            token_pattern=token_pattern,
+        )
+        logger.info(f"Built BM25 index at {path}: {num_docs} documents, {len(terms)} terms, {len(pairs)} postings")
+        return cls(path)
+
+    def term(self, term_id: int) -> str:
+        """Returns the term with the given ID."""
+        return bytes(self._terms[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]).decode("utf-8")
+
+    def term_id(self, term: str) -> Optional[int]:
+        """Returns the ID of a term by binary search over the sorted vocabulary, or None if unknown."""
+        key = term.encode("utf-8")
+        low, high = 0, self.vocab_size
+        while low < high:
+            middle = (low + high) // 2
+            if self._terms[self.term_offsets[middle]:self.term_offsets[middle + 1]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.vocab_size and self._terms[self.term_offsets[low]:self.term_offsets[low + 1]] == key:
+            return low
+        return None
+
+    def terms(self) -> List[str]:
+        """Returns the whole vocabulary in term ID order."""
+        blob = bytes(self._terms)
+        return [
+            blob[start:end].decode("utf-8")
+            for start, end in zip(self.term_offsets[:-1].tolist(), self.term_offsets[1:].tolist())
+        ]
+
+    def doc_freqs(self, term_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Returns the number of documents containing each given term, or every term in ID order."""
+        if term_ids is None:
+            return np.diff(self.postings_indptr)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        return self.postings_indptr[term_ids + 1] - self.postings_indptr[term_ids]
+
+    def tokenize(self, queries: List[str]) -> List[List[int]]:
+        """Tokenizes queries with the settings of the index and maps the tokens to term IDs."""
+        token_ids = []
+        for tokens in tokenize_queries(queries, self.language, self.stemmer, self.token_pattern):
+            ids = (self.term_id(token) for token in tokens)
+            token_ids.append([term_id for term_id in ids if term_id is not None])
+        return token_ids
+
+    def idf(self, term_ids: Sequence[int]) -> np.ndarray:
+        """Returns the Lucene BM25 inverse document frequency of every term."""
+        doc_freqs = self.doc_freqs(term_ids)
+        return np.log(1.0 + (self.num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+    def scores(
+        self,
+        term_ids: Sequence[int],
+        idf: Optional[np.ndarray] = None,
+        avg_doc_length: Optional[float] = None,
+        doc_range: Optional[Tuple[int, int]] = None
+    ) -> np.ndarray:
+        """
+        Scores every document against a tokenized query.
+
+        Args:
+            term_ids: The term IDs of the query; a repeated term counts once per occurrence.
+            idf: The inverse document frequency of every query term; by default it is
+                 computed from this index alone. A segmented index passes global values.
+            avg_doc_length: The average document length; by default that of this index.
+            doc_range: An optional half-open range of document IDs to score instead of all
+                       documents, e.g. one shard of the index.
+
+        Returns:
+            A float32 array with one BM25 score per document (of `doc_range`).
+        """
+        low, high = doc_range if doc_range is not None else (0, self.num_docs)
+        scores = np.zeros(high - low, dtype=np.float32)
+        if not len(term_ids):
+            return scores
+        if idf is None:
+            idf = self.idf(term_ids)
+        if avg_doc_length is None:
+            avg_doc_length = self.avg_doc_length
+        for term_id, term_idf in zip(term_ids, idf):
+            start, end = self.postings_indptr[term_id], self.postings_indptr[term_id + 1]
+            if doc_range is not None:
+                # Postings are sorted by document, so a range is one contiguous slice
+                start, end = start + np.searchsorted(self.postings_docs[start:end], [low, high])
+            doc_ids = self.postings_docs[start:end]
+            term_freqs = self.postings_tf[start:end].astype(np.float32)
+            length_norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[doc_ids] / avg_doc_length)
+            # Document IDs are unique within a term, so the fancy-indexed add is safe
+            scores[doc_ids - low] += (term_idf * term_freqs / (term_freqs + length_norm)).astype(np.float32)
+        return scores
+
+    def top_k(
+        self,
+        term_ids: Sequence[int],
+        k: int,
+        weight_mask: Optional[np.ndarray] = None,
+        doc_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the best `k` documents of a tokenized query.
+
+        Args:
+            term_ids: The term IDs of the query.
+            k: The maximum number of documents returned.
+            weight_mask: An optional per-document weight the scores are multiplied with.
+            doc_range: An optional half-open range of document IDs to search in.
+
+        Returns:
+            The document IDs and scores ordered by descending score. Documents that
+            share no term with the query are not returned.
+        """
+        low, high = doc_range if doc_range is not None else (0, self.num_docs)
+        scores = self.scores(term_ids, doc_range=doc_range)
+        if weight_mask is not None:
+            scores *= np.asarray(weight_mask[low:high], dtype=np.float32)
+        positive = np.flatnonzero(scores > 0)
+        order = positive[top_indices(scores[positive], k)]
+        return order + low, scores[order]
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        """Returns the stored node dictionary of a document."""
+        return json.loads(self.corpus_line(doc_id))
+
+    def corpus_line(self, doc_id: int) -> bytes:
+        """Returns the stored JSON line of a document, including the newline."""
+        start, end = self.corpus_offsets[doc_id], self.corpus_offsets[doc_id + 1]
+        return bytes(self._corpus[start:end])
+
+    def close(self) -> None:
+        """Unmaps the vocabulary and corpus files; the arrays are unmapped when released."""
+        for mapped in (self._terms, self._corpus):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+class MmapBM25Retriever(BaseRetriever):
+    """
+    A BM25 retriever over a MmapBM25Index.
+
+    Unlike BM25Retriever.from_defaults it does not tokenize the docstore on startup:
+    the index is built once with `MmapBM25Index.build` and every process opens it
+    with `from_persist_dir` in constant time.
+    """
+    def __init__(
+        self,
+        index: MmapBM25Index,
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        corpus_weight_mask: Optional[List[int]] = None,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False
+    ):
+        """
+        Initializes the retriever.
+
+        Args:
+            index: The opened BM25 index.
+            similarity_top_k: The number of nodes returned per query.
+            corpus_weight_mask: An optional per-document weight, e.g. 0 to exclude a document.
+            callback_manager: The LlamaIndex callback manager.
+            verbose: Whether to log verbosely.
+        """
+        self.index = index
+        self.similarity_top_k = similarity_top_k
+        self.corpus_weight_mask = corpus_weight_mask or None
+        super().__init__(callback_manager=callback_manager, verbose=verbose)
+
+    @classmethod
+    def from_persist_dir(cls, path: str, **kwargs: Any) -> "MmapBM25Retriever":
+        """Opens the index in `path` and returns a retriever over it."""
+        return cls(MmapBM25Index(path), **kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        term_ids = self.index.tokenize([query_bundle.query_str])[0]
+        weight_mask = np.asarray(self.corpus_weight_mask) if self.corpus_weight_mask else None
+        doc_ids, scores = self._top_k(term_ids, weight_mask)
+        return [
+            NodeWithScore(node=metadata_dict_to_node(self.index.document(int(doc_id))), score=float(score))
+            for doc_id, score in zip(doc_ids, scores)
+        ]
+
+    def _top_k(self, term_ids: List[int], weight_mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.top_k(term_ids, self.similarity_top_k, weight_mask=weight_mask)
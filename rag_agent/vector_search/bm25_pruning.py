@@ -0,0 +1,258 @@
+from llama_index.core.callbacks.base import CallbackManager
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import tempfile
+import threading
+import numpy as np
+from .bm25_index import MmapBM25Index, MmapBM25Retriever
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_ARRAYS = ("term_indptr", "block_ids", "block_max", "term_max")
+
+
+class BlockMaxBM25:
+    """
+    Exact top-k BM25 evaluation with dynamic pruning over a MmapBM25Index.
+
+    Every term has a score upper bound (its idf times the largest term-frequency
+    component of any of its postings), and every term and block of `block_size`
+    consecutive document IDs has a tighter block maximum, as in Block-Max WAND.
+
+    Query terms are traversed best bound first. Every document found in a traversed
+    posting list is scored exactly by binary-searching the posting lists of the
+    other query terms, after candidates whose block-max bound cannot reach the
+    current k-th score have been dropped. Traversal stops as soon as the bounds of
+    the terms not yet traversed add up to less than the k-th score, because a
+    document containing only those terms cannot enter the top k (the MaxScore
+    criterion). The long posting lists of frequent, low-idf terms are therefore
+    usually only probed, never read. The work is done on whole posting lists with
+    NumPy rather than one posting cursor at a time, and the results equal
+    exhaustive scoring.
+
+    The bounds are cached next to the index files, so they are computed once per
+    index and block size.
+    """
+    def __init__(self, index: MmapBM25Index, block_size: int = 1024):
+        """
+        Initializes the evaluator, loading or computing the score bounds.
+
+        Args:
+            index: The index to query.
+            block_size: The number of consecutive document IDs per block.
+
+        Raises:
+            ValueError: If block_size is not positive.
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be positive")
+        self.index = index
+        self.block_size = block_size
+        self.num_blocks = -(-index.num_docs // block_size)
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.postings_traversed = 0
+        self.postings_total = 0
+        self.candidates_pruned = 0
+        self.candidates_scored = 0
+
+        arrays = self._load()
+        if arrays is None:
+            arrays = self._compute()
+            self._save(arrays)
+        self.term_indptr, self.block_ids, self.block_max, self.term_max = arrays
+
+    def top_k(
+        self,
+        term_ids: Sequence[int],
+        k: int,
+        weight_mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the best `k` documents of a tokenized query, like MmapBM25Index.top_k.
+
+        Args:
+            term_ids: The term IDs of the query; a repeated term counts once per occurrence.
+            k: The maximum number of documents returned.
+            weight_mask: An optional per-document weight in [0, 1]. Larger weights would
+                         invalidate the bounds, so such masks fall back to exhaustive scoring.
+
+        Returns:
+            The document IDs and scores ordered by descending score. Documents that
+            share no term with the query are not returned.
+        """
+        if weight_mask is not None:
+            weight_mask = np.asarray(weight_mask, dtype=np.float32)
+            if weight_mask.size and weight_mask.max() > 1.0:
+                return self.index.top_k(term_ids, k, weight_mask=weight_mask)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        terms, counts = np.unique(term_ids, return_counts=True)
+        best_docs = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        if not len(terms) or k <= 0:
+            return best_docs, best_scores
+
+        term_idf = self.index.idf(terms)
+        # NumPy float64 scalars keep the float64 arithmetic of MmapBM25Index.scores
+        idf = dict(zip(terms.tolist(), term_idf))
+        weights = term_idf * counts
+        upper_bounds = weights * self.term_max[terms]
+        order = np.argsort(-upper_bounds, kind="stable")
+        # remaining[i] bounds any document that contains only terms order[i:]
+        remaining = np.cumsum(upper_bounds[order][::-1])[::-1]
+
+        seen = np.empty(0, dtype=np.int64)
+        traversed = pruned = scored = 0
+        for position, term in zip(range(len(order)), terms[order]):
+            threshold = best_scores[-1] if len(best_docs) == k else None
+            # The slack absorbs float32 rounding, so ties at the threshold are still scored
+            if threshold is not None and remaining[position] * (1.0 + 1e-6) < threshold:
+                break
+            start, end = self.index.postings_indptr[term], self.index.postings_indptr[term + 1]
+            candidates = np.asarray(self.index.postings_docs[start:end], dtype=np.int64)
+            traversed += len(candidates)
+            if len(seen):
+                candidates = candidates[~np.isin(candidates, seen, assume_unique=True)]
+            seen = np.union1d(seen, candidates)
+            if threshold is not None and len(candidates):
+                bounds = self._block_bounds(terms, weights, candidates)
+                keep = bounds * (1.0 + 1e-6) >= threshold
+                pruned += int((~keep).sum())
+                candidates = candidates[keep]
+            if not len(candidates):
+                continue
+
+            scores = self._exact_scores(term_ids, idf, candidates)
+            if weight_mask is not None:
+                scores *= weight_mask[candidates]
+            scored += len(candidates)
+            positive = scores > 0
+            all_docs = np.concatenate((best_docs, candidates[positive]))
+            all_scores = np.concatenate((best_scores, scores[positive]))
+            # Ties are broken by document ID, as in exhaustive scoring
+            keep = np.lexsort((all_docs, -all_scores))[:k]
+            best_docs, best_scores = all_docs[keep], all_scores[keep]
+
+        with self._lock:
+            self.queries += 1
+            self.postings_traversed += traversed
+            self.postings_total += int(self.index.doc_freqs(terms).sum())
+            self.candidates_pruned += pruned
+            self.candidates_scored += scored
+        return best_docs, best_scores
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns how many postings of the query terms were traversed and how many candidates were pruned."""
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "postings_traversed": self.postings_traversed,
+                "postings_total": self.postings_total,
+                "skipped_postings_ratio": (
+                    1.0 - self.postings_traversed / self.postings_total if self.postings_total else 0.0
+                ),
+                "candidates_pruned": self.candidates_pruned,
+                "candidates_scored": self.candidates_scored,
+            }
+
+    def _block_bounds(self, terms: np.ndarray, weights: np.ndarray, doc_ids: np.ndarray) -> np.ndarray:
+        """Returns the block-max upper bound of the score of every document."""
+        doc_blocks = doc_ids // self.block_size
+        bounds = np.zeros(len(doc_ids), dtype=np.float64)
+        for term, weight in zip(terms, weights):
+            start, end = self.term_indptr[term], self.term_indptr[term + 1]
+            term_blocks = self.block_ids[start:end]
+            positions = np.minimum(np.searchsorted(term_blocks, doc_blocks), len(term_blocks) - 1)
+            present = term_blocks[positions] == doc_blocks
+            bounds[present] += weight * self.block_max[start + positions[present]]
+        return bounds
+
+    def _exact_scores(self, term_ids: np.ndarray, idf: Dict[int, float], doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Scores documents by binary search in the posting lists of the query terms.
+
+        The contributions are added in query term order in float32, exactly like
+        MmapBM25Index.scores, so both evaluators return identical scores.
+        """
+        index = self.index
+        length_norm = index.k1 * (1.0 - index.b + index.b * index.doc_lengths[doc_ids] / index.avg_doc_length)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for term in term_ids.tolist():
+            start, end = index.postings_indptr[term], index.postings_indptr[term + 1]
+            postings = index.postings_docs[start:end]
+            positions = np.minimum(np.searchsorted(postings, doc_ids), len(postings) - 1)
+            present = postings[positions] == doc_ids
+            term_freqs = index.postings_tf[start + positions[present]].astype(np.float32)
+            scores[present] += (idf[term] * term_freqs / (term_freqs + length_norm[present])).astype(np.float32)
+        return scores
+
+    def _compute(self) -> Tuple[np.ndarray, ...]:
+        """Computes the per-term block maxima and term maxima with one vectorized pass over all postings."""
+        index = self.index
+        doc_freqs = index.doc_freqs()
+        posting_terms = np.repeat(np.arange(index.vocab_size, dtype=np.int64), doc_freqs)
+        doc_ids = np.asarray(index.postings_docs, dtype=np.int64)
+        term_freqs = np.asarray(index.postings_tf, dtype=np.float64)
+        length_norm = index.k1 * (1.0 - index.b + index.b * index.doc_lengths[doc_ids] / index.avg_doc_length)
+        tf_components = term_freqs / (term_freqs + length_norm)
+
+        # Postings are sorted by term, then document, so every (term, block) pair is one run
+        posting_blocks = doc_ids // self.block_size
+        keys = posting_terms * self.num_blocks + posting_blocks
+        block_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else keys
+        block_max = (
+            np.maximum.reduceat(tf_components, block_starts).astype(np.float32)
+            if len(keys) else np.empty(0, dtype=np.float32)
+        )
+        term_indptr = np.searchsorted(posting_terms[block_starts], np.arange(index.vocab_size + 1))
+        term_max = np.zeros(index.vocab_size, dtype=np.float32)
+        has_blocks = np.diff(term_indptr) > 0
+        if has_blocks.any():
+            term_max[has_blocks] = np.maximum.reduceat(block_max, term_indptr[:-1][has_blocks])
+        logger.info(f"Computed {len(block_starts)} BM25 block maxima for {index.path} (block size {self.block_size})")
+        return (
+            term_indptr.astype(np.int64),
+            posting_blocks[block_starts].astype(np.int64),
+            block_max,
+            term_max,
+        )
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.index.path, f"block_max_{self.block_size}_{name}.npy")
+
+    def _load(self) -> Optional[Tuple[np.ndarray, ...]]:
+        paths = [self._cache_path(name) for name in _BLOCK_ARRAYS]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return tuple(np.load(path, mmap_mode="r") for path in paths)
+
+    def _save(self, arrays: Tuple[np.ndarray, ...]) -> None:
+        """Caches the block maxima next to the index; a read-only index directory is not an error."""
+        try:
+            for name, array in zip(_BLOCK_ARRAYS, arrays):
+                fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=self.index.path)
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp_path, self._cache_path(name))
+        except OSError as e:
+            logger.debug(f"Could not cache BM25 block maxima in {self.index.path}: {e}")
+
+
+class BlockMaxBM25Retriever(MmapBM25Retriever):
+    """A MmapBM25Retriever that evaluates queries with BlockMaxBM25 pruning."""
+    def __init__(
+        self,
+        index: MmapBM25Index,
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        corpus_weight_mask: Optional[List[int]] = None,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False,
+        block_size: int = 1024
+    ):
+        super().__init__(index, similarity_top_k, corpus_weight_mask, callback_manager, verbose)
+        self.evaluator = BlockMaxBM25(index, block_size=block_size)
+
+    def _top_k(self, term_ids: List[int], weight_mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.evaluator.top_k(term_ids, self.similarity_top_k, weight_mask=weight_mask)
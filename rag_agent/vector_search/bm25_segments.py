@@ -0,0 +1,536 @@
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks.base import CallbackManager
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import numpy as np
+import Stemmer
+from .bm25_index import MmapBM25Index, tokenize_queries, write_index
+from .cache import bump_index_version
+from .candidates import top_indices
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+NODE_IDS_FILENAME = "node_ids.json"
+SEGMENTS_DIRNAME = "segments"
+
+
+class Segment:
+    """
+    One immutable MmapBM25Index segment with the node IDs of its documents and its tombstones.
+
+    The tombstone mask is never modified in place; deleting documents replaces the
+    Segment, so a reader holding the previous segment list keeps a consistent view.
+    """
+    __slots__ = ("name", "index", "node_ids", "deleted")
+
+    def __init__(self, name: str, index: MmapBM25Index, node_ids: List[str], deleted: np.ndarray):
+        self.name = name
+        self.index = index
+        self.node_ids = node_ids
+        self.deleted = deleted
+
+    @property
+    def num_docs(self) -> int:
+        return self.index.num_docs
+
+    @property
+    def live_docs(self) -> int:
+        return self.index.num_docs - int(self.deleted.sum())
+
+    @property
+    def total_length(self) -> int:
+        return int(self.index.doc_lengths.sum())
+
+    def with_deleted(self, doc_ids: Iterable[int]) -> "Segment":
+        """Returns this segment with additional tombstones."""
+        deleted = self.deleted.copy()
+        deleted[list(doc_ids)] = True
+        return Segment(self.name, self.index, self.node_ids, deleted)
+
+
+class SegmentedBM25Index:
+    """
+    A BM25 index made of immutable segments that absorbs inserts and deletes incrementally.
+
+    New documents are tokenized into a small fresh segment, so ingest cost grows with
+    the size of the delta rather than of the corpus. Deleting a document only sets a
+    tombstone, and re-adding a node ID replaces the older version. A background
+    merger compacts the smallest segments once there are more than `max_segments`,
+    and rewrites segments whose share of tombstones reaches `max_deleted_ratio`.
+
+    The global statistics are kept per segment: the document count and total length
+    are updated when a segment is added or merged, and the document frequency of a
+    query term is summed over the segment term dictionaries at query time, so every
+    segment is scored with corpus-wide IDF. As in Lucene, tombstoned documents still
+    count towards the statistics until a merge drops them.
+
+    The index directory holds a `manifest.json` listing the segments and their
+    tombstones, and one MmapBM25Index directory per segment under `segments/`. A
+    directory is owned by one SegmentedBM25Index at a time.
+
+    Readers pin the segments they use with `acquire`. A segment replaced by a merge
+    is closed and its directory deleted once the last reader pinning it lets go.
+    Every insert and delete bumps the retrieval cache's index version.
+    """
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        language: str = "en",
+        stemmer_language: Optional[str] = "english",
+        token_pattern: str = r"(?u)\b\w\w+\b",
+        max_segments: int = 8,
+        merge_factor: int = 4,
+        max_deleted_ratio: float = 0.3,
+        background_merge: bool = True
+    ):
+        """
+        Opens the index in `path`, creating an empty one if it does not exist.
+
+        Args:
+            path: The index directory.
+            k1: The BM25 term frequency saturation of a new index.
+            b: The BM25 document length normalization of a new index.
+            language: The stopword language of a new index.
+            stemmer_language: The PyStemmer language of a new index, or None to skip stemming.
+            token_pattern: The regular expression matching a token of a new index.
+            max_segments: The number of segments above which the smallest ones are merged.
+            merge_factor: The number of segments merged at once.
+            max_deleted_ratio: The share of tombstoned documents at which a segment is rewritten.
+            background_merge: Whether a background thread merges segments after every change.
+                              Otherwise `maybe_merge` has to be called.
+
+        Raises:
+            ValueError: If merge_factor is below 2 or max_deleted_ratio is not in (0, 1].
+        """
+        if merge_factor < 2:
+            raise ValueError("merge_factor must be at least 2")
+        if not 0.0 < max_deleted_ratio <= 1.0:
+            raise ValueError("max_deleted_ratio must be in (0, 1]")
+        self.path = path
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.max_deleted_ratio = max_deleted_ratio
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        # Readers per pinned segment name, and merged-away segments waiting for their readers
+        self._readers: Counter = Counter()
+        self._retired: Dict[str, Segment] = {}
+
+        manifest_path = os.path.join(path, MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            # The settings of an existing index win, every segment was built with them
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.settings = manifest["settings"]
+            self._next_segment = manifest["next_segment"]
+            segment_entries = manifest["segments"]
+        else:
+            self.settings = {
+                "k1": k1,
+                "b": b,
+                "language": language,
+                "stemmer_language": stemmer_language,
+                "token_pattern": token_pattern,
+            }
+            self._next_segment = 0
+            segment_entries = []
+        self.stemmer = Stemmer.Stemmer(self.settings["stemmer_language"]) if self.settings["stemmer_language"] else None
+
+        self._segments: Tuple[Segment, ...] = tuple(self._open_segment(entry) for entry in segment_entries)
+        self._locations: Dict[str, Tuple[str, int]] = {}
+        for segment in self._segments:
+            self._locate(segment)
+        self._remove_unreferenced()
+        if not os.path.exists(manifest_path):
+            self._write_manifest()
+
+        self._closed = False
+        self._merge_requested = threading.Event()
+        self._merger = None
+        if background_merge:
+            self._merger = threading.Thread(target=self._merge_loop, name="bm25-segment-merger", daemon=True)
+            self._merger.start()
+        logger.info(f"Opened segmented BM25 index at {path} with {len(self._segments)} segments")
+
+    @property
+    def segments(self) -> Tuple[Segment, ...]:
+        """The current segments; the tuple is replaced, never modified, on every change."""
+        return self._segments
+
+    def add_nodes(self, nodes: Sequence[BaseNode]) -> None:
+        """
+        Indexes nodes in a new segment.
+
+        Nodes whose IDs are already indexed replace the older versions, which are
+        tombstoned once the new segment is visible.
+
+        Args:
+            nodes: The nodes to add or update.
+        """
+        # The last version of a node ID within the batch wins
+        nodes = list({node.node_id: node for node in nodes}.values())
+        if not nodes:
+            return
+        with self._lock:
+            name = self._reserve_segment_name()
+        index = MmapBM25Index.build(nodes, self._segment_path(name), **self.settings)
+        node_ids = [node.node_id for node in nodes]
+        self._write_node_ids(name, node_ids)
+        segment = Segment(name, index, node_ids, np.zeros(len(node_ids), dtype=bool))
+
+        with self._lock:
+            segments = self._tombstone(self._segments, node_ids)
+            self._segments = segments + (segment,)
+            self._locate(segment)
+            self._write_manifest()
+        bump_index_version()
+        logger.info(f"Added BM25 segment {name} with {len(nodes)} documents")
+        self._merge_requested.set()
+
+    def delete(self, node_ids: Iterable[str]) -> int:
+        """
+        Tombstones the documents of the given node IDs.
+
+        Args:
+            node_ids: The node IDs to delete; unknown IDs are ignored.
+
+        Returns:
+            The number of deleted documents.
+        """
+        with self._lock:
+            node_ids = [node_id for node_id in set(node_ids) if node_id in self._locations]
+            if not node_ids:
+                return 0
+            self._segments = self._tombstone(self._segments, node_ids)
+            self._write_manifest()
+        bump_index_version()
+        logger.debug(f"Tombstoned {len(node_ids)} BM25 documents")
+        self._merge_requested.set()
+        return len(node_ids)
+
+    def maybe_merge(self) -> bool:
+        """
+        Runs one merge if the merge policy asks for it.
+
+        Returns:
+            True if segments were merged.
+        """
+        with self._merge_lock:
+            with self._lock:
+                sources = self._pick_merge(self._segments)
+                if not sources:
+                    return False
+                name = self._reserve_segment_name()
+            merged = self._merge(sources, name)
+
+            with self._lock:
+                merged_names = {segment.name for segment in sources}
+                current = {segment.name: segment for segment in self._segments}
+                if merged is not None:
+                    # Documents deleted or replaced while the merge ran are tombstoned in the result
+                    late_deletes = [
+                        source.node_ids[doc_id]
+                        for source in sources
+                        for doc_id in np.flatnonzero(current[source.name].deleted & ~source.deleted)
+                    ]
+                    rows = {node_id: doc_id for doc_id, node_id in enumerate(merged.node_ids)}
+                    if late_deletes:
+                        merged = merged.with_deleted(rows[node_id] for node_id in late_deletes)
+                remaining = tuple(segment for segment in self._segments if segment.name not in merged_names)
+                self._segments = remaining + ((merged,) if merged is not None else ())
+                for node_id, (segment_name, _) in list(self._locations.items()):
+                    if segment_name in merged_names:
+                        del self._locations[node_id]
+                if merged is not None:
+                    self._locate(merged)
+                self._write_manifest()
+                # Sources still pinned by a reader are dropped when it releases them
+                unpinned = [source for source in sources if not self._readers[source.name]]
+                self._retired.update((source.name, source) for source in sources if self._readers[source.name])
+
+        for source in unpinned:
+            self._drop(source)
+        logger.info(
+            f"Merged BM25 segments {sorted(merged_names)} into "
+            f"{merged.name + f' ({merged.num_docs} documents)' if merged is not None else 'nothing'}"
+        )
+        return True
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[Tuple[Segment, ...]]:
+        """
+        Pins the current segments for as long as the context is open.
+
+        A merge may replace pinned segments, but they are only closed and deleted
+        after every reader that pinned them has released them.
+
+        Yields:
+            The pinned segments.
+        """
+        with self._lock:
+            segments = self._segments
+            for segment in segments:
+                self._readers[segment.name] += 1
+        try:
+            yield segments
+        finally:
+            released = []
+            with self._lock:
+                for segment in segments:
+                    self._readers[segment.name] -= 1
+                    if not self._readers[segment.name]:
+                        del self._readers[segment.name]
+                        if segment.name in self._retired:
+                            released.append(self._retired.pop(segment.name))
+            for segment in released:
+                self._drop(segment)
+
+    def top_k(self, query: str, k: int, segments: Optional[Tuple[Segment, ...]] = None) -> List[Tuple[Segment, int, float]]:
+        """
+        Returns the best `k` live documents of a query across all segments.
+
+        Args:
+            query: The query string.
+            k: The maximum number of documents returned.
+            segments: Segments pinned with `acquire`, which stay open while the results
+                      are read. Defaults to the current segments, which a merge may
+                      close once this call returns.
+
+        Returns:
+            (segment, document ID, score) triples ordered by descending score. Documents
+            that share no term with the query are not returned.
+        """
+        if segments is None:
+            with self.acquire() as segments:
+                return self.top_k(query, k, segments)
+        num_docs = sum(segment.num_docs for segment in segments)
+        if not num_docs:
+            return []
+        avg_doc_length = sum(segment.total_length for segment in segments) / num_docs
+        tokens = tokenize_queries(
+            [query], self.settings["language"], self.stemmer, self.settings["token_pattern"]
+        )[0]
+
+        local_ids = [[segment.index.term_id(token) for token in tokens] for segment in segments]
+        doc_freqs = np.zeros(len(tokens), dtype=np.int64)
+        for segment, term_ids in zip(segments, local_ids):
+            for position, term_id in enumerate(term_ids):
+                if term_id is not None:
+                    doc_freqs[position] += segment.index.doc_freqs([term_id])[0]
+        idf = np.log(1.0 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+        hits, hit_scores = [], []
+        for segment, term_ids in zip(segments, local_ids):
+            present = [position for position, term_id in enumerate(term_ids) if term_id is not None]
+            if not present:
+                continue
+            scores = segment.index.scores(
+                [term_ids[position] for position in present], idf=idf[present], avg_doc_length=avg_doc_length
+            )
+            scores[segment.deleted] = 0.0
+            positive = np.flatnonzero(scores > 0)
+            best = positive[top_indices(scores[positive], k)]
+            hits.extend((segment, int(doc_id)) for doc_id in best)
+            hit_scores.append(scores[best])
+        if not hits:
+            return []
+        hit_scores = np.concatenate(hit_scores)
+        return [(*hits[i], float(hit_scores[i])) for i in top_indices(hit_scores, k)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of segments and of stored, live and tombstoned documents."""
+        segments = self._segments
+        num_docs = sum(segment.num_docs for segment in segments)
+        live_docs = sum(segment.live_docs for segment in segments)
+        return {
+            "segments": len(segments),
+            "num_docs": num_docs,
+            "live_docs": live_docs,
+            "deleted_docs": num_docs - live_docs,
+        }
+
+    def close(self) -> None:
+        """Stops the background merger and unmaps the segments."""
+        self._closed = True
+        self._merge_requested.set()
+        if self._merger is not None:
+            self._merger.join()
+        for segment in self._segments:
+            segment.index.close()
+        for segment in self._retired.values():
+            self._drop(segment)
+        self._retired.clear()
+
+    def _merge_loop(self) -> None:
+        while True:
+            self._merge_requested.wait()
+            if self._closed:
+                return
+            self._merge_requested.clear()
+            try:
+                while not self._closed and self.maybe_merge():
+                    pass
+            except Exception:
+                logger.exception("Background BM25 segment merge failed")
+
+    def _pick_merge(self, segments: Sequence[Segment]) -> List[Segment]:
+        """Returns the segments to merge next, or an empty list."""
+        expunge = [
+            segment for segment in segments
+            if segment.num_docs and 1.0 - segment.live_docs / segment.num_docs >= self.max_deleted_ratio
+        ]
+        if expunge:
+            return expunge[:self.merge_factor]
+        if len(segments) > self.max_segments:
+            return sorted(segments, key=lambda segment: segment.num_docs)[:self.merge_factor]
+        return []
+
+    def _merge(self, sources: Sequence[Segment], name: str) -> Optional[Segment]:
+        """Writes the live documents of the source segments into one new segment, or returns None if none is live."""
+        source_terms = [source.index.terms() for source in sources]
+        vocabulary = sorted(set().union(*source_terms))
+        term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+
+        posting_terms, posting_docs, posting_tf, doc_lengths, corpus_lines, node_ids = [], [], [], [], [], []
+        offset = 0
+        for source, terms in zip(sources, source_terms):
+            index = source.index
+            live = ~source.deleted
+            live_docs = np.flatnonzero(live)
+            new_doc_ids = np.cumsum(live) - 1 + offset
+            local_to_merged = np.fromiter((term_ids[term] for term in terms), dtype=np.int64, count=len(terms))
+            terms_of_postings = np.repeat(local_to_merged, np.diff(index.postings_indptr))
+            docs = np.asarray(index.postings_docs)
+            keep = live[docs]
+            posting_terms.append(terms_of_postings[keep])
+            posting_docs.append(new_doc_ids[docs[keep]])
+            posting_tf.append(np.asarray(index.postings_tf)[keep])
+            doc_lengths.append(np.asarray(index.doc_lengths)[live_docs])
+            corpus_lines.extend(index.corpus_line(doc_id) for doc_id in live_docs)
+            node_ids.extend(source.node_ids[doc_id] for doc_id in live_docs)
+            offset += len(live_docs)
+        if not offset:
+            return None
+
+        # Terms that only occurred in deleted documents are dropped from the vocabulary
+        used_terms, posting_terms = np.unique(np.concatenate(posting_terms), return_inverse=True)
+        posting_docs = np.concatenate(posting_docs)
+        order = np.lexsort((posting_docs, posting_terms))
+        postings_indptr = np.zeros(len(used_terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(used_terms)), out=postings_indptr[1:])
+
+        path = self._segment_path(name)
+        write_index(
+            path,
+            terms=[vocabulary[term_id].encode("utf-8") for term_id in used_terms],
+            postings_indptr=postings_indptr,
+            postings_docs=posting_docs[order],
+            postings_tf=np.concatenate(posting_tf)[order],
+            doc_lengths=np.concatenate(doc_lengths),
+            corpus_lines=corpus_lines,
+            **self.settings
+        )
+        self._write_node_ids(name, node_ids)
+        return Segment(name, MmapBM25Index(path), node_ids, np.zeros(len(node_ids), dtype=bool))
+
+    def _drop(self, segment: Segment) -> None:
+        """Closes a segment replaced by a merge and deletes its directory."""
+        segment.index.close()
+        shutil.rmtree(self._segment_path(segment.name), ignore_errors=True)
+
+    def _tombstone(self, segments: Tuple[Segment, ...], node_ids: Iterable[str]) -> Tuple[Segment, ...]:
+        """Returns the segments with the current documents of the node IDs tombstoned."""
+        doomed: Dict[str, List[int]] = {}
+        for node_id in node_ids:
+            location = self._locations.pop(node_id, None)
+            if location is not None:
+                doomed.setdefault(location[0], []).append(location[1])
+        return tuple(
+            segment.with_deleted(doomed[segment.name]) if segment.name in doomed else segment
+            for segment in segments
+        )
+
+    def _locate(self, segment: Segment) -> None:
+        for doc_id in np.flatnonzero(~segment.deleted):
+            self._locations[segment.node_ids[doc_id]] = (segment.name, int(doc_id))
+
+    def _reserve_segment_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.path, SEGMENTS_DIRNAME, name)
+
+    def _open_segment(self, entry: Dict[str, Any]) -> Segment:
+        index = MmapBM25Index(self._segment_path(entry["name"]))
+        with open(os.path.join(self._segment_path(entry["name"]), NODE_IDS_FILENAME), encoding="utf-8") as f:
+            node_ids = json.load(f)
+        deleted = np.zeros(index.num_docs, dtype=bool)
+        deleted[entry["deleted"]] = True
+        return Segment(entry["name"], index, node_ids, deleted)
+
+    def _write_node_ids(self, name: str, node_ids: List[str]) -> None:
+        with open(os.path.join(self._segment_path(name), NODE_IDS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(node_ids, f)
+
+    def _write_manifest(self) -> None:
+        """Atomically replaces the manifest with the current segment list."""
+        manifest = {
+            "settings": self.settings,
+            "next_segment": self._next_segment,
+            "segments": [
+                {"name": segment.name, "deleted": np.flatnonzero(segment.deleted).tolist()}
+                for segment in self._segments
+            ],
+        }
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f".{MANIFEST_FILENAME}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILENAME))
+
+    def _remove_unreferenced(self) -> None:
+        """Removes segment directories left behind by an interrupted ingest or merge."""
+        segments_path = os.path.join(self.path, SEGMENTS_DIRNAME)
+        if not os.path.isdir(segments_path):
+            return
+        referenced = {segment.name for segment in self._segments}
+        for name in os.listdir(segments_path):
+            if name not in referenced:
+                logger.debug(f"Removing unreferenced BM25 segment directory {name}")
+                shutil.rmtree(os.path.join(segments_path, name), ignore_errors=True)
+
+
+class SegmentedBM25Retriever(BaseRetriever):
+    """A BM25 retriever over a SegmentedBM25Index that sees every committed insert and delete."""
+    def __init__(
+        self,
+        index: SegmentedBM25Index,
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False
+    ):
+        self.index = index
+        self.similarity_top_k = similarity_top_k
+        super().__init__(callback_manager=callback_manager, verbose=verbose)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # The documents are read from the same pinned segments that were scored
+        with self.index.acquire() as segments:
+            return [
+                NodeWithScore(node=metadata_dict_to_node(segment.index.document(doc_id)), score=score)
+                for segment, doc_id, score in self.index.top_k(query_bundle.query_str, self.similarity_top_k, segments)
+            ]
@@ -0,0 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+from llama_index.core.callbacks.base import CallbackManager
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+import logging
+import multiprocessing
+import numpy as np
+from .bm25_index import MmapBM25Index, MmapBM25Retriever
+
+logger = logging.getLogger(__name__)
+
+# The index and weights opened by a shard worker process, set by _init_worker
+_worker_index: Optional[MmapBM25Index] = None
+_worker_weights: Optional[np.ndarray] = None
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _init_worker(path: str, weights_name: Optional[str], num_docs: int) -> None:
+    """Opens the index and attaches the shared weight mask once per worker process."""
+    global _worker_index, _worker_weights, _worker_memory
+    _worker_index = MmapBM25Index(path)
+    if weights_name is not None:
+        _worker_memory = shared_memory.SharedMemory(name=weights_name)
+        _worker_weights = np.ndarray((num_docs,), dtype=np.float32, buffer=_worker_memory.buf)
+
+
+def _search_shard(
+    doc_range: Tuple[int, int],
+    queries: List[List[int]],
+    k: int
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Returns the local top k of every query within one shard."""
+    return [
+        _worker_index.top_k(term_ids, k, weight_mask=_worker_weights, doc_range=doc_range)
+        for term_ids in queries
+    ]
+
+
+def _ping() -> bool:
+    return True
+
+
+def merge_shard_results(results: Sequence[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merges the local top k lists of the shards into the global top k.
+
+    Ties are broken by document ID, so the merged result does not depend on
+    the order in which the shards answered.
+    """
+    if not results:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    doc_ids = np.concatenate([docs for docs, _ in results]).astype(np.int64)
+    scores = np.concatenate([shard_scores for _, shard_scores in results]).astype(np.float32)
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return doc_ids[order], scores[order]
+
+
+class ShardedBM25:
+    """
+    Scores a MmapBM25Index in parallel worker processes, one document range per shard.
+
+    The index is split into `num_shards` contiguous document ID ranges. Every worker
+    maps the same index files, so the postings live once in the page cache and are
+    shared by all workers instead of being copied. The per-document weight mask is
+    placed in a shared memory block for the same reason. Because the shards are
+    ranges of one index, the IDF and average document length are global
+    statistics, and merging the local top k lists gives exactly the scores of
+    single-process scoring. A query sends only its term IDs to the
+    workers, and only the k best documents of each shard are sent back.
+    """
+    def __init__(
+        self,
+        index: MmapBM25Index,
+        num_shards: int = 4,
+        weight_mask: Optional[Sequence[float]] = None,
+        start_method: str = "spawn"
+    ):
+        """
+        Initializes the shards and starts one worker process per shard.
+
+        Args:
+            index: The opened index; the workers open it again from `index.path`.
+            num_shards: The number of shards and worker processes.
+            weight_mask: An optional per-document weight the scores are multiplied with.
+            start_method: The multiprocessing start method. "spawn" is the default because
+                          forking a process that runs model or merge threads is unsafe.
+
+        Raises:
+            ValueError: If num_shards is not positive or the weight mask has the wrong length.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be positive")
+        self.index = index
+        self.num_shards = min(num_shards, max(index.num_docs, 1))
+        bounds = np.linspace(0, index.num_docs, self.num_shards + 1).astype(np.int64)
+        self.doc_ranges = [(int(low), int(high)) for low, high in zip(bounds[:-1], bounds[1:])]
+
+        self._memory = None
+        if weight_mask is not None:
+            weight_mask = np.asarray(weight_mask, dtype=np.float32)
+            if len(weight_mask) != index.num_docs:
+                raise ValueError(f"weight_mask has {len(weight_mask)} entries for {index.num_docs} documents")
+            self._memory = shared_memory.SharedMemory(create=True, size=max(weight_mask.nbytes, 1))
+            np.ndarray(weight_mask.shape, dtype=np.float32, buffer=self._memory.buf)[:] = weight_mask
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_shards,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(index.path, self._memory.name if self._memory else None, index.num_docs),
+        )
+        # Start every worker now, so the first query does not pay for process startup
+        for future in [self._executor.submit(_ping) for _ in range(self.num_shards)]:
+            future.result()
+        logger.info(f"Started {self.num_shards} BM25 shard workers for {index.path}")
+
+    def top_k(self, term_ids: Sequence[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the best `k` documents of a tokenized query across all shards.
+
+        Args:
+            term_ids: The term IDs of the query.
+            k: The maximum number of documents returned.
+
+        Returns:
+            The document IDs and scores ordered by descending score, like MmapBM25Index.top_k.
+        """
+        return self.top_k_batch([term_ids], k)[0]
+
+    def top_k_batch(self, queries: Sequence[Sequence[int]], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the best `k` documents of several tokenized queries.
+
+        Every shard receives all queries in one task, so a batch costs one
+        round trip per worker rather than one per query.
+        """
+        queries = [[int(term_id) for term_id in term_ids] for term_ids in queries]
+        if not queries:
+            return []
+        futures = [self._executor.submit(_search_shard, doc_range, queries, k) for doc_range in self.doc_ranges]
+        shard_results = [future.result() for future in futures]
+        return [
+            merge_shard_results([results[i] for results in shard_results], k)
+            for i in range(len(queries))
+        ]
+
+    def close(self) -> None:
+        """Stops the worker processes and frees the shared weight mask."""
+        self._executor.shutdown(wait=True)
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+class ShardedBM25Retriever(MmapBM25Retriever):
+    """A MmapBM25Retriever that scores the index with ShardedBM25 worker processes."""
+    def __init__(
+        self,
+        index: MmapBM25Index,
+        similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+        corpus_weight_mask: Optional[List[int]] = None,
+        callback_manager: Optional[CallbackManager] = None,
+        verbose: bool = False,
+        num_shards: int = 4
+    ):
+        super().__init__(index, similarity_top_k, corpus_weight_mask, callback_manager, verbose)
+        self.shards = ShardedBM25(index, num_shards=num_shards, weight_mask=self.corpus_weight_mask)
+
+    def _top_k(self, term_ids: List[int], weight_mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        # The corpus weight mask already lives in the shards' shared memory
+        return self.shards.top_k(term_ids, self.similarity_top_k)
+
+    def close(self) -> None:
+        """Stops the shard worker processes."""
+        self.shards.close()
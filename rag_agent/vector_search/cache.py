@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from llama_index.core.schema import NodeWithScore
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_index_version = 0
+_index_version_lock = threading.Lock()
+
+
+def get_index_version() -> int:
+    """Returns the current process-wide index version."""
+    return _index_version
+
+
+def bump_index_version() -> int:
+    """
+    Marks the indexed data as changed.
+
+    Cached retrieval results are keyed by the index version, so entries created
+    before the bump are no longer served.
+
+    Returns:
+        The new index version.
+    """
+    global _index_version
+    with _index_version_lock:
+        _index_version += 1
+        logger.debug(f"Index version bumped to {_index_version}")
+        return _index_version
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a query for cache lookups: case-folded with collapsed whitespace."""
+    return " ".join(query.casefold().split())
+
+
+def copy_nodes(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+    """
+    Returns fresh wrappers so callers cannot change cached scores.
+
+    model_copy keeps the wrapper type, so a FusedNodeWithScore keeps its branch
+    scores and ranks.
+    """
+    return [node.model_copy() for node in nodes]
+
+
+def estimate_nodes_size(nodes: List[NodeWithScore]) -> int:
+    """Roughly estimates the memory held by a list of nodes, in bytes."""
+    size = 0
+    for node in nodes:
+        size += 256 + len(node.node.get_content().encode("utf-8"))
+        size += len(str(node.node.metadata).encode("utf-8"))
+    return size
+
+
+class _CacheEntry:
+    __slots__ = ("nodes", "size", "expires_at")
+
+    def __init__(self, nodes: List[NodeWithScore], size: int, expires_at: Optional[float]):
+        self.nodes = nodes
+        self.size = size
+        self.expires_at = expires_at
+
+
+class RetrievalCache:
+    """
+    A thread-safe LRU cache of reranked retrieval results with TTL expiry and a memory cap.
+
+    Entries are keyed by the normalized query, the retriever configuration and the
+    index version, so any ingest that bumps the index version stops stale results
+    from being served.
+    """
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 300.0,
+        max_bytes: Optional[int] = 64 * 1024 * 1024
+    ):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries: The maximum number of cached queries.
+            ttl_seconds: How long an entry is served after it was stored. None disables expiry.
+            max_bytes: The approximate memory budget for cached nodes. None disables the cap.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, query: str, config: Hashable) -> Tuple:
+        """Builds the cache key of a query under a retriever configuration."""
+        return (normalize_query(query), config, get_index_version())
+
+    def get(self, key: Tuple) -> Optional[List[NodeWithScore]]:
+        """
+        Returns the cached nodes for a key, or None on a miss.
+
+        Args:
+            key: A key built with `make_key`.
+
+        Returns:
+            A copy of the cached node list, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy_nodes(entry.nodes)
+
+    def put(self, key: Tuple, nodes: List[NodeWithScore]) -> None:
+        """
+        Stores the nodes for a key, evicting the least recently used entries if needed.
+
+        Args:
+            key: A key built with `make_key`.
+            nodes: The reranked nodes to cache.
+        """
+        if key[-1] != get_index_version():
+            # The index changed while this result was being computed
+            return
+        size = estimate_nodes_size(nodes)
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.debug(f"Result of {size} bytes exceeds the cache memory cap; not cached.")
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(copy_nodes(nodes), size, expires_at)
+            self._size += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._size > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit, miss and eviction counters and the current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
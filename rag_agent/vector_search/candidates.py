@@ -0,0 +1,171 @@
+from llama_index.core.schema import BaseNode, NodeWithScore
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .fusion import FusedNodeWithScore
+
+
+def top_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Returns the indices of the `k` highest scores in descending score order.
+
+    Only the top `k` are partitioned out and sorted, so selecting a few rows from
+    many costs O(n + k log k). Ties keep their original order.
+
+    Args:
+        scores: A float array of scores.
+        k: The number of indices returned; None returns all of them.
+
+    Returns:
+        An int array of at most `k` indices.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if k is not None and k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k is None or k >= len(scores):
+        selected = np.arange(len(scores))
+    else:
+        selected = np.argpartition(-scores, k - 1)[:k]
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def _object_array(items: Sequence) -> np.ndarray:
+    # Filled element by element so NumPy never tries to unpack the items
+    array = np.empty(len(items), dtype=object)
+    for i, item in enumerate(items):
+        array[i] = item
+    return array
+
+
+class CandidateBatch:
+    """
+    Fused retrieval candidates in columnar form.
+
+    Every unique node is one row of parallel arrays: its id, node and text, the
+    raw score of every branch (NaN where the branch did not return it), the 0-based
+    rank in every branch (-1 where missing) and the current score, which is the
+    fused score after the merge and the reranker score after reranking. Fusion,
+    thresholds, sorting and top-k selection work on whole arrays; NodeWithScore
+    objects are only created by `to_nodes` for the rows that leave the pipeline.
+    """
+    __slots__ = ("branch_names", "ids", "nodes", "texts", "branch_scores", "branch_ranks", "scores")
+
+    def __init__(
+        self,
+        branch_names: Sequence[str],
+        ids: np.ndarray,
+        nodes: np.ndarray,
+        texts: List[str],
+        branch_scores: np.ndarray,
+        branch_ranks: np.ndarray,
+        scores: np.ndarray
+    ):
+        self.branch_names = tuple(branch_names)
+        self.ids = ids
+        self.nodes = nodes
+        self.texts = texts
+        self.branch_scores = branch_scores
+        self.branch_ranks = branch_ranks
+        self.scores = scores
+
+    @classmethod
+    def from_branches(cls, names: Sequence[str], branches: Sequence[List[NodeWithScore]]) -> "CandidateBatch":
+        """
+        Collects the unique nodes of the branch results into one batch.
+
+        Rows follow the order in which the nodes are first seen, and a branch that
+        returns the same node twice keeps its best rank. The branch results are not
+        modified and `scores` starts out as NaN.
+
+        Args:
+            names: The branch names, one per result list.
+            branches: The nodes returned by every branch, best first.
+
+        Returns:
+            The candidate batch.
+        """
+        positions: Dict[str, int] = {}
+        nodes: List[BaseNode] = []
+        columns = []
+        for branch in branches:
+            rows = np.empty(len(branch), dtype=np.int64)
+            values = np.empty(len(branch), dtype=np.float64)
+            for rank, node_with_score in enumerate(branch):
+                row = positions.setdefault(node_with_score.node_id, len(nodes))
+                if row == len(nodes):
+                    nodes.append(node_with_score.node)
+                rows[rank] = row
+                values[rank] = node_with_score.score if node_with_score.score is not None else np.nan
+            columns.append((rows, values))
+
+        branch_scores = np.full((len(nodes), len(branches)), np.nan)
+        branch_ranks = np.full((len(nodes), len(branches)), -1, dtype=np.int64)
+        for column, (rows, values) in enumerate(columns):
+            # np.unique returns the first, i.e. best ranked, occurrence of every row
+            unique_rows, first = np.unique(rows, return_index=True)
+            branch_scores[unique_rows, column] = values[first]
+            branch_ranks[unique_rows, column] = first
+
+        return cls(
+            names,
+            ids=_object_array([node.node_id for node in nodes]),
+            nodes=_object_array(nodes),
+            texts=[node.get_content() for node in nodes],
+            branch_scores=branch_scores,
+            branch_ranks=branch_ranks,
+            scores=np.full(len(nodes), np.nan),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"CandidateBatch(candidates={len(self)}, branches={list(self.branch_names)})"
+
+    def with_scores(self, scores: np.ndarray) -> "CandidateBatch":
+        """Returns a batch sharing the rows of this one with new current scores."""
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        if len(scores) != len(self):
+            raise ValueError(f"Expected {len(self)} scores, got {len(scores)}")
+        return CandidateBatch(
+            self.branch_names, self.ids, self.nodes, self.texts, self.branch_scores, self.branch_ranks, scores
+        )
+
+    def take(self, indices: np.ndarray) -> "CandidateBatch":
+        """Returns a batch with the given rows, in the given order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return CandidateBatch(
+            self.branch_names,
+            ids=self.ids[indices],
+            nodes=self.nodes[indices],
+            texts=[self.texts[i] for i in indices],
+            branch_scores=self.branch_scores[indices],
+            branch_ranks=self.branch_ranks[indices],
+            scores=self.scores[indices],
+        )
+
+    def top_k(self, k: Optional[int] = None) -> "CandidateBatch":
+        """Returns the `k` rows with the highest current score, best first; None sorts every row."""
+        return self.take(top_indices(self.scores, k))
+
+    def to_nodes(self) -> List[FusedNodeWithScore]:
+        """Converts the rows to FusedNodeWithScore objects, keeping their order."""
+        branch_scores = self.branch_scores.tolist()
+        branch_ranks = self.branch_ranks.tolist()
+        scores = self.scores.tolist()
+        fused_nodes = []
+        for row, node in enumerate(self.nodes):
+            present = [column for column, rank in enumerate(branch_ranks[row]) if rank >= 0]
+            fused_nodes.append(
+                FusedNodeWithScore(
+                    node=node,
+                    score=None if np.isnan(scores[row]) else scores[row],
+                    branch_scores={
+                        self.branch_names[column]: (
+                            None if np.isnan(branch_scores[row][column]) else branch_scores[row][column]
+                        )
+                        for column in present
+                    },
+                    branch_ranks={self.branch_names[column]: branch_ranks[row][column] for column in present},
+                )
+            )
+        return fused_nodes
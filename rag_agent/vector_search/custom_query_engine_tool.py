@@ -1,14 +1,98 @@
 import logging
-from typing import Any, List, Optional
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+import contextlib
 import pandas as pd
-from llama_index.core.tools import QueryEngineTool, ToolOutput
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.callbacks import CallbackManager, CBEventType
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.tools import QueryEngineTool, ToolMetadata, ToolOutput
+from .hybrid_retriever import RetrievalUpdate
+from .metrics import RetrievalMetrics
 
 logger = logging.getLogger(__name__)
 
+_STAGES = {CBEventType.RETRIEVE: "retrieval", CBEventType.SYNTHESIZE: "synthesis"}
+
+# The stage timer of the tool call running in the current thread or task.
+_active_timer: ContextVar[Optional["_StageTimer"]] = ContextVar("_active_timer", default=None)
+
+
+class _StageTimer:
+    """Times the outermost retrieve and synthesize events of one tool call."""
+
+    def __init__(self, metrics: RetrievalMetrics):
+        self.metrics = metrics
+        self._open: Dict[str, tuple] = {}
+
+    def start(self, event_type: CBEventType, event_id: str) -> None:
+        stage = _STAGES.get(event_type)
+        # A retriever nested in another one (e.g. a HybridRetriever branch) is not timed again.
+        if stage is not None and stage not in self._open:
+            self._open[stage] = (event_id, time.perf_counter())
+
+    def end(self, event_type: CBEventType, event_id: str) -> None:
+        stage = _STAGES.get(event_type)
+        opened = self._open.get(stage)
+        if opened is not None and opened[0] == event_id:
+            del self._open[stage]
+            self.metrics.observe(stage, time.perf_counter() - opened[1])
+
+
+class _StageTimingHandler(BaseCallbackHandler):
+    """Forwards the query engine's callback events to the stage timer of the active tool call."""
+
+    def __init__(self) -> None:
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+
+    def on_event_start(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        timer = _active_timer.get()
+        if timer is not None:
+            timer.start(event_type, event_id)
+        return event_id
+
+    def on_event_end(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "", **kwargs: Any) -> None:
+        timer = _active_timer.get()
+        if timer is not None:
+            timer.end(event_type, event_id)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+
 class CustomQueryEngineTool(QueryEngineTool):
 
+    def __init__(
+        self,
+        query_engine: BaseQueryEngine,
+        metadata: ToolMetadata,
+        resolve_input_errors: bool = True,
+        metrics: Optional[RetrievalMetrics] = None
+    ) -> None:
+        """
+        Initializes the tool.
+
+        Args:
+            query_engine (BaseQueryEngine): The query engine answering the tool calls.
+            metadata (ToolMetadata): The name and description of the tool.
+            resolve_input_errors (bool): Whether malformed tool input is resolved.
+            metrics (Optional[RetrievalMetrics]): Optional metrics recording the latency of
+                every query engine call as the "query" stage. The "retrieval" and
+                "synthesis" stages are recorded from the engine's callback events where
+                it emits them. It can also be assigned after `from_defaults`.
+        """
+        super().__init__(query_engine=query_engine, metadata=metadata, resolve_input_errors=resolve_input_errors)
+        self.metrics = metrics
+
     def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
-        
+        """
+        Performs a synchronous query to the wrapped query_engine.
 
         Retrieves the query string from arguments, executes the query, and formats
         the response to include relevant document metadata. Error handling is included
@@ -26,7 +110,8 @@ class CustomQueryEngineTool(QueryEngineTool):
         
         query_str = self._get_query_str(*args, **kwargs)
         try:
-            response = self._query_engine.query(query_str)
+            with self._time("query"), self._time_stages():
+                response = self._query_engine.query(query_str)
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Query engine response received. Response metadata: {response.metadata}")
                 logger.debug(f"Response text: {response.response[:100]}...")
@@ -44,6 +129,7 @@ class CustomQueryEngineTool(QueryEngineTool):
                 raw_output=response,
             )
         except Exception as e:
+            self._increment("query_errors")
             logger.error(f"Error processing query '{query_str}': {e}", exc_info=True)
             return ToolOutput(
                 content=f"Error processing query: {str(e)}",
@@ -71,7 +157,8 @@ class CustomQueryEngineTool(QueryEngineTool):
         
         query_str = self._get_query_str(*args, **kwargs)
         try:
-            response = await self._query_engine.aquery(query_str)
+            with self._time("query"), self._time_stages():
+                response = await self._query_engine.aquery(query_str)
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Async query engine response received. Response metadata: {response.metadata}")
                 logger.debug(f"Response text: {response.response[:100]}...")
@@ -88,6 +175,7 @@ class CustomQueryEngineTool(QueryEngineTool):
                 raw_output=response,
             )
         except Exception as e:
+            self._increment("query_errors")
             logger.error(f"Error processing async query '{query_str}': {e}", exc_info=True)
             return ToolOutput(
                 content=f"Error processing query: {str(e)}",
@@ -96,14 +184,45 @@ class CustomQueryEngineTool(QueryEngineTool):
                 raw_output=None,
             )
 
+    async def astream_nodes(self, *args: Any, **kwargs: Any) -> AsyncIterator[RetrievalUpdate]:
+        """
+        Streams the retrieval results of the wrapped query engine's retriever.
+
+        With a HybridRetriever the nodes of the first finished branch arrive before
+        the reranked ones, so prompt construction or a speculative LLM call can start
+        before retrieval is complete. Other retrievers yield a single final update.
+
+        Args:
+            *args: Positional arguments passed to the tool, expected to contain the query string.
+            **kwargs: Keyword arguments passed to the tool.
+
+        Yields:
+            RetrievalUpdate: Provisional updates followed by one final update.
+        """
+        query_str = self._get_query_str(*args, **kwargs)
+        retriever = getattr(self._query_engine, "retriever", None)
+        if retriever is None:
+            raise ValueError("The wrapped query engine does not expose a retriever")
+        if hasattr(retriever, "astream"):
+            async for update in retriever.astream(query_str):
+                yield update
+        else:
+            nodes = await retriever.aretrieve(query_str)
+            yield RetrievalUpdate("final", nodes, is_final=True)
+
     def get_response_with_metadata(self, response: str, metadata: Optional[dict]) -> str:
+        """
+        Appends the names and links of the source documents to the response text.
+
+        Args:
+            response (str): The text generated by the query engine.
+            metadata (Optional[dict]): The response metadata, keyed by node ID.
 
         Returns:
             str: The combined response string, including the generated text and
                  formatted source document information.
         """
-        documents_info = "Source documents:
-"
+        documents_info = "Source documents:\n"
         if metadata and isinstance(metadata, dict):
             try:
                 documents_df = pd.DataFrame(list(metadata.values()))
@@ -111,26 +230,62 @@ class CustomQueryEngineTool(QueryEngineTool):
                      documents_df.drop_duplicates(subset='file_name', inplace=True)
                 for _, document in documents_df.iterrows():
                     document_info = (
-                        f"  Document name: {document.get('file_name', 'N/A')}
-"
-                        f"  Document link: {document.get('url', 'N/A')}
-"
+                        f"  Document name: {document.get('file_name', 'N/A')}\n"
+                        f"  Document link: {document.get('url', 'N/A')}\n"
                     )                    
                     documents_info += document_info
             except Exception as e:
                 logger.error(f"Error processing document metadata: {e}", exc_info=True)
-                documents_info += "  Error processing document metadata.
-"
+                documents_info += "  Error processing document metadata.\n"
         else:
-            documents_info += "  No relevant documents found.
-"
-        response_with_docs_info = f"{response}
-
-{documents_info}"
+            documents_info += "  No relevant documents found.\n"
+        response_with_docs_info = f"{response}\n\n{documents_info}"
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"Formatted response content: {response_with_docs_info}")
         return response_with_docs_info
 
+    @contextlib.contextmanager
+    def _time_stages(self):
+        """
+        Records the retrieval and synthesis latencies of the query run in the `with` block.
+
+        The engine, its retriever and its response synthesizer report these stages as
+        callback events, so a timing handler is added to their callback managers once.
+        """
+        if self.metrics is None:
+            yield
+            return
+        for callback_manager in self._callback_managers():
+            if not any(isinstance(handler, _StageTimingHandler) for handler in callback_manager.handlers):
+                callback_manager.add_handler(_StageTimingHandler())
+        token = _active_timer.set(_StageTimer(self.metrics))
+        try:
+            yield
+        finally:
+            _active_timer.reset(token)
+
+    def _callback_managers(self) -> list:
+        """Returns the distinct callback managers of the engine and its components."""
+        components = [
+            self._query_engine,
+            getattr(self._query_engine, "retriever", None),
+            getattr(self._query_engine, "_response_synthesizer", None),
+        ]
+        managers = {}
+        for component in components:
+            callback_manager = getattr(component, "callback_manager", None)
+            if isinstance(callback_manager, CallbackManager):
+                managers[id(callback_manager)] = callback_manager
+        return list(managers.values())
+
+    def _time(self, stage: str):
+        """Returns a context manager recording the stage latency if metrics are enabled."""
+        return self.metrics.time(stage) if self.metrics is not None else contextlib.nullcontext()
+
+    def _increment(self, name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
     def _get_query_str(self, *args: Any, **kwargs: Any) -> str:
         """Helper to extract the query string from args or kwargs."""
         if args:
@@ -1,5 +1,6 @@
 from llama_index.core import Document, SimpleDirectoryReader, VectorStoreIndex
 from typing import List, Optional
+from .cache import bump_index_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,19 +15,18 @@ class DocumentLoader:
     def __init__(self, directory_path: Optional[str] = None):
         """
         Initializes the DocumentLoader with an optional directory path.
+
+        Args:
+            directory_path: Optional. The default directory to load documents from.
         """
-        
-        
-        
-        
         self.directory_path = directory_path
         logger.debug(f"DocumentLoader initialized with directory_path: {self.directory_path}")
-        """
-        self.directory_path = directory_path
-        logger.info(f"DocumentLoader initialized with directory_path: {self.directory_path}")
 
 
     def load_documents(self, directory_path: Optional[str] = None) -> List[Document]:
+        """
+        Loads documents from a directory.
+
         Args:
             directory_path: Optional. Overrides the directory_path provided in __init__.
 
@@ -55,7 +55,19 @@ class DocumentLoader:
 
 
     def create_index(self, documents: List[Document], vector_store) -> Optional[VectorStoreIndex]:
-        
+        """
+        Creates a VectorStoreIndex over the documents in the given vector store.
+
+        A successful ingest bumps the index version, so cached retrieval results
+        computed before it are no longer served.
+
+        Args:
+            documents: The documents to index.
+            vector_store: The vector store the index is built on.
+
+        Returns:
+            The created index, or None if nothing was indexed.
+        """
         if not documents:
             logger.warning("No documents provided for indexing. Skipping index creation.")
             return None
@@ -67,6 +79,7 @@ class DocumentLoader:
         logger.debug(f"Creating index with {len(documents)} documents using the provided vector store.")
         try:
             index = VectorStoreIndex.from_documents(documents,vector_store=vector_store)
+            bump_index_version()
             logger.debug(f"Index created successfully with {len(documents)} documents.")
             return index
         except Exception as e:
@@ -0,0 +1,290 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date, datetime
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.retrievers.bm25 import BM25Retriever
+from qdrant_client.http import models as rest
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import threading
+import numpy as np
+from .bm25_batch import doc_term_matrix, query_token_ids
+
+logger = logging.getLogger(__name__)
+
+
+def _as_datetime(value: Any) -> Any:
+    """Converts dates and ISO 8601 strings to datetimes so they compare with datetime bounds."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+class FieldCondition(ABC):
+    """
+    Base class for a condition on one node metadata field.
+
+    A condition is evaluated locally against a metadata dictionary and compiled
+    into the equivalent Qdrant payload condition, so both retrieval branches
+    apply exactly the same restriction.
+    """
+    def __init__(self, key: str):
+        self.key = key
+
+    @abstractmethod
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """Returns True if the metadata satisfies the condition."""
+
+    @abstractmethod
+    def to_qdrant(self) -> rest.Condition:
+        """Returns the condition as a Qdrant payload condition."""
+
+    @abstractmethod
+    def cache_key(self) -> tuple:
+        """Returns a hashable description of the condition."""
+
+
+class Match(FieldCondition):
+    """The field equals a value, e.g. a tenant ID."""
+    def __init__(self, key: str, value: Any):
+        super().__init__(key)
+        self.value = value
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        return metadata.get(self.key) == self.value
+
+    def to_qdrant(self) -> rest.Condition:
+        return rest.FieldCondition(key=self.key, match=rest.MatchValue(value=self.value))
+
+    def cache_key(self) -> tuple:
+        return ("match", self.key, self.value)
+
+
+class MatchAny(FieldCondition):
+    """The field equals any of the values, e.g. one of a set of file names."""
+    def __init__(self, key: str, values: Sequence[Any]):
+        super().__init__(key)
+        self.values = frozenset(values)
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        return metadata.get(self.key) in self.values
+
+    def to_qdrant(self) -> rest.Condition:
+        return rest.FieldCondition(key=self.key, match=rest.MatchAny(any=sorted(self.values, key=repr)))
+
+    def cache_key(self) -> tuple:
+        return ("match_any", self.key, tuple(sorted(self.values, key=repr)))
+
+
+class Range(FieldCondition):
+    """
+    The field lies in a numeric or date range.
+
+    If any bound is a date or datetime the range is a date range: ISO 8601 strings
+    in the metadata are compared as datetimes, and Qdrant receives a DatetimeRange.
+    """
+    def __init__(self, key: str, gte: Any = None, gt: Any = None, lte: Any = None, lt: Any = None):
+        super().__init__(key)
+        bounds = (gte, gt, lte, lt)
+        if all(bound is None for bound in bounds):
+            raise ValueError("Range needs at least one bound")
+        self.is_datetime = any(isinstance(bound, date) for bound in bounds)
+        if self.is_datetime:
+            gte, gt, lte, lt = (_as_datetime(bound) if bound is not None else None for bound in bounds)
+        self.gte, self.gt, self.lte, self.lt = gte, gt, lte, lt
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        value = metadata.get(self.key)
+        if value is None:
+            return False
+        if self.is_datetime:
+            value = _as_datetime(value)
+        try:
+            return (
+                (self.gte is None or value >= self.gte)
+                and (self.gt is None or value > self.gt)
+                and (self.lte is None or value <= self.lte)
+                and (self.lt is None or value < self.lt)
+            )
+        except TypeError:
+            # The field holds a value that cannot be compared with the bounds
+            return False
+
+    def to_qdrant(self) -> rest.Condition:
+        range_type = rest.DatetimeRange if self.is_datetime else rest.Range
+        return rest.FieldCondition(
+            key=self.key,
+            range=range_type(gte=self.gte, gt=self.gt, lte=self.lte, lt=self.lt)
+        )
+
+    def cache_key(self) -> tuple:
+        return ("range", self.key, self.gte, self.gt, self.lte, self.lt)
+
+
+class RetrievalFilter:
+    """
+    A metadata filter applied inside both retrieval branches.
+
+    All `must` conditions have to hold and no `must_not` condition may hold. The
+    filter compiles into a Qdrant payload filter for the dense branch and, through
+    BM25FilterIndex, into a document mask for the BM25 branch, so filtered
+    queries only score matching documents instead of post-filtering a full list.
+
+    Example:
+        RetrievalFilter(must=[
+            MatchAny("file_name", ["report.pdf", "notes.md"]),
+            Match("tenant", "acme"),
+            Range("creation_date", gte=date(2024, 1, 1)),
+        ])
+    """
+    def __init__(self, must: Sequence[FieldCondition] = (), must_not: Sequence[FieldCondition] = ()):
+        """
+        Initializes the filter.
+
+        Args:
+            must: Conditions that all have to hold.
+            must_not: Conditions none of which may hold.
+
+        Raises:
+            ValueError: If no condition is given.
+        """
+        if not must and not must_not:
+            raise ValueError("RetrievalFilter needs at least one condition")
+        self.must = tuple(must)
+        self.must_not = tuple(must_not)
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """Returns True if a node with this metadata passes the filter."""
+        return (
+            all(condition.matches(metadata) for condition in self.must)
+            and not any(condition.matches(metadata) for condition in self.must_not)
+        )
+
+    def to_qdrant(self) -> rest.Filter:
+        """Returns the filter as a Qdrant payload filter."""
+        return rest.Filter(
+            must=[condition.to_qdrant() for condition in self.must] or None,
+            must_not=[condition.to_qdrant() for condition in self.must_not] or None,
+        )
+
+    def cache_key(self) -> tuple:
+        """Returns a hashable description of the filter for cache keys."""
+        return (
+            tuple(sorted((condition.cache_key() for condition in self.must), key=repr)),
+            tuple(sorted((condition.cache_key() for condition in self.must_not), key=repr)),
+        )
+
+
+def combine_qdrant_filters(existing: Optional[rest.Filter], retrieval_filter: RetrievalFilter) -> rest.Filter:
+    """Returns a Qdrant filter requiring both an existing filter and a RetrievalFilter."""
+    compiled = retrieval_filter.to_qdrant()
+    if existing is None:
+        return compiled
+    return rest.Filter(must=[existing, compiled])
+
+
+def post_filter(nodes: List[NodeWithScore], retrieval_filter: RetrievalFilter) -> List[NodeWithScore]:
+    """Drops the nodes whose metadata does not pass the filter."""
+    return [node for node in nodes if retrieval_filter.matches(node.node.metadata)]
+
+
+class BM25FilterIndex:
+    """
+    Precomputed per-filter document subsets of a BM25Retriever index.
+
+    For every filter the matching documents are found once and the rows of the
+    bm25s score matrix are sliced to them. Filtered queries then sum the
+    postings of the matching documents only, so their cost shrinks with the
+    selectivity of the filter. The most recently used subsets are kept.
+    """
+    def __init__(self, retriever: BM25Retriever, max_filters: int = 32):
+        """
+        Initializes the index. Nothing is computed until a filter is first used.
+
+        Args:
+            retriever: The BM25 retriever whose index is filtered.
+            max_filters: The maximum number of cached filter subsets.
+        """
+        self.retriever = retriever
+        self.max_filters = max_filters
+        self._lock = threading.Lock()
+        self._bm25 = None
+        self._doc_term_scores = None
+        self._subsets: "OrderedDict[tuple, Tuple[np.ndarray, Any]]" = OrderedDict()
+
+    def mask(self, retrieval_filter: RetrievalFilter) -> np.ndarray:
+        """Returns a boolean mask over the corpus marking the documents that pass the filter."""
+        mask = np.fromiter(
+            (retrieval_filter.matches(doc) for doc in self.retriever.corpus),
+            dtype=bool,
+            count=len(self.retriever.corpus)
+        )
+        if self.retriever.corpus_weight_mask:
+            mask &= np.asarray(self.retriever.corpus_weight_mask) > 0
+        return mask
+
+    def retrieve(self, query: str, retrieval_filter: RetrievalFilter, top_k: int) -> List[NodeWithScore]:
+        """
+        Returns the top BM25 matches of a query among the documents passing a filter.
+
+        Args:
+            query: The query string.
+            retrieval_filter: The filter the documents must pass.
+            top_k: The maximum number of nodes returned.
+
+        Returns:
+            The matching nodes ordered by descending BM25 score. Documents that share no
+            term with the query are not returned.
+        """
+        doc_ids, doc_term_scores = self._subset(retrieval_filter)
+        if len(doc_ids) == 0:
+            return []
+
+        token_ids = query_token_ids(self.retriever, [query])[0]
+        scores = np.asarray(doc_term_scores[:, token_ids].sum(axis=1)).ravel()
+        nonoccurrence = self.retriever.bm25.nonoccurrence_array
+        if nonoccurrence is not None:
+            scores = scores + nonoccurrence[token_ids].sum()
+
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > top_k:
+            positive = positive[np.argpartition(-scores[positive], top_k - 1)[:top_k]]
+        order = positive[np.argsort(-scores[positive], kind="stable")]
+        return [
+            NodeWithScore(
+                node=metadata_dict_to_node(self.retriever.corpus[int(doc_ids[i])]),
+                score=float(scores[i])
+            )
+            for i in order
+        ]
+
+    def _subset(self, retrieval_filter: RetrievalFilter) -> Tuple[np.ndarray, Any]:
+        key = retrieval_filter.cache_key()
+        with self._lock:
+            if self._bm25 is not self.retriever.bm25:
+                # The retriever was given a new index, so every subset is stale
+                self._bm25 = self.retriever.bm25
+                self._doc_term_scores = doc_term_matrix(self._bm25).tocsr()
+                self._subsets.clear()
+            subset = self._subsets.get(key)
+            if subset is not None:
+                self._subsets.move_to_end(key)
+                return subset
+            doc_term_scores = self._doc_term_scores
+
+        doc_ids = np.flatnonzero(self.mask(retrieval_filter))
+        subset = (doc_ids, doc_term_scores[doc_ids].tocsc())
+        logger.debug(f"Precomputed a BM25 subset of {len(doc_ids)} documents for filter {key}")
+        with self._lock:
+            self._subsets[key] = subset
+            while len(self._subsets) > self.max_filters:
+                self._subsets.popitem(last=False)
+        return subset
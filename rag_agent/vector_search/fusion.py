@@ -0,0 +1,170 @@
+from abc import ABC, abstractmethod
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.schema import NodeWithScore
+from typing import Dict, Optional, Sequence, Type, Union
+import numpy as np
+import logging
+import warnings
+
+logger = logging.getLogger(__name__)
+
+
+class FusedNodeWithScore(NodeWithScore):
+    """
+    A fused retrieval candidate.
+
+    It is created fresh by the merge, so the branch outputs it was built from are
+    never modified. `score` holds the fused score (later the reranker score), and
+    every branch that returned the node keeps its raw score and 0-based rank.
+    """
+    branch_scores: Dict[str, Optional[float]] = Field(default_factory=dict)
+    branch_ranks: Dict[str, int] = Field(default_factory=dict)
+
+
+class FusionStrategy(ABC):
+    """
+    Base class for combining per-branch retrieval scores into a single fused score.
+
+    Scores are passed as a (n_candidates, n_branches) matrix where a missing entry
+    (the branch did not return the candidate) is NaN, together with a matching matrix
+    of 0-based ranks where a missing entry is -1. Every strategy normalizes each
+    branch column independently, fills the missing entries and returns the weighted
+    sum across branches.
+    """
+    name: str = ""
+
+    def fuse(self, scores: np.ndarray, ranks: np.ndarray, weights: Sequence[float]) -> np.ndarray:
+        """
+        Computes the fused score of every candidate.
+
+        Args:
+            scores: A (n_candidates, n_branches) float matrix of raw branch scores.
+            ranks: A (n_candidates, n_branches) int matrix of 0-based branch ranks.
+            weights: One weight per branch.
+
+        Returns:
+            A float array with one fused score per candidate.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        ranks = np.asarray(ranks, dtype=np.int64)
+        if scores.size == 0:
+            return np.zeros(scores.shape[0], dtype=np.float64)
+
+        missing = ranks < 0
+        # A branch can return a candidate without a score; treat it as the weakest hit
+        scores = np.where(~missing & np.isnan(scores), _column_min(scores), scores)
+
+        normalized = self.normalize(scores, ranks, missing)
+        normalized = np.where(missing, self.missing_value(normalized, missing), normalized)
+        return normalized @ np.asarray(weights, dtype=np.float64)
+
+    @abstractmethod
+    def normalize(self, scores: np.ndarray, ranks: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        """Maps the raw scores of every branch column onto a comparable scale."""
+
+    def missing_value(self, normalized: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        """Returns the value contributed by a branch that did not return a candidate."""
+        return np.zeros(normalized.shape[1], dtype=np.float64)
+
+
+class ReciprocalRankFusion(FusionStrategy):
+    """Reciprocal Rank Fusion: every branch contributes 1 / (k + rank)."""
+    name = "rrf"
+
+    def __init__(self, k: int = 60):
+        self.k = k
+
+    def normalize(self, scores: np.ndarray, ranks: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        return 1.0 / (self.k + ranks + 1.0)
+
+
+class MinMaxFusion(FusionStrategy):
+    """Scales every branch to [0, 1] using the minimum and maximum returned score."""
+    name = "min_max"
+
+    def normalize(self, scores: np.ndarray, ranks: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        present = np.where(missing, np.nan, scores)
+        low = _nan_reduce(np.nanmin, present)
+        high = _nan_reduce(np.nanmax, present)
+        spread = high - low
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalized = (scores - low) / spread
+        # A branch whose scores are all equal gives every hit full credit
+        return np.where(spread > 0, normalized, 1.0)
+
+
+class ZScoreFusion(FusionStrategy):
+    """Standardizes every branch to zero mean and unit variance."""
+    name = "z_score"
+
+    def normalize(self, scores: np.ndarray, ranks: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        present = np.where(missing, np.nan, scores)
+        mean = _nan_reduce(np.nanmean, present)
+        std = _nan_reduce(np.nanstd, present)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalized = (scores - mean) / std
+        return np.where(std > 0, normalized, 0.0)
+
+    def missing_value(self, normalized: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        # Anything a branch did not return ranks below everything it did return
+        present = np.where(missing, np.nan, normalized)
+        return np.nan_to_num(_nan_reduce(np.nanmin, present), nan=0.0)
+
+
+class DistributionBasedFusion(FusionStrategy):
+    """
+    Distribution-based score fusion: scales every branch to [0, 1] between
+    mean - 3 * std and mean + 3 * std, which is robust to single outlier scores.
+    """
+    name = "dbsf"
+
+    def normalize(self, scores: np.ndarray, ranks: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        present = np.where(missing, np.nan, scores)
+        mean = _nan_reduce(np.nanmean, present)
+        std = _nan_reduce(np.nanstd, present)
+        low = mean - 3.0 * std
+        high = mean + 3.0 * std
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalized = np.clip((scores - low) / (high - low), 0.0, 1.0)
+        return np.where(std > 0, normalized, 1.0)
+
+
+FUSION_STRATEGIES: Dict[str, Type[FusionStrategy]] = {
+    strategy.name: strategy
+    for strategy in (ReciprocalRankFusion, MinMaxFusion, ZScoreFusion, DistributionBasedFusion)
+}
+
+
+def get_fusion_strategy(fusion: Union[str, FusionStrategy]) -> FusionStrategy:
+    """
+    Resolves a fusion strategy instance from a strategy or its registered name.
+
+    Args:
+        fusion: A FusionStrategy instance or one of "rrf", "min_max", "z_score", "dbsf".
+
+    Returns:
+        A FusionStrategy instance.
+
+    Raises:
+        ValueError: If the name is not a registered fusion strategy.
+    """
+    if isinstance(fusion, FusionStrategy):
+        return fusion
+    try:
+        return FUSION_STRATEGIES[fusion]()
+    except KeyError:
+        logger.error(f"Unknown fusion strategy: {fusion}")
+        raise ValueError(
+            f"Unknown fusion strategy '{fusion}'. Available: {sorted(FUSION_STRATEGIES)}"
+        )
+
+
+def _nan_reduce(reducer, values: np.ndarray) -> np.ndarray:
+    """Applies a NaN-aware column reduction without warning on all-NaN columns."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return reducer(values, axis=0)
+
+
+def _column_min(scores: np.ndarray) -> np.ndarray:
+    return np.nan_to_num(_nan_reduce(np.nanmin, scores), nan=0.0)
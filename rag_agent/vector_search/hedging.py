@@ -0,0 +1,115 @@
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+import logging
+import threading
+import time
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """
+    Hedged requests for a retrieval branch with a long latency tail.
+
+    The first attempt is sent immediately. If it has not finished after the
+    `quantile` latency observed so far (the p95 by default), an identical second
+    attempt is sent and whichever finishes first wins. Only the slowest few
+    percent of calls are duplicated, so the extra load stays small while a single
+    slow replica or GC pause no longer sets the branch latency.
+    """
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, min_delay: float = 0.005):
+        """
+        Initializes the policy.
+
+        Args:
+            quantile: The latency quantile after which a hedge is sent.
+            min_samples: The number of observed latencies required before hedging starts.
+            min_delay: The shortest hedge delay in seconds.
+
+        Raises:
+            ValueError: If quantile is not in (0, 1].
+        """
+        if not 0.0 < quantile <= 1.0:
+            raise ValueError("quantile must be in (0, 1]")
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._latency = LatencyHistogram()
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def delay(self) -> Optional[float]:
+        """Returns the current hedge delay in seconds, or None while too few latencies are known."""
+        with self._lock:
+            if self._latency.count < self.min_samples:
+                return None
+            return max(self._latency.quantile(self.quantile), self.min_delay)
+
+    def submit(self, executor: Executor, fn: Callable[[], Any]) -> Future:
+        """
+        Runs `fn` on the executor, hedging it with a second call if it is slow.
+
+        Args:
+            executor: The executor running the attempts.
+            fn: The call to run; it must be safe to run twice.
+
+        Returns:
+            A future resolved with the result of the first successful attempt, or with
+            the error of the last failed one.
+        """
+        result: Future = Future()
+        state = {"pending": 0}
+        delay = self.delay()
+        with self._lock:
+            self.calls += 1
+
+        def attempt(hedged: bool) -> None:
+            start = time.perf_counter()
+
+            def settle(future: Future) -> None:
+                error = future.exception()
+                with self._lock:
+                    state["pending"] -= 1
+                    if error is None:
+                        self._latency.record(time.perf_counter() - start)
+                    if result.done() or (error is not None and state["pending"] > 0):
+                        return
+                    if hedged and error is None:
+                        self.hedges_won += 1
+                    if error is None:
+                        result.set_result(future.result())
+                    else:
+                        result.set_exception(error)
+
+            with self._lock:
+                state["pending"] += 1
+            executor.submit(fn).add_done_callback(settle)
+
+        def hedge() -> None:
+            with self._lock:
+                if result.done():
+                    return
+                self.hedges_sent += 1
+            logger.debug(f"Sending a hedged request after {delay:.3f}s")
+            attempt(hedged=True)
+
+        attempt(hedged=False)
+        if delay is not None:
+            timer = threading.Timer(delay, hedge)
+            timer.daemon = True
+            timer.start()
+            result.add_done_callback(lambda _: timer.cancel())
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns how many calls were hedged and how often the hedge won."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+                "delay": self._latency.quantile(self.quantile) if self._latency.count >= self.min_samples else None,
+            }
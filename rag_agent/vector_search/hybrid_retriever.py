@@ -1,11 +1,131 @@
 from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, QueryType
 from llama_index.retrievers.bm25 import BM25Retriever
-from typing import List
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from qdrant_client.http import models as rest
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+from .adaptive_depth import AdaptiveDepth
+from .bm25_batch import bm25_retrieve_batch
+from .cache import RetrievalCache
+from .filters import BM25FilterIndex, RetrievalFilter, combine_qdrant_filters, post_filter
+from .candidates import CandidateBatch
+from .fusion import FusionStrategy, get_fusion_strategy
+from .hedging import HedgePolicy
+from .metrics import RetrievalMetrics
+from .query_router import BM25, ROUTES, VECTOR, QueryRouter
 from .reranker import Reranker
+from .semantic_cache import SemanticCache
+import asyncio
+import concurrent.futures
+import contextlib
+import copy
+import functools
 import logging
+import time
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Metadata key listing the branches that missed their deadline for a degraded response
+DEGRADED_METADATA_KEY = "degraded_branches"
+
+
+def _query_str(query: QueryType) -> str:
+    """Returns the query text of a query string or QueryBundle."""
+    return query.query_str if isinstance(query, QueryBundle) else str(query)
+
+
+def _with_depth(retriever: BaseRetriever, depth: Optional[int]) -> BaseRetriever:
+    """
+    Returns the retriever itself, or a shallow copy querying `depth` results.
+
+    A copy is used so concurrent queries at different depths never race on the
+    shared retriever's similarity_top_k.
+    """
+    if depth is None:
+        return retriever
+    if isinstance(retriever, BM25Retriever):
+        # bm25s refuses to return more results than there are documents
+        depth = min(depth, int(retriever.bm25.scores["num_docs"]))
+    shallow = copy.copy(retriever)
+    shallow.similarity_top_k = depth
+    return shallow
+
+
+def _retriever_qdrant_filter(retriever: VectorIndexRetriever, query: QueryType) -> Optional[rest.Filter]:
+    """
+    Returns the Qdrant filter a vector retriever applies on its own.
+
+    That is its `qdrant_filters` keyword argument if set, otherwise the filter the
+    store builds from the retriever's MetadataFilters, doc_ids and node_ids.
+    """
+    qdrant_filters = retriever._kwargs.get("qdrant_filters")
+    if qdrant_filters is not None:
+        return qdrant_filters
+    query_bundle = query if isinstance(query, QueryBundle) else QueryBundle(query)
+    return retriever._vector_store._build_query_filter(retriever._build_vector_store_query(query_bundle))
+
+
+def _embedding_carrier(query: QueryType) -> QueryType:
+    """
+    Returns the query as a QueryBundle the vector retriever can store its embedding in.
+
+    VectorIndexRetriever writes the embedding it computes into the QueryBundle it
+    is given, so a query retrieved at several depths is embedded only once.
+    """
+    return query if isinstance(query, QueryBundle) else QueryBundle(query)
+
+
+_BranchResults = Tuple[Optional[List[NodeWithScore]], Optional[List[NodeWithScore]]]
+
+
+def _count(results: Optional[List[NodeWithScore]]) -> str:
+    return f"{len(results)} results" if results is not None else "nothing (skipped by the router)"
+
+
+class RetrievalUpdate:
+    """
+    One step of `HybridRetriever.astream`.
+
+    Attributes:
+        stage: What produced the nodes: the branch that finished first ("vector" or
+               "bm25"), "final" after fusion and reranking, or "cache" for a cache hit.
+        nodes: The ranked nodes available at this stage.
+        is_final: Whether these are the reranked results; no update follows a final one.
+    """
+    __slots__ = ("stage", "nodes", "is_final")
+
+    def __init__(self, stage: str, nodes: List[NodeWithScore], is_final: bool):
+        self.stage = stage
+        self.nodes = nodes
+        self.is_final = is_final
+
+    def __repr__(self) -> str:
+        return f"RetrievalUpdate(stage={self.stage!r}, nodes={len(self.nodes)}, is_final={self.is_final})"
+
+
+class _BranchBudget:
+    """The deadline state of one query's branches, shared by all adaptive depths."""
+    __slots__ = ("start", "missed")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.missed: Set[str] = set()
+
+
+class _CacheLookup:
+    """The state of one query's cache lookups, carried until its result is stored."""
+    __slots__ = ("query", "key", "nodes", "embedding", "unverified_nodes")
+
+    def __init__(self, query: QueryType, key: Optional[tuple]):
+        self.query = query
+        self.key = key
+        self.nodes: Optional[List[NodeWithScore]] = None
+        self.embedding: Optional[List[float]] = None
+        self.unverified_nodes: Optional[List[NodeWithScore]] = None
+
+
 class HybridRetriever(BaseRetriever):
     """
     A hybrid retriever that combines vector search and BM25 search, with optional reranking.
@@ -20,7 +140,20 @@ class HybridRetriever(BaseRetriever):
         bm25_retriever: BM25Retriever,
         reranker: Reranker = None,
         vector_weight: float = 0.7,
-        bm25_weight: float = 0.3
+        bm25_weight: float = 0.3,
+        max_workers: int = 16,
+        fusion: Optional[Union[str, FusionStrategy]] = None,
+        rerank_candidates: Optional[int] = None,
+        min_fused_score: Optional[float] = None,
+        cache: Optional[RetrievalCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        adaptive_depth: Optional[AdaptiveDepth] = None,
+        router: Optional[QueryRouter] = None,
+        metrics: Optional[RetrievalMetrics] = None,
+        vector_deadline: Optional[float] = None,
+        bm25_deadline: Optional[float] = None,
+        hedge: Optional[HedgePolicy] = None,
+        filters: Optional[RetrievalFilter] = None
     ):
         """
         Initializes the HybridRetriever with the necessary components.
@@ -32,6 +165,46 @@ class HybridRetriever(BaseRetriever):
                       If None, a default Reranker is used.
             vector_weight: The weight assigned to vector search scores for initial combination.
             bm25_weight: The weight assigned to BM25 search scores for initial combination.
+            max_workers: The size of the thread pool running the retrieval branches. A
+                         synchronous query runs one branch on the calling thread and
+                         submits only the other one, or both if they have deadlines or
+                         hedging; an async query submits every branch. The pool is shared
+                         by all in-flight queries, so size it for the request concurrency.
+            fusion: An optional score fusion strategy, or its name ("rrf", "min_max",
+                    "z_score", "dbsf"). If None, the fused score is the weighted sum of
+                    the raw branch scores. Either way every node found by several
+                    branches becomes one FusedNodeWithScore keeping each branch's
+                    score and rank.
+            rerank_candidates: The maximum number of fused candidates sent to the reranker.
+                               The strongest candidates by fused score are kept. If None,
+                               every candidate is reranked.
+            min_fused_score: An optional fused-score cutoff; weaker candidates are dropped
+                             before reranking.
+            cache: An optional RetrievalCache. Repeated queries are answered from it
+                   without touching Qdrant, BM25 or the reranker.
+            semantic_cache: An optional SemanticCache. Queries whose embedding is close to
+                            a cached query reuse its reranked results.
+            adaptive_depth: An optional AdaptiveDepth policy. Both branches start at its
+                            shallowest depth and are widened only for weak candidate
+                            pools, and the reranked output is cut at a clear elbow.
+            router: An optional QueryRouter that decides per query whether the vector or
+                    the BM25 branch can be skipped. The weight of a skipped branch is
+                    redistributed over the branches that ran.
+            metrics: An optional RetrievalMetrics collecting the latency of the "vector",
+                     "bm25", "fusion" and "rerank" stages (with a "_batch" suffix in
+                     `retrieve_batch`), candidate-count gauges and cache counters.
+            vector_deadline: An optional time budget in seconds for the vector branch. If it
+                             is exceeded the answer is built from the BM25 results alone.
+            bm25_deadline: An optional time budget in seconds for the BM25 branch. If it is
+                           exceeded the answer is built from the vector results alone.
+                           Degraded answers list the late branches under the
+                           DEGRADED_METADATA_KEY node metadata and are not cached.
+            hedge: An optional HedgePolicy sending a duplicate vector search when the first
+                   one is slower than the policy's latency quantile. The thread pool gets
+                   one extra worker for the duplicate.
+            filters: An optional RetrievalFilter restricting both branches. It is pushed
+                     into the Qdrant query as a payload filter and into BM25 as a
+                     precomputed document subset. Use `with_filters` for per-query filters.
         """
         super().__init__()
         self.vector_retriever = vector_retriever
@@ -40,13 +213,53 @@ class HybridRetriever(BaseRetriever):
         self.reranker = reranker or Reranker()
         self.vector_weight = vector_weight
         self.bm25_weight = bm25_weight
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers + (1 if hedge is not None else 0),
+            thread_name_prefix="hybrid-retriever"
+        )
+        self.fusion = get_fusion_strategy(fusion) if fusion is not None else None
+        if rerank_candidates is not None and rerank_candidates < 1:
+            raise ValueError("rerank_candidates must be a positive integer")
+        self.rerank_candidates = rerank_candidates
+        self.min_fused_score = min_fused_score
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.adaptive_depth = adaptive_depth
+        self.router = router
+        self.metrics = metrics
+        self.vector_deadline = vector_deadline
+        self.bm25_deadline = bm25_deadline
+        self.hedge = hedge
+        self.filters = filters
+        # Copies made by with_filters keep the ID, the filter itself is part of the cache config
+        self._cache_id = id(self)
+        self._bm25_filter_index = (
+            BM25FilterIndex(bm25_retriever) if isinstance(bm25_retriever, BM25Retriever) else None
+        )
+
+
+    def with_filters(self, filters: Optional[RetrievalFilter]) -> "HybridRetriever":
+        """
+        Returns a retriever restricted by a metadata filter.
+
+        The copy shares the thread pool, caches, metrics and the precomputed BM25
+        filter subsets with this retriever, so creating one per query is cheap.
 
+        Args:
+            filters: The filter to apply, or None to remove the filter.
+
+        Returns:
+            A shallow copy of this retriever using the filter.
+        """
+        filtered = copy.copy(self)
+        filtered.filters = filters
+        return filtered
 
     def _retrieve(self, query: str, **kwargs):
         """
         Performs the hybrid retrieval process.
 
-        Executes queries on both the vector and BM25 retrievers, combines their
+        Executes queries on the vector and BM25 retrievers concurrently, combines their
         results, re-ranks the combined list, and returns the top results.
 
         Args:
@@ -56,26 +269,691 @@ class HybridRetriever(BaseRetriever):
         Returns:
             A list of relevant LlamaIndex Nodes after hybrid retrieval and reranking.
         """
-        
-        vector_results = self.vector_retriever.retrieve(query, **kwargs)
-        bm25_results = self.bm25_retriever.retrieve(query, **kwargs)
-       
-        for node in vector_results:
-            node.score = (node.score * self.vector_weight) if node.score is not None else 0.0
-        for node in bm25_results:
-            node.score = (node.score * self.bm25_weight) if node.score is not None else 0.0
-
-        combined_results = vector_results + bm25_results
-        unique_results = {node.node_id: node for node in combined_results}
-        combined_nodes = list(unique_results.values())
-
-        reranked_nodes = self.reranker.rerank(query, combined_nodes, top_k=5)
+        lookup = self._cache_lookup(query, kwargs)
+        if lookup.nodes is not None:
+            return lookup.nodes
+        query = lookup.query
+
+        budget = _BranchBudget()
+        vector_results, bm25_results = self._retrieve_branches(query, kwargs, budget)
+
+        reranked_nodes = self._fuse_and_rerank(query, vector_results, bm25_results)
+        return self._finish(lookup, reranked_nodes, budget)
+
+    async def _aretrieve(self, query_bundle: QueryBundle, **kwargs):
+        """
+        Asynchronously performs the hybrid retrieval process.
+
+        Both branches are awaited together with `asyncio.gather`, so the query latency
+        is bounded by the slower retriever rather than their sum. The retrievers are
+        driven through the thread pool because the BM25 retriever has no native async
+        path and the Qdrant store may only be configured with a synchronous client.
+
+        Args:
+            query_bundle: The user's query string or QueryBundle.
+            **kwargs: Additional keyword arguments passed to the underlying retrievers.
+
+        Returns:
+            A list of relevant LlamaIndex Nodes after hybrid retrieval and reranking.
+        """
+        loop = asyncio.get_running_loop()
+        # The semantic cache lookup may call the embedding API, so keep it off the event loop.
+        # It and the reranker use the loop's default executor, so they never queue behind branches.
+        lookup = await loop.run_in_executor(None, self._cache_lookup, query_bundle, kwargs)
+        if lookup.nodes is not None:
+            return lookup.nodes
+        query_bundle = lookup.query
+
+        budget = _BranchBudget()
+        vector_results, bm25_results = await self._aretrieve_branches(query_bundle, kwargs, budget)
+
+        reranked_nodes = await loop.run_in_executor(
+            None, self._fuse_and_rerank, query_bundle, vector_results, bm25_results
+        )
+        return self._finish(lookup, reranked_nodes, budget)
+
+    async def astream(self, query: QueryType, **kwargs) -> AsyncIterator[RetrievalUpdate]:
+        """
+        Retrieves nodes incrementally, yielding provisional results before the final ones.
+
+        As soon as the first routed branch returns, its top nodes are yielded in branch
+        score order so a consumer can start building the prompt or a speculative LLM
+        call. The fused and reranked nodes follow as the final update. A cache hit
+        yields a single final update.
+
+        Args:
+            query: The user's query string or QueryBundle.
+            **kwargs: Additional keyword arguments passed to the underlying retrievers.
+
+        Yields:
+            RetrievalUpdate objects; the last one has `is_final` set.
+        """
+        loop = asyncio.get_running_loop()
+        lookup = await loop.run_in_executor(None, self._cache_lookup, query, kwargs)
+        if lookup.nodes is not None:
+            yield RetrievalUpdate("cache", lookup.nodes, is_final=True)
+            return
+        query = lookup.query
+
+        first_branch = loop.create_future()
+
+        def on_branch(branch: str, nodes: List[NodeWithScore]) -> None:
+            if not first_branch.done():
+                first_branch.set_result((branch, nodes))
+
+        budget = _BranchBudget()
+        branches_task = asyncio.ensure_future(self._aretrieve_branches(query, kwargs, budget, on_branch))
+        try:
+            await asyncio.wait({first_branch, branches_task}, return_when=asyncio.FIRST_COMPLETED)
+            if first_branch.done():
+                branch, nodes = first_branch.result()
+                yield RetrievalUpdate(branch, self._provisional(nodes), is_final=False)
+            vector_results, bm25_results = await branches_task
+        finally:
+            # The consumer may stop iterating after a provisional update
+            branches_task.cancel()
+
+        reranked_nodes = await loop.run_in_executor(
+            None, self._fuse_and_rerank, query, vector_results, bm25_results
+        )
+        yield RetrievalUpdate("final", self._finish(lookup, reranked_nodes, budget), is_final=True)
+
+    def _finish(self, lookup: "_CacheLookup", reranked_nodes: List[NodeWithScore], budget: "_BranchBudget") -> List[NodeWithScore]:
+        """Caches complete results, or flags and counts a response degraded by a missed deadline."""
+        if not budget.missed:
+            self._cache_store(lookup, reranked_nodes)
+            return reranked_nodes
+
+        self._increment("degraded_responses")
+        missed = sorted(budget.missed)
+        logger.warning(f"Serving a degraded response without the {', '.join(missed)} branch "
+            f"for query: '{_query_str(lookup.query)}'")
+        flagged_nodes = []
+        for node_with_score in reranked_nodes:
+            # Copy the node so the shared retriever nodes never carry the flag
+            node = node_with_score.node.model_copy()
+            node.metadata = {**node.metadata, DEGRADED_METADATA_KEY: missed}
+            node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, DEGRADED_METADATA_KEY]
+            node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, DEGRADED_METADATA_KEY]
+            # model_copy keeps the FusedNodeWithScore type with its branch scores and ranks
+            flagged_nodes.append(node_with_score.model_copy(update={"node": node}))
+        return flagged_nodes
+
+    def _provisional(self, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        """
+        Returns copies of the top branch nodes, sorted by branch score.
+
+        Copies are handed out because the reranker later rewrites the scores of the
+        nodes it receives.
+        """
+        ranked = sorted(nodes, key=lambda node: node.score if node.score is not None else float("-inf"), reverse=True)
+        return [NodeWithScore(node=node.node, score=node.score) for node in ranked[:self._rerank_top_k()]]
+
+    def _fuse_and_rerank(
+        self,
+        query: QueryType,
+        vector_results: Optional[List[NodeWithScore]],
+        bm25_results: Optional[List[NodeWithScore]]
+    ) -> List[NodeWithScore]:
+        """
+        Combines the branch results with the configured weights and re-ranks them.
+
+        Args:
+            query: The user's query string or QueryBundle.
+            vector_results: Nodes returned by the vector retriever, or None if it was skipped.
+            bm25_results: Nodes returned by the BM25 retriever, or None if it was skipped.
+
+        Returns:
+            The top reranked nodes.
+        """
+        candidates = self._select_candidates(vector_results, bm25_results)
+        # The cross-encoder and the pair score cache take the query text, not a QueryBundle
+        query = _query_str(query)
+
+        with self._time("rerank"):
+            reranked_nodes = self.reranker.rerank_candidates(query, candidates, top_k=self._rerank_top_k())
+        if self.adaptive_depth is not None:
+            reranked_nodes = self.adaptive_depth.cut(reranked_nodes)
+        self._set_gauge("reranked_nodes", len(reranked_nodes))
         
         logger.debug(f"HybridRetriever initialized with vector_weight={self.vector_weight}, "
-            f"bm25_weight={self.bm25_weight}, reranker={self.reranker is not None}")
-        logger.debug(f"Vector retriever returned {len(vector_results)} results. BM25 retriever returned {len(bm25_results)} results.")
-        logger.debug(f"Combined and de-duplicated results: {len(combined_nodes)} nodes.")
+            f"bm25_weight={self.bm25_weight}, fusion={self.fusion.name if self.fusion else None}, "
+            f"reranker={self.reranker is not None}")
         logger.info(f"Retrieved and reranked {len(reranked_nodes)} documents for query: '{query}'")
         return reranked_nodes
-    
-   
+
+    def retrieve_batch(self, queries: List[QueryType]) -> List[List[NodeWithScore]]:
+        """
+        Retrieves and reranks nodes for many queries at once.
+
+        All queries are embedded in one call and sent to Qdrant as a single batch
+        search, BM25 scores for all queries come from one sparse matrix product, and
+        every (query, node) pair of the batch is reranked with one cross-encoder call.
+        Throughput therefore scales with the batch size instead of paying the
+        per-query overhead of `_retrieve`.
+
+        The batch path trades per-query features for throughput: it uses the
+        exact-match cache and the router, but not the semantic cache, branch
+        deadlines or hedging, and the branches run at the retrievers' configured
+        depth; an adaptive depth policy only cuts the reranked lists. Send queries
+        that need those features through `retrieve`.
+
+        Args:
+            queries: The query strings or QueryBundles.
+
+        Returns:
+            One list of reranked nodes per query, in the order of `queries`.
+        """
+        if not queries:
+            return []
+
+        query_strs = [_query_str(query) for query in queries]
+        results: List[Optional[List[NodeWithScore]]] = [None] * len(query_strs)
+        cache_keys = [self._cache_key(query, {}) for query in query_strs]
+        if self.cache is not None:
+            results = [self.cache.get(cache_key) for cache_key in cache_keys]
+        pending = [i for i, nodes in enumerate(results) if nodes is None]
+        if self.cache is not None:
+            self._increment("cache_hits", len(query_strs) - len(pending))
+            self._increment("cache_misses", len(pending))
+        if not pending:
+            return results
+
+        pending_queries = [query_strs[i] for i in pending]
+        routes = [self._route(query) for query in pending_queries]
+        vector_rows = [row for row, route in enumerate(routes) if VECTOR in route]
+        bm25_rows = [row for row, route in enumerate(routes) if BM25 in route]
+        # A branch no query was routed to is skipped, so it costs no embedding call or round trip
+        vector_future = None
+        if vector_rows:
+            vector_future = self._executor.submit(
+                self._timed, "vector_batch", self._vector_retrieve_batch, [pending_queries[row] for row in vector_rows]
+            )
+        bm25_results = []
+        if bm25_rows:
+            # The BM25 batch runs on the calling thread while the vector batch is in flight
+            bm25_results = self._timed(
+                "bm25_batch", self._bm25_retrieve_batch, [pending_queries[row] for row in bm25_rows]
+            )
+        vector_results = vector_future.result() if vector_future is not None else []
+        # Queries routed away from a branch keep None for it
+        vector_batch: List[Optional[List[NodeWithScore]]] = [None] * len(pending_queries)
+        bm25_batch: List[Optional[List[NodeWithScore]]] = [None] * len(pending_queries)
+        for row, nodes in zip(vector_rows, vector_results):
+            vector_batch[row] = nodes
+        for row, nodes in zip(bm25_rows, bm25_results):
+            bm25_batch[row] = nodes
+
+        candidates = [
+            self._select_candidates(vector_results, bm25_results)
+            for vector_results, bm25_results in zip(vector_batch, bm25_batch)
+        ]
+        with self._time("rerank_batch"):
+            reranked = self.reranker.rerank_candidates_batch(pending_queries, candidates, top_k=self._rerank_top_k())
+        for i, reranked_nodes in zip(pending, reranked):
+            if self.adaptive_depth is not None:
+                reranked_nodes = self.adaptive_depth.cut(reranked_nodes)
+            results[i] = reranked_nodes
+            if self.cache is not None:
+                self.cache.put(cache_keys[i], reranked_nodes)
+
+        logger.info(f"Retrieved and reranked documents for a batch of {len(pending_queries)} queries "
+            f"({len(query_strs) - len(pending_queries)} served from cache).")
+        return results
+
+    def _retrieve_branches(self, query: QueryType, kwargs: dict, budget: "_BranchBudget") -> "_BranchResults":
+        """
+        Runs the routed vector and BM25 branches concurrently on the thread pool.
+
+        With an adaptive depth policy the branches start shallow and only the branches
+        the policy considers weak are widened at the next depth; see `_next_depth`. A
+        branch skipped by the router or late for its deadline yields None.
+        """
+        route = self._route(query)
+        if self.adaptive_depth is None:
+            return self._run_branches(query, kwargs, None, route, budget)
+
+        query = _embedding_carrier(query)
+        depths = self.adaptive_depth.depths
+        results: dict = {}
+        fetch = route
+        for depth in depths:
+            fetched = self._run_branches(query, kwargs, depth, fetch, budget, bm25_depth=depths[-1])
+            shown, fetch = self._next_depth(depth, fetch, fetched, results)
+            if fetch is None:
+                break
+        self.adaptive_depth.record_depth(depth)
+        return shown
+
+    async def _aretrieve_branches(
+        self,
+        query: QueryType,
+        kwargs: dict,
+        budget: "_BranchBudget",
+        on_branch: Optional[Callable[[str, List[NodeWithScore]], None]] = None
+    ) -> "_BranchResults":
+        """
+        Async counterpart of `_retrieve_branches`, gathering the routed branches per depth.
+
+        `on_branch` is called on the event loop with the branch name and its nodes
+        whenever a branch returns.
+        """
+        route = self._route(query)
+        if self.adaptive_depth is None:
+            return await self._arun_branches(query, kwargs, None, route, budget, on_branch)
+
+        query = _embedding_carrier(query)
+        depths = self.adaptive_depth.depths
+        results: dict = {}
+        fetch = route
+        for depth in depths:
+            fetched = await self._arun_branches(query, kwargs, depth, fetch, budget, on_branch, bm25_depth=depths[-1])
+            shown, fetch = self._next_depth(depth, fetch, fetched, results)
+            if fetch is None:
+                break
+        self.adaptive_depth.record_depth(depth)
+        return shown
+
+    def _next_depth(
+        self,
+        depth: int,
+        fetch: FrozenSet[str],
+        fetched: "_BranchResults",
+        results: dict
+    ) -> Tuple["_BranchResults", Optional[FrozenSet[str]]]:
+        """
+        Merges the branches fetched at a depth and decides which to fetch at the next one.
+
+        BM25 scores every document whatever the depth, so it is fetched once at the
+        deepest depth and revealed up to the current depth; widening it costs nothing.
+        Only a weak vector branch is searched again, and it reuses the query embedding
+        computed on its first pass. A branch the policy does not widen keeps its
+        shallower results.
+
+        Args:
+            depth: The depth just retrieved.
+            fetch: The branches that were fetched at this depth.
+            fetched: The vector and BM25 results of this fetch.
+            results: The latest full results by branch, updated in place.
+
+        Returns:
+            The vector and BM25 results at this depth, and the branches to fetch at the
+            next depth, or None to stop.
+        """
+        for branch, nodes in zip((VECTOR, BM25), fetched):
+            if branch in fetch:
+                results[branch] = nodes
+        shown = {branch: nodes[:depth] for branch, nodes in results.items() if nodes is not None}
+        vector_results, bm25_results = shown.get(VECTOR), shown.get(BM25)
+        if depth == self.adaptive_depth.depths[-1]:
+            return (vector_results, bm25_results), None
+        weak = self.adaptive_depth.weak_branches(depth, shown)
+        if not weak:
+            return (vector_results, bm25_results), None
+        return (vector_results, bm25_results), weak - {BM25}
+
+    def _run_branches(
+        self,
+        query: QueryType,
+        kwargs: dict,
+        depth: Optional[int],
+        route: FrozenSet[str],
+        budget: "_BranchBudget",
+        bm25_depth: Optional[int] = None
+    ) -> "_BranchResults":
+        # A branch that missed its deadline at a shallower depth is not retried
+        route = route - budget.missed
+        retrievers = {
+            VECTOR: _with_depth(self.vector_retriever, depth),
+            BM25: _with_depth(self.bm25_retriever, bm25_depth or depth),
+        }
+        # One branch runs on the calling thread, so a query holds at most one pool thread
+        inline = self._inline_branch(route)
+        futures = {
+            branch: self._submit_branch(branch, retrievers[branch], query, kwargs)
+            for branch in (VECTOR, BM25)
+            if branch in route and branch != inline
+        }
+        results = {}
+        if inline is not None:
+            results[inline] = self._timed(inline, self._filtered_retrieve, inline, retrievers[inline], query, kwargs)
+        for branch, future in futures.items():
+            results[branch] = self._branch_result(branch, future, budget)
+        return results.get(VECTOR), results.get(BM25)
+
+    def _inline_branch(self, route: FrozenSet[str]) -> Optional[str]:
+        """
+        Returns the routed branch to run on the calling thread, if any.
+
+        Only a branch without a deadline or hedging can run inline, because the
+        caller must be free to abandon a late branch or race its duplicate.
+        """
+        if BM25 in route and self.bm25_deadline is None:
+            return BM25
+        if VECTOR in route and self.vector_deadline is None and self.hedge is None:
+            return VECTOR
+        return None
+
+    async def _arun_branches(
+        self,
+        query: QueryType,
+        kwargs: dict,
+        depth: Optional[int],
+        route: FrozenSet[str],
+        budget: "_BranchBudget",
+        on_branch: Optional[Callable[[str, List[NodeWithScore]], None]] = None,
+        bm25_depth: Optional[int] = None
+    ) -> "_BranchResults":
+        async def run(branch: str, retriever: BaseRetriever) -> Optional[List[NodeWithScore]]:
+            if branch not in route or branch in budget.missed:
+                return None
+            future = asyncio.wrap_future(self._submit_branch(branch, retriever, query, kwargs))
+            timeout = self._remaining(branch, budget)
+            if timeout is not None:
+                done, _ = await asyncio.wait({future}, timeout=timeout)
+                if not done:
+                    future.cancel()
+                    self._miss_deadline(branch, budget)
+                    return None
+            results = await future
+            if on_branch is not None:
+                on_branch(branch, results)
+            return results
+
+        vector_results, bm25_results = await asyncio.gather(
+            run(VECTOR, _with_depth(self.vector_retriever, depth)),
+            run(BM25, _with_depth(self.bm25_retriever, bm25_depth or depth)),
+        )
+        return vector_results, bm25_results
+
+    def _submit_branch(self, branch: str, retriever: BaseRetriever, query: QueryType, kwargs: dict) -> Future:
+        """Starts a branch on the thread pool, hedging the vector search if configured."""
+        call = functools.partial(self._timed, branch, self._filtered_retrieve, branch, retriever, query, kwargs)
+        if branch == VECTOR and self.hedge is not None:
+            return self.hedge.submit(self._executor, call)
+        return self._executor.submit(call)
+
+    def _filtered_retrieve(
+        self,
+        branch: str,
+        retriever: BaseRetriever,
+        query: QueryType,
+        kwargs: dict
+    ) -> List[NodeWithScore]:
+        """
+        Runs one branch with the configured filter pushed into its index.
+
+        A Qdrant vector store receives the filter as a payload filter and a
+        BM25Retriever scores only the precomputed subset of matching documents. Other
+        retrievers fall back to filtering their results.
+        """
+        if self.filters is None:
+            return retriever.retrieve(query, **kwargs)
+        if branch == VECTOR and isinstance(getattr(retriever, "_vector_store", None), QdrantVectorStore):
+            filtered = copy.copy(retriever)
+            # qdrant_filters replaces the filter the store builds itself, so that one is combined too
+            filtered._kwargs = {
+                **retriever._kwargs,
+                "qdrant_filters": combine_qdrant_filters(_retriever_qdrant_filter(retriever, query), self.filters),
+            }
+            return filtered.retrieve(query, **kwargs)
+        if branch == BM25 and self._bm25_filter_index is not None and not kwargs:
+            return self._bm25_filter_index.retrieve(_query_str(query), self.filters, retriever.similarity_top_k)
+        return post_filter(retriever.retrieve(query, **kwargs), self.filters)
+
+    def _branch_result(
+        self,
+        branch: str,
+        future: Optional[Future],
+        budget: "_BranchBudget"
+    ) -> Optional[List[NodeWithScore]]:
+        """Waits for a branch until its deadline; returns None if it was skipped or is late."""
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=self._remaining(branch, budget))
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self._miss_deadline(branch, budget)
+            return None
+
+    def _remaining(self, branch: str, budget: "_BranchBudget") -> Optional[float]:
+        """Returns the seconds left until a branch's deadline, or None without a deadline."""
+        deadline = self.vector_deadline if branch == VECTOR else self.bm25_deadline
+        if deadline is None:
+            return None
+        return max(0.0, budget.start + deadline - time.perf_counter())
+
+    def _miss_deadline(self, branch: str, budget: "_BranchBudget") -> None:
+        budget.missed.add(branch)
+        self._increment(f"{branch}_deadline_missed")
+        logger.warning(f"The {branch} branch missed its deadline")
+
+    def _route(self, query: QueryType) -> FrozenSet[str]:
+        """Returns the branches to run for a query; both unless a router is configured."""
+        if self.router is None:
+            return ROUTES["both"]
+        return self.router.route(_query_str(query))
+
+    def _time(self, stage: str):
+        """Returns a context manager recording the stage latency if metrics are enabled."""
+        return self.metrics.time(stage) if self.metrics is not None else contextlib.nullcontext()
+
+    def _timed(self, stage: str, fn, /, *args, **kwargs):
+        with self._time(stage):
+            return fn(*args, **kwargs)
+
+    def _set_gauge(self, name: str, value: float) -> None:
+        if self.metrics is not None:
+            self.metrics.set_gauge(name, value)
+
+    def _increment(self, name: str, amount: int = 1) -> None:
+        if self.metrics is not None:
+            self.metrics.increment(name, amount)
+
+    def _rerank_top_k(self) -> int:
+        return self.adaptive_depth.rerank_top_k if self.adaptive_depth is not None else 5
+
+    def _cache_lookup(self, query: QueryType, kwargs: dict) -> "_CacheLookup":
+        """
+        Looks the query up in the exact-match cache, then in the semantic cache.
+
+        The semantic lookup embeds the query once; the returned lookup carries a
+        QueryBundle with that embedding so the vector branch does not embed it again.
+        A semantic hit selected for verification is returned without nodes so the full
+        pipeline runs and `_cache_store` can compare the results.
+        """
+        lookup = _CacheLookup(query, self._cache_key(query, kwargs))
+        if lookup.key is not None:
+            lookup.nodes = self.cache.get(lookup.key)
+            if lookup.nodes is not None:
+                self._increment("cache_hits")
+                logger.debug(f"Serving {len(lookup.nodes)} cached documents for query: '{_query_str(query)}'")
+                return lookup
+            self._increment("cache_misses")
+
+        if self.semantic_cache is None or kwargs:
+            return lookup
+        query_str = _query_str(query)
+        embedding = query.embedding if isinstance(query, QueryBundle) else None
+        if embedding is None:
+            embedding = self.vector_retriever._embed_model.get_query_embedding(query_str)
+        lookup.query = QueryBundle(query_str=query_str, embedding=embedding)
+        lookup.embedding = embedding
+
+        semantic_nodes = self.semantic_cache.lookup(embedding, self._cache_config())
+        self._increment("semantic_cache_hits" if semantic_nodes is not None else "semantic_cache_misses")
+        if semantic_nodes is not None:
+            if self.semantic_cache.should_verify():
+                lookup.unverified_nodes = semantic_nodes
+            else:
+                logger.debug(f"Serving {len(semantic_nodes)} semantically cached documents for query: '{query_str}'")
+                lookup.nodes = semantic_nodes
+                if lookup.key is not None:
+                    self.cache.put(lookup.key, semantic_nodes)
+        return lookup
+
+    def _cache_store(self, lookup: "_CacheLookup", reranked_nodes: List[NodeWithScore]) -> None:
+        """Stores freshly reranked nodes in the configured caches."""
+        if lookup.key is not None:
+            self.cache.put(lookup.key, reranked_nodes)
+        if lookup.embedding is not None:
+            if lookup.unverified_nodes is not None:
+                self.semantic_cache.verify(lookup.unverified_nodes, reranked_nodes)
+            self.semantic_cache.add(lookup.embedding, _query_str(lookup.query), self._cache_config(), reranked_nodes)
+
+    def _cache_key(self, query: QueryType, kwargs: dict) -> Optional[tuple]:
+        """
+        Returns the cache key of a query, or None if the result must not be cached.
+
+        Calls with extra retriever keyword arguments bypass the cache because those
+        arguments can change the result.
+        """
+        if self.cache is None or kwargs:
+            return None
+        return self.cache.make_key(_query_str(query), self._cache_config())
+
+    def _cache_config(self) -> tuple:
+        """Returns the parts of the retriever configuration that affect the results."""
+        fusion_config = (self.fusion.name, tuple(sorted(vars(self.fusion).items()))) if self.fusion else None
+        return (
+            self._cache_id,
+            self.filters.cache_key() if self.filters is not None else None,
+            self.vector_weight,
+            self.bm25_weight,
+            fusion_config,
+            self.rerank_candidates,
+            self.min_fused_score,
+        )
+
+    def _vector_retrieve_batch(self, queries: List[str]) -> List[List[NodeWithScore]]:
+        """
+        Runs the vector branch for a batch of queries.
+
+        Queries are embedded with one batch embedding call. For a Qdrant store all
+        searches go out as one `query_batch_points` request; other stores are
+        queried one by one with the precomputed embeddings.
+        """
+        retriever = self.vector_retriever
+        embeddings = retriever._embed_model.get_text_embedding_batch(queries)
+        query_bundles = [
+            QueryBundle(query_str=query, embedding=embedding)
+            for query, embedding in zip(queries, embeddings)
+        ]
+
+        vector_store = retriever._vector_store
+        if not isinstance(vector_store, QdrantVectorStore):
+            return [self._filtered_retrieve(VECTOR, retriever, query_bundle, {}) for query_bundle in query_bundles]
+
+        requests = []
+        for query_bundle in query_bundles:
+            query = retriever._build_vector_store_query(query_bundle)
+            query_filter = _retriever_qdrant_filter(retriever, query_bundle)
+            if self.filters is not None:
+                query_filter = combine_qdrant_filters(query_filter, self.filters)
+            requests.append(
+                rest.QueryRequest(
+                    query=query_bundle.embedding,
+                    using=vector_store.dense_vector_name,
+                    limit=query.similarity_top_k,
+                    filter=query_filter,
+                    with_payload=True,
+                )
+            )
+        responses = vector_store.client.query_batch_points(
+            collection_name=vector_store.collection_name,
+            requests=requests
+        )
+
+        results = []
+        for response in responses:
+            query_result = vector_store.parse_to_query_result(response.points)
+            results.append([
+                NodeWithScore(node=node, score=score)
+                for node, score in zip(query_result.nodes, query_result.similarities)
+            ])
+        return results
+
+    def _bm25_retrieve_batch(self, queries: List[str]) -> List[List[NodeWithScore]]:
+        """Runs the BM25 branch for a batch of queries."""
+        if self.filters is None and isinstance(self.bm25_retriever, BM25Retriever):
+            return bm25_retrieve_batch(self.bm25_retriever, queries)
+        return [self._filtered_retrieve(BM25, self.bm25_retriever, query, {}) for query in queries]
+
+    def _select_candidates(
+        self,
+        vector_results: Optional[List[NodeWithScore]],
+        bm25_results: Optional[List[NodeWithScore]]
+    ) -> CandidateBatch:
+        """
+        Combines the branch results and applies the rerank candidate budget.
+
+        Only the branches that ran take part in the fusion; the configured weight of
+        a skipped branch is redistributed proportionally over the others.
+        """
+        with self._time("fusion"):
+            names, branches, weights = self._ran_branches(vector_results, bm25_results)
+            combined = self._merge(names, branches, weights)
+            candidates = self._prune_candidates(combined)
+        if vector_results is not None:
+            self._set_gauge("vector_results", len(vector_results))
+        if bm25_results is not None:
+            self._set_gauge("bm25_results", len(bm25_results))
+        self._set_gauge("fused_candidates", len(combined))
+        self._set_gauge("rerank_candidates", len(candidates))
+
+        logger.debug(f"Vector retriever returned {_count(vector_results)}. BM25 retriever returned {_count(bm25_results)}.")
+        logger.debug(f"Combined and de-duplicated results: {len(combined)} nodes, "
+            f"{len(candidates)} sent to the reranker.")
+        return candidates
+
+    def _ran_branches(
+        self,
+        vector_results: Optional[List[NodeWithScore]],
+        bm25_results: Optional[List[NodeWithScore]]
+    ) -> Tuple[List[str], List[List[NodeWithScore]], List[float]]:
+        """Returns the names, results and effective weights of the branches that ran."""
+        configured = [(VECTOR, vector_results, self.vector_weight), (BM25, bm25_results, self.bm25_weight)]
+        ran = [branch for branch in configured if branch[1] is not None]
+        names = [name for name, _, _ in ran]
+        results = [nodes for _, nodes, _ in ran]
+        if len(ran) == len(configured):
+            return names, results, [weight for _, _, weight in ran]
+
+        total = self.vector_weight + self.bm25_weight
+        ran_total = sum(weight for _, _, weight in ran)
+        scale = total / ran_total if ran_total else 1.0
+        return names, results, [weight * scale for _, _, weight in ran]
+
+    def _merge(
+        self,
+        names: Sequence[str],
+        branches: Sequence[List[NodeWithScore]],
+        weights: Sequence[float]
+    ) -> CandidateBatch:
+        """
+        Merges the branch results into a columnar batch of fused candidates.
+
+        Every unique node becomes one row carrying the raw score and rank of each
+        branch that returned it; the branch outputs are not modified. Without a
+        fusion strategy the fused score is the weighted sum of the raw branch scores;
+        otherwise the strategy fuses them.
+        """
+        candidates = CandidateBatch.from_branches(names, branches)
+        if self.fusion is None:
+            fused = np.nan_to_num(candidates.branch_scores) @ np.asarray(weights, dtype=np.float64)
+        else:
+            fused = self.fusion.fuse(candidates.branch_scores, candidates.branch_ranks, weights)
+        return candidates.with_scores(fused)
+
+    def _prune_candidates(self, candidates: CandidateBatch) -> CandidateBatch:
+        """
+        Applies the rerank candidate budget and sorts the fused candidates.
+
+        Candidates below `min_fused_score` are dropped, and if more than
+        `rerank_candidates` remain only the strongest ones by fused score are kept,
+        so the cross-encoder cost does not grow with the first-stage depth.
+        """
+        if self.min_fused_score is not None:
+            candidates = candidates.take(np.flatnonzero(candidates.scores >= self.min_fused_score))
+        return candidates.top_k(self.rerank_candidates)
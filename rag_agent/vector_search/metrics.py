@@ -0,0 +1,205 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+import json
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    A log-bucketed latency histogram in the spirit of HdrHistogram.
+
+    Every recorded value falls into a bucket whose width is a fixed share of its
+    lower bound, so any quantile is reported within `relative_error` of the true
+    value while memory grows only with the logarithm of the recorded range.
+    Recording is O(1) and needs no sample reservoir.
+    """
+    def __init__(self, relative_error: float = 0.01, min_value: float = 1e-6):
+        """
+        Initializes the histogram.
+
+        Args:
+            relative_error: The maximum relative error of a reported quantile.
+            min_value: The smallest distinguishable value in seconds; smaller values
+                       are counted in the lowest bucket.
+
+        Raises:
+            ValueError: If relative_error is not in (0, 1) or min_value is not positive.
+        """
+        if not 0.0 < relative_error < 1.0:
+            raise ValueError("relative_error must be between 0 and 1")
+        if min_value <= 0.0:
+            raise ValueError("min_value must be positive")
+        self.relative_error = relative_error
+        self.min_value = min_value
+        self._log_base = math.log1p(2.0 * relative_error)
+        self._buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Records one value in seconds."""
+        self._buckets[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the value below which a share `q` of the recorded values falls.
+
+        Args:
+            q: The quantile in [0, 1].
+
+        Returns:
+            The estimated quantile in seconds, or 0.0 if nothing was recorded.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        if rank >= self.count:
+            # The extremes are tracked exactly
+            return self.max
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                # The bucket midpoint is within relative_error of every value in it
+                value = self.min_value * math.exp((index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def snapshot(self, quantiles: Sequence[float] = (0.5, 0.9, 0.99)) -> Dict[str, float]:
+        """Returns the count, sum, extremes and the requested quantiles."""
+        summary = {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+        }
+        for q in quantiles:
+            summary[f"p{q * 100:g}"] = self.quantile(q)
+        return summary
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_base)
+
+
+class RetrievalMetrics:
+    """
+    In-process metrics for the retrieval pipeline.
+
+    Collects a LatencyHistogram per stage (e.g. "vector", "bm25", "fusion",
+    "rerank", "query"), last-value gauges such as candidate counts, and monotonic
+    counters such as cache hits. The current state can be exported in the
+    Prometheus text exposition format or as a JSON snapshot, so per-stage
+    p50/p99 latencies are visible without a tracing backend.
+    """
+    def __init__(
+        self,
+        namespace: str = "rag",
+        quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+        relative_error: float = 0.01
+    ):
+        """
+        Initializes the metrics.
+
+        Args:
+            namespace: The prefix of the exported Prometheus metric names.
+            quantiles: The latency quantiles reported by `snapshot` and `to_prometheus`.
+            relative_error: The relative error of the stage latency histograms.
+        """
+        self.namespace = namespace
+        self.quantiles = tuple(quantiles)
+        self.relative_error = relative_error
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._gauges: Dict[str, float] = {}
+        self._counters: Counter = Counter()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records the latency of one execution of a stage."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self.relative_error)
+            histogram.record(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Records the wall-clock time spent in the `with` block as a stage latency."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Sets a gauge to its latest value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Increments a counter."""
+        with self._lock:
+            self._counters[name] += amount
+
+    def quantile(self, stage: str, q: float) -> Optional[float]:
+        """Returns a latency quantile of a stage in seconds, or None if it never ran."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            return histogram.quantile(q) if histogram is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the stage latencies, gauges and counters as plain dictionaries."""
+        with self._lock:
+            return {
+                "latency_seconds": {
+                    stage: histogram.snapshot(self.quantiles)
+                    for stage, histogram in sorted(self._histograms.items())
+                },
+                "gauges": dict(sorted(self._gauges.items())),
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def to_json(self) -> str:
+        """Returns `snapshot` serialized as JSON."""
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Stage latencies are exported as a summary with precomputed quantiles, gauges
+        and counters as one labelled metric family each.
+        """
+        snapshot = self.snapshot()
+        latency = f"{self.namespace}_stage_latency_seconds"
+        gauges = f"{self.namespace}_gauge"
+        counters = f"{self.namespace}_events_total"
+        lines = [
+            f"# HELP {latency} Latency of each retrieval pipeline stage.",
+            f"# TYPE {latency} summary",
+        ]
+        for stage, summary in snapshot["latency_seconds"].items():
+            for q in self.quantiles:
+                lines.append(f'{latency}{{stage="{stage}",quantile="{q:g}"}} {summary[f"p{q * 100:g}"]:.9g}')
+            lines.append(f'{latency}_sum{{stage="{stage}"}} {summary["sum"]:.9g}')
+            lines.append(f'{latency}_count{{stage="{stage}"}} {summary["count"]}')
+        lines += [f"# HELP {gauges} Latest value of a retrieval pipeline gauge.", f"# TYPE {gauges} gauge"]
+        for name, value in snapshot["gauges"].items():
+            lines.append(f'{gauges}{{name="{name}"}} {value:g}')
+        lines += [f"# HELP {counters} Number of retrieval pipeline events.", f"# TYPE {counters} counter"]
+        for name, value in snapshot["counters"].items():
+            lines.append(f'{counters}{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,133 @@
+from typing import Any, Callable, Dict, Hashable, List
+import logging
+import os
+import threading
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def model_nbytes(model: Any) -> int:
+    """
+    Estimates the memory held by a model's weights.
+
+    PyTorch modules count their parameters and buffers. Other models may report
+    an `nbytes` attribute or a `model_path` whose file size is used instead, like
+    ONNX Runtime sessions, which keep the weights of the file in memory.
+    """
+    if isinstance(model, torch.nn.Module):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+    nbytes = getattr(model, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    model_path = getattr(model, "model_path", None)
+    if isinstance(model_path, str) and os.path.exists(model_path):
+        return os.path.getsize(model_path)
+    return 0
+
+
+class ModelRegistry:
+    """
+    Loads models lazily and shares them across the process.
+
+    A model is identified by a hashable key describing how it is loaded, e.g. the
+    backend and the model name. The first `get` of a key runs its loader; every
+    later call, from any thread, returns the same object. Different keys load
+    concurrently, while concurrent requests for the same key wait for one load.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Hashable, Any] = {}
+        self._load_seconds: Dict[Hashable, float] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the model of `key`, loading it with `loader` on first use.
+
+        Args:
+            key: The identity of the model.
+            loader: Creates the model; called at most once per key while it is registered.
+
+        Returns:
+            The shared model.
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                model = loader()
+                with self._lock:
+                    self._models[key] = model
+                    self._load_seconds[key] = time.perf_counter() - start
+                logger.info(f"Loaded model {key} in {self._load_seconds[key]:.2f}s")
+        return model
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def release(self, key: Hashable) -> bool:
+        """
+        Drops a model, closing it if it has a `close` method, e.g. a process pool.
+
+        Rerankers that still hold the model must not use it afterwards.
+
+        Returns:
+            Whether the model was loaded.
+        """
+        with self._lock:
+            self._load_seconds.pop(key, None)
+            model = self._models.pop(key, None)
+        if model is None:
+            return False
+        self._close(key, model)
+        return True
+
+    def clear(self) -> None:
+        """Drops and closes every loaded model."""
+        with self._lock:
+            models = dict(self._models)
+            self._models.clear()
+            self._load_seconds.clear()
+        for key, model in models.items():
+            self._close(key, model)
+
+    def memory_usage(self) -> Dict[Hashable, int]:
+        """Returns the estimated weight memory, in bytes, of every loaded model."""
+        with self._lock:
+            models = dict(self._models)
+        return {key: model_nbytes(model) for key, model in models.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the loaded models with their memory and load time, and the total memory."""
+        usage = self.memory_usage()
+        with self._lock:
+            models: List[Dict[str, Any]] = [
+                {"key": key, "bytes": nbytes, "load_seconds": self._load_seconds.get(key, 0.0)}
+                for key, nbytes in usage.items()
+            ]
+        return {"models": models, "total_bytes": sum(usage.values())}
+
+    @staticmethod
+    def _close(key: Hashable, model: Any) -> None:
+        # Models like ProcessPoolCrossEncoder keep worker processes alive until closed
+        close = getattr(model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Closing model {key} failed: {e}")
+
+
+# The registry shared by every Reranker in the process unless one is passed explicitly
+default_registry = ModelRegistry()
@@ -0,0 +1,208 @@
+from sentence_transformers import CrossEncoder
+from scipy.stats import spearmanr
+from transformers import AutoTokenizer
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import json
+import logging
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "model.onnx"
+QUANTIZED_MODEL_FILENAME = "model_int8.onnx"
+EXPORT_INFO_FILENAME = "export.json"
+DEFAULT_EXPORT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "adkllama", "onnx")
+
+# Pairs of different lengths the exported models are checked on against PyTorch
+VALIDATION_PAIRS = [
+    ["what is bm25", "BM25 ranks documents by term frequency and inverse document frequency."],
+    ["what is bm25", "Qdrant stores dense vectors for semantic search."],
+    ["how does the reranker work", "The reranker reorders search results with a cross encoder that reads "
+                                   "the query and the passage together and predicts their relevance."],
+    ["how does the reranker work", "Startup time matters for every worker process."],
+    ["hybrid search", "Hybrid search combines dense vectors and BM25 search. " * 8],
+    ["deadline", "If a branch misses its deadline the answer is built from the other branch, "
+                 "and the nodes are marked as degraded so they are not cached."],
+    ["int8 quantization", "Dynamic quantization stores the weights of linear layers as 8-bit integers."],
+    ["qdrant payload filter", "A payload filter restricts the vector search to a tenant or a date range."],
+]
+
+
+class _ScoringModule(torch.nn.Module):
+    """Wraps a sequence classification model and the CrossEncoder activation into one exportable graph."""
+    def __init__(self, model: torch.nn.Module, activation_fn: Callable, input_names: Sequence[str]):
+        super().__init__()
+        self.model = model
+        self.activation_fn = activation_fn
+        self.input_names = list(input_names)
+
+    def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+        return self.activation_fn(self.model(**dict(zip(self.input_names, inputs)), return_dict=True).logits)
+
+
+def default_export_path(model_name: str) -> str:
+    """Returns the directory the ONNX export of a model is cached in by default."""
+    return os.path.join(DEFAULT_EXPORT_DIR, model_name.replace("/", "--"))
+
+
+def score_deltas(reference: Sequence[float], scores: Sequence[float]) -> Dict[str, float]:
+    """
+    Compares the scores of a backend with reference scores of the same pairs.
+
+    Returns:
+        The largest and mean absolute score difference and the Spearman rank
+        correlation, which is what matters for reranking.
+    """
+    reference = np.asarray(reference, dtype=np.float64).ravel()
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    deltas = np.abs(scores - reference)
+    return {
+        "max_abs_delta": float(deltas.max()) if len(deltas) else 0.0,
+        "mean_abs_delta": float(deltas.mean()) if len(deltas) else 0.0,
+        "rank_correlation": float(spearmanr(reference, scores)[0]) if len(deltas) > 1 else 1.0,
+    }
+
+
+def export_onnx(
+    model_name: str,
+    path: str,
+    quantize: bool = True,
+    opset_version: int = 17,
+    validation_pairs: Optional[List[List[str]]] = None,
+    max_delta: float = 1e-3
+) -> Dict[str, Any]:
+    """
+    Exports a CrossEncoder to ONNX, optionally with a dynamically int8-quantized copy.
+
+    The activation of the CrossEncoder is part of the graph, so the ONNX models
+    return the same scores as CrossEncoder.predict. Both models are checked
+    against PyTorch on `validation_pairs`; the deltas are logged and stored in
+    export.json next to the models. The directory is written to a temporary
+    location and moved into place, so concurrent readers never see a partial export.
+
+    Args:
+        model_name: The Hugging Face name or local path of the cross-encoder.
+        path: The output directory; an existing export is replaced.
+        quantize: Whether to also write an int8 model (needs the `onnx` package).
+        opset_version: The ONNX opset.
+        validation_pairs: The (query, passage) pairs of the accuracy check.
+        max_delta: The largest score difference tolerated for the full-precision model.
+
+    Returns:
+        The content of export.json.
+
+    Raises:
+        RuntimeError: If the full-precision ONNX scores differ from PyTorch by more than max_delta.
+    """
+    validation_pairs = validation_pairs or VALIDATION_PAIRS
+    cross_encoder = CrossEncoder(model_name)
+    tokenizer = cross_encoder.tokenizer
+    max_length = cross_encoder.max_length or tokenizer.model_max_length
+    sample = tokenizer([validation_pairs[0]], truncation=True, max_length=max_length, return_tensors="pt")
+    input_names = [name for name in tokenizer.model_input_names if name in sample]
+    module = _ScoringModule(cross_encoder.model, cross_encoder.activation_fn, input_names).eval()
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".onnx-", dir=parent)
+    try:
+        with warnings.catch_warnings(), torch.inference_mode():
+            # The TorchScript exporter needs neither onnxscript nor onnx and traces BERT-style models reliably
+            warnings.simplefilter("ignore", (DeprecationWarning, torch.jit.TracerWarning))
+            torch.onnx.export(
+                module,
+                tuple(sample[name] for name in input_names),
+                os.path.join(tmp_dir, MODEL_FILENAME),
+                input_names=input_names,
+                output_names=["scores"],
+                dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, "scores": {0: "batch"}},
+                opset_version=opset_version,
+                dynamo=False,
+            )
+        tokenizer.save_pretrained(tmp_dir)
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(
+                os.path.join(tmp_dir, MODEL_FILENAME),
+                os.path.join(tmp_dir, QUANTIZED_MODEL_FILENAME),
+                weight_type=QuantType.QInt8,
+            )
+
+        reference = np.asarray(cross_encoder.predict(validation_pairs))
+        info = {"model_name": model_name, "max_length": int(max_length), "input_names": input_names}
+        for key, quantized in (("fp32", False), ("int8", True)) if quantize else (("fp32", False),):
+            scores = OnnxCrossEncoder(tmp_dir, quantized=quantized).predict(validation_pairs)
+            info[key] = score_deltas(reference, scores)
+            logger.info(f"ONNX {key} export of {model_name}: {info[key]}")
+        if info["fp32"]["max_abs_delta"] > max_delta:
+            raise RuntimeError(f"ONNX scores of {model_name} differ from PyTorch by {info['fp32']['max_abs_delta']}")
+        with open(os.path.join(tmp_dir, EXPORT_INFO_FILENAME), "w") as f:
+            json.dump(info, f, indent=2)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_dir, path)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+    return info
+
+
+class OnnxCrossEncoder:
+    """
+    A cross-encoder running an `export_onnx` model with ONNX Runtime on the CPU.
+
+    It implements the parts of the CrossEncoder interface Reranker uses:
+    `predict(pairs, batch_size)` and a Hugging Face `tokenizer`.
+    """
+    def __init__(self, path: str, quantized: bool = False, num_threads: Optional[int] = None):
+        """
+        Loads an exported model.
+
+        Args:
+            path: A directory written by export_onnx.
+            quantized: Whether to load the int8 model instead of the full-precision one.
+            num_threads: The ONNX Runtime intra-op threads; by default one per core.
+        """
+        import onnxruntime
+        self.path = path
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        info_path = os.path.join(path, EXPORT_INFO_FILENAME)
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                self.max_length = json.load(f)["max_length"]
+        else:
+            # export_onnx validates the models before it writes export.json
+            self.max_length = self.tokenizer.model_max_length
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model_path = os.path.join(path, QUANTIZED_MODEL_FILENAME if quantized else MODEL_FILENAME)
+        self.session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def predict(self, pairs: Sequence[Sequence[str]], batch_size: int = 32) -> np.ndarray:
+        """Returns one relevance score per (query, passage) pair."""
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            features = self.tokenizer(
+                [query for query, _ in batch],
+                [text for _, text in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            outputs = self.session.run(None, {name: features[name].astype(np.int64) for name in self.input_names})[0]
+            scores.append(outputs[:, 0] if outputs.shape[1] == 1 else outputs)
+        if not scores:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(scores)
@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Sequence
+import logging
+import multiprocessing
+import numpy as np
+import torch
+from .model_registry import model_nbytes
+
+logger = logging.getLogger(__name__)
+
+# Models handed to the forked workers, by pool; a worker picks its model in _init_worker
+_fork_models: Dict[int, Any] = {}
+_worker_model: Any = None
+
+
+def _init_worker(key: int, num_threads: int) -> None:
+    """Picks the model inherited from the parent and limits the worker's torch threads."""
+    global _worker_model
+    _worker_model = _fork_models[key]
+    torch.set_num_threads(num_threads)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _score_chunk(name: str, num_pairs: int, start: int, end: int, batch_size: int) -> int:
+    """Scores the pairs start..end of a shared memory block and writes their scores back into it."""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        # Everything read from the block is copied, so no view keeps it from closing
+        offsets = np.frombuffer(memory.buf, dtype=np.int64, count=2 * num_pairs + 1).copy()
+        text_start = offsets.nbytes + 8 * num_pairs
+        base = int(offsets[2 * start])
+        blob = bytes(memory.buf[text_start + base:text_start + int(offsets[2 * end])])
+        texts = [blob[offsets[i] - base:offsets[i + 1] - base].decode("utf-8") for i in range(2 * start, 2 * end)]
+        pairs = [texts[i:i + 2] for i in range(0, len(texts), 2)]
+        scores = np.asarray(_worker_model.predict(pairs, batch_size=batch_size), dtype="<f8")
+        memory.buf[offsets.nbytes + 8 * start:offsets.nbytes + 8 * end] = scores.tobytes()
+    finally:
+        memory.close()
+    return end - start
+
+
+class ProcessPoolCrossEncoder:
+    """
+    Runs the `predict` of a cross-encoder in a pool of forked worker processes.
+
+    Inference then no longer holds the GIL of the calling process, so a threaded
+    server keeps retrieving and handling requests while pairs are scored, and a
+    large rerank is split across cores. The model is loaded once in the parent
+    and the workers are forked right away, so they share its weights instead of
+    loading copies; the weights of a PyTorch model are moved to shared memory
+    first, so they stay shared even if a worker touches their pages.
+
+    The pairs of a call are written to one shared memory block as UTF-8 with an
+    offset table, each worker reads its contiguous chunk from there and writes
+    the scores back, so only block names and bounds are pickled. Chunks are cut
+    by text length, so a length-sorted call from Reranker gives every worker a
+    similar amount of work and keeps its batches length-bucketed.
+    """
+    def __init__(
+        self,
+        model: Any,
+        num_workers: int = 4,
+        threads_per_worker: int = 1,
+        min_pairs_per_worker: int = 8
+    ):
+        """
+        Initializes the pool and forks its workers.
+
+        Args:
+            model: A loaded model with `predict(pairs, batch_size)`, e.g. a CrossEncoder.
+                   It must not have run inference in this process yet, because the
+                   OpenMP and tokenizer thread pools of a parent are not usable after fork.
+            num_workers: The number of worker processes.
+            threads_per_worker: The torch intra-op threads of every worker.
+            min_pairs_per_worker: Calls are split into at most len(pairs) // min_pairs_per_worker
+                                  chunks, so small calls do not pay for many round trips.
+
+        Raises:
+            ValueError: If num_workers, threads_per_worker or min_pairs_per_worker is not positive.
+        """
+        if num_workers < 1 or threads_per_worker < 1 or min_pairs_per_worker < 1:
+            raise ValueError("num_workers, threads_per_worker and min_pairs_per_worker must be positive")
+        self.model = model
+        self.tokenizer = getattr(model, "tokenizer", None)
+        self.num_workers = num_workers
+        self.min_pairs_per_worker = min_pairs_per_worker
+        module = getattr(model, "model", model)
+        # The registry accounts the shared weights once, not once per worker
+        self.nbytes = model_nbytes(module)
+        if isinstance(module, torch.nn.Module):
+            module.share_memory()
+
+        self._key = id(self)
+        _fork_models[self._key] = model
+        # Forked workers inherit a running resource tracker; otherwise each starts its own,
+        # which reports the blocks they attached to as leaked when it exits
+        resource_tracker.ensure_running()
+        # Forking is what lets the workers inherit the loaded model
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self._key, threads_per_worker),
+        )
+        # Fork every worker now, while the model is untouched by inference
+        for future in [self._executor.submit(_ping) for _ in range(num_workers)]:
+            future.result()
+        logger.info(f"Started {num_workers} cross-encoder worker processes")
+
+    def chunk_bounds(self, costs: np.ndarray) -> np.ndarray:
+        """
+        Splits pairs into contiguous chunks of similar total cost, one per worker.
+
+        Returns:
+            The increasing chunk boundaries, starting with 0 and ending with len(costs).
+        """
+        num_chunks = max(1, min(self.num_workers, len(costs) // self.min_pairs_per_worker))
+        cumulative = np.cumsum(costs)
+        targets = np.linspace(0, cumulative[-1], num_chunks + 1)[1:-1]
+        inner = np.searchsorted(cumulative, targets, side="left") + 1
+        return np.unique(np.concatenate([[0], np.clip(inner, 1, len(costs)), [len(costs)]]))
+
+    def predict(self, pairs: Sequence[Sequence[str]], batch_size: int = 32) -> np.ndarray:
+        """Returns one relevance score per (query, passage) pair, computed in the workers."""
+        num_pairs = len(pairs)
+        if not num_pairs:
+            return np.empty(0, dtype=np.float64)
+
+        encoded: List[bytes] = [part.encode("utf-8") for pair in pairs for part in pair]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=2 * num_pairs)
+        offsets = np.zeros(2 * num_pairs + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        text_start = offsets.nbytes + 8 * num_pairs
+        memory = shared_memory.SharedMemory(create=True, size=text_start + max(int(offsets[-1]), 1))
+        try:
+            memory.buf[:offsets.nbytes] = offsets.tobytes()
+            memory.buf[text_start:text_start + int(offsets[-1])] = b"".join(encoded)
+            bounds = self.chunk_bounds(lengths[0::2] + lengths[1::2])
+            futures = [
+                self._executor.submit(_score_chunk, memory.name, num_pairs, int(start), int(end), batch_size)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+            # Every chunk finishes or fails before the block is freed
+            wait(futures)
+            for future in futures:
+                future.result()
+            scores = np.frombuffer(memory.buf, dtype="<f8", count=num_pairs, offset=offsets.nbytes).astype(np.float64)
+        finally:
+            memory.close()
+            memory.unlink()
+        return scores
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        self._executor.shutdown(wait=True)
+        _fork_models.pop(self._key, None)
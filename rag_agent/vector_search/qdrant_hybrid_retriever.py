@@ -0,0 +1,139 @@
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, QueryType
+from llama_index.core.vector_stores.types import MetadataFilters, VectorStoreQuery
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from qdrant_client.http import models as rest
+from typing import List, Optional
+from .reranker import Reranker
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+QDRANT_FUSIONS = {
+    "rrf": rest.Fusion.RRF,
+    "dbsf": rest.Fusion.DBSF,
+}
+
+
+class QdrantHybridRetriever(BaseRetriever):
+    """
+    A hybrid retriever that lets Qdrant run and fuse the dense and sparse searches.
+
+    The store created by `setup_qdrant_vector_store` already holds the `Qdrant/bm25`
+    sparse vectors next to the dense embeddings. This retriever sends a single
+    `query_points` request with a dense and a sparse prefetch and server-side
+    fusion, so no in-process BM25 index is built or kept in memory, and the fused
+    candidates are reranked with the cross-encoder as in HybridRetriever.
+    """
+    def __init__(
+        self,
+        vector_store: QdrantVectorStore,
+        embed_model: BaseEmbedding,
+        reranker: Reranker = None,
+        similarity_top_k: int = 10,
+        dense_top_k: Optional[int] = None,
+        sparse_top_k: Optional[int] = None,
+        fusion: str = "rrf",
+        rerank_top_k: int = 5,
+        filters: Optional[MetadataFilters] = None
+    ):
+        """
+        Initializes the QdrantHybridRetriever.
+
+        Args:
+            vector_store: A QdrantVectorStore created with `enable_hybrid=True`.
+            embed_model: The model used to embed queries for the dense prefetch.
+            reranker: An optional Reranker instance to reorder the fused results.
+                      If None, a default Reranker is used.
+            similarity_top_k: The number of fused candidates returned by Qdrant.
+            dense_top_k: The depth of the dense prefetch. Defaults to similarity_top_k.
+            sparse_top_k: The depth of the sparse prefetch. Defaults to similarity_top_k.
+            fusion: The server-side fusion method, "rrf" or "dbsf".
+            rerank_top_k: The number of nodes kept after reranking.
+            filters: Optional metadata filters applied to both prefetches.
+
+        Raises:
+            ValueError: If the store has no sparse encoder or the fusion is unknown.
+        """
+        if not vector_store.enable_hybrid or vector_store._sparse_query_fn is None:
+            raise ValueError("QdrantHybridRetriever requires a QdrantVectorStore created with enable_hybrid=True")
+        if fusion not in QDRANT_FUSIONS:
+            raise ValueError(f"Unknown Qdrant fusion '{fusion}'. Available: {sorted(QDRANT_FUSIONS)}")
+
+        super().__init__()
+        self.vector_store = vector_store
+        self.embed_model = embed_model
+        self.reranker = reranker or Reranker()
+        self.similarity_top_k = similarity_top_k
+        self.dense_top_k = dense_top_k or similarity_top_k
+        self.sparse_top_k = sparse_top_k or similarity_top_k
+        self.fusion = fusion
+        self.rerank_top_k = rerank_top_k
+        self.filters = filters
+
+    @classmethod
+    def from_index(cls, index, **kwargs) -> "QdrantHybridRetriever":
+        """Builds the retriever from a VectorStoreIndex backed by a QdrantVectorStore."""
+        return cls(vector_store=index.vector_store, embed_model=index._embed_model, **kwargs)
+
+    def _retrieve(self, query: QueryType, **kwargs) -> List[NodeWithScore]:
+        """
+        Retrieves the fused candidates with one Qdrant round trip and reranks them.
+
+        Args:
+            query: The user's query string or QueryBundle.
+
+        Returns:
+            A list of relevant LlamaIndex Nodes after fusion and reranking.
+        """
+        query_str = query.query_str if isinstance(query, QueryBundle) else str(query)
+        embedding = query.embedding if isinstance(query, QueryBundle) else None
+        if embedding is None:
+            embedding = self.embed_model.get_query_embedding(query_str)
+
+        fused_nodes = self._query_fused(query_str, embedding)
+        reranked_nodes = self.reranker.rerank(query_str, fused_nodes, top_k=self.rerank_top_k)
+
+        logger.info(f"Retrieved and reranked {len(reranked_nodes)} documents for query: '{query_str}'")
+        return reranked_nodes
+
+    async def _aretrieve(self, query_bundle: QueryBundle, **kwargs) -> List[NodeWithScore]:
+        """Runs `_retrieve` off the event loop; the store may only have a sync client."""
+        return await asyncio.to_thread(self._retrieve, query_bundle, **kwargs)
+
+    def _query_fused(self, query_str: str, embedding: List[float]) -> List[NodeWithScore]:
+        """Sends the dense and sparse prefetches with server-side fusion in one request."""
+        sparse_indices, sparse_values = self.vector_store._sparse_query_fn([query_str])
+        query_filter = self.vector_store._build_query_filter(
+            VectorStoreQuery(query_str=query_str, filters=self.filters)
+        )
+
+        response = self.vector_store.client.query_points(
+            collection_name=self.vector_store.collection_name,
+            prefetch=[
+                rest.Prefetch(
+                    query=embedding,
+                    using=self.vector_store.dense_vector_name,
+                    limit=self.dense_top_k,
+                    filter=query_filter,
+                ),
+                rest.Prefetch(
+                    query=rest.SparseVector(indices=sparse_indices[0], values=sparse_values[0]),
+                    using=self.vector_store.sparse_vector_name,
+                    limit=self.sparse_top_k,
+                    filter=query_filter,
+                ),
+            ],
+            query=rest.FusionQuery(fusion=QDRANT_FUSIONS[self.fusion]),
+            limit=self.similarity_top_k,
+            with_payload=True,
+        )
+
+        query_result = self.vector_store.parse_to_query_result(response.points)
+        logger.debug(f"Qdrant returned {len(query_result.nodes)} fused candidates.")
+        return [
+            NodeWithScore(node=node, score=score)
+            for node, score in zip(query_result.nodes, query_result.similarities)
+        ]
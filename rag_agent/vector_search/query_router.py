@@ -0,0 +1,354 @@
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+import argparse
+import json
+import logging
+import re
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR = "vector"
+BM25 = "bm25"
+
+ROUTES: Dict[str, FrozenSet[str]] = {
+    "both": frozenset({VECTOR, BM25}),
+    "vector": frozenset({VECTOR}),
+    "bm25": frozenset({BM25}),
+}
+ROUTE_LABELS = ("both", "vector", "bm25")
+
+_TOKEN_PATTERN = re.compile(r"\S+")
+_IDENTIFIER_PATTERNS = [
+    re.compile(r"^[A-Za-z]{1,6}[-_]?\d{2,}$"),              # error codes: E1234, ERR-404, HTTP_500
+    re.compile(r"^0x[0-9a-fA-F]+$"),                         # hex values and addresses
+    re.compile(r"^\d[\d.\-_:]*$"),                           # numbers, versions, timestamps
+    re.compile(r"^[\w\-./\\]+\.[A-Za-z0-9]{1,5}$"),          # file names and paths: utils.py, a/b.json
+    re.compile(r"^[\w\-.]*[/\\][\w\-./\\]*$"),               # paths without extension
+    re.compile(r"^[A-Za-z_]\w*_\w+$"),                       # snake_case
+    re.compile(r"^[a-z]+[A-Z]\w*$"),                         # camelCase
+    re.compile(r"^[A-Z][a-z0-9]+[A-Z]\w*$"),                 # PascalCase
+    re.compile(r"^[\w.]+(\(\)|::\w+)$"),                     # call() and scoped::names
+    # Plain all-caps words (LLAMA, RLHF, HTTP) are acronyms used in prose, not identifiers;
+    # CONSTANT_NAMES are caught by the snake_case pattern
+]
+_QUESTION_WORDS = {
+    "how", "why", "what", "which", "who", "when", "where", "can", "does", "do", "is", "are",
+    "should", "could", "would", "explain", "describe", "compare",
+}
+_STOPWORDS = _QUESTION_WORDS | {
+    "a", "an", "the", "of", "to", "in", "on", "for", "with", "and", "or", "by", "from", "as",
+    "at", "it", "its", "this", "that", "be", "was", "were", "between", "about", "into", "than",
+}
+
+
+FEATURE_NAMES = (
+    "log_tokens", "identifier_share", "digit_share", "symbol_share", "stopword_share",
+    "starts_with_question_word", "question_mark", "mean_token_length", "inner_upper_share", "quoted",
+)
+
+
+def _strip(token: str) -> str:
+    return token.strip("\"'`,;!?()[]{}<>")
+
+
+def is_identifier(token: str) -> bool:
+    """Returns True if a token looks like an identifier, error code, number or file name."""
+    token = _strip(token)
+    return bool(token) and any(pattern.match(token) for pattern in _IDENTIFIER_PATTERNS)
+
+
+def query_features(query: str) -> np.ndarray:
+    """
+    Extracts the cheap lexical features the router model is trained on.
+
+    Args:
+        query: The query string.
+
+    Returns:
+        A float64 feature vector of length `len(FEATURE_NAMES)`.
+    """
+    tokens = _TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return np.zeros(len(FEATURE_NAMES))
+    count = len(tokens)
+    words = [_strip(token).lower() for token in tokens]
+    return np.array([
+        np.log1p(count),
+        sum(is_identifier(token) for token in tokens) / count,
+        sum(any(ch.isdigit() for ch in token) for token in tokens) / count,
+        sum(any(ch in "._/\\:-" for ch in _strip(token)) for token in tokens) / count,
+        sum(word in _STOPWORDS for word in words) / count,
+        float(words[0] in _QUESTION_WORDS),
+        float(query.rstrip().endswith("?")),
+        min(np.mean([len(token) for token in tokens]) / 10.0, 3.0),
+        sum(any(ch.isupper() for ch in token[1:]) for token in tokens) / count,
+        float('"' in query or "`" in query),
+    ])
+
+
+# Labeled queries the pretrained RouterModel is fitted on; extend them with your own
+# traffic through the training entry point of this module
+SEED_QUERIES: List[Tuple[str, str]] = [
+    ("ERR-404 config.yaml", "bm25"),
+    ("E1234 in loader.py", "bm25"),
+    ("get_user_id KeyError", "bm25"),
+    ("0x7ff3 segfault", "bm25"),
+    ("HTTP_500 from /api/v2/search", "bm25"),
+    ("TimeoutError qdrant_client", "bm25"),
+    ("settings.json max_tokens", "bm25"),
+    ("`load_documents()` ValueError", "bm25"),
+    ("version 2.3.1 changelog", "bm25"),
+    ("HybridRetriever.retrieve_batch", "bm25"),
+    ("MAX_RETRIES default", "bm25"),
+    ("\"connection refused\" port 6333", "bm25"),
+    ("how does the retriever combine scores", "vector"),
+    ("why are my answers so short", "vector"),
+    ("what is the difference between fusion strategies?", "vector"),
+    ("explain how the reranker works", "vector"),
+    ("how can I make retrieval faster for long documents?", "vector"),
+    ("why does the agent ignore the most relevant passage", "vector"),
+    ("what happens when both branches return nothing?", "vector"),
+    ("describe the tradeoffs of a smaller embedding model", "vector"),
+    ("is it better to chunk by sentence or by paragraph?", "vector"),
+    ("compare reciprocal rank fusion with score normalization", "vector"),
+    ("how does RLHF change the answers of LLAMA models?", "vector"),
+    ("which documents talk about onboarding new customers", "vector"),
+    ("qdrant timeout settings", "both"),
+    ("bm25 tokenizer stemming", "both"),
+    ("reranker batch size", "both"),
+    ("vector store collection name", "both"),
+    ("LLAMA context window", "both"),
+    ("cross-encoder latency", "both"),
+    ("semantic cache threshold", "both"),
+    ("RLHF reward model", "both"),
+    ("embedding dimension mismatch", "both"),
+    ("pdf loader metadata", "both"),
+]
+
+
+class RouterModel:
+    """
+    A multinomial logistic regression over `query_features`.
+
+    The model has a few dozen weights, needs only NumPy and scores a query in
+    microseconds, so it can run on every request. Labels are the keys of `ROUTES`.
+    """
+    def __init__(self, weights: Optional[np.ndarray] = None, bias: Optional[np.ndarray] = None):
+        """
+        Initializes the model.
+
+        Args:
+            weights: A (num_features, num_labels) weight matrix. Defaults to zeros.
+            bias: A (num_labels,) bias vector. Defaults to zeros.
+        """
+        self.weights = weights if weights is not None else np.zeros((len(FEATURE_NAMES), len(ROUTE_LABELS)))
+        self.bias = bias if bias is not None else np.zeros(len(ROUTE_LABELS))
+
+    def fit(
+        self,
+        queries: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 500,
+        learning_rate: float = 0.5,
+        l2: float = 1e-3
+    ) -> "RouterModel":
+        """
+        Trains the model with full-batch gradient descent on the cross-entropy loss.
+
+        Args:
+            queries: The training queries.
+            labels: The route label of every query ("both", "vector" or "bm25").
+            epochs: The number of gradient steps.
+            learning_rate: The gradient step size.
+            l2: The L2 regularization strength on the weights.
+
+        Returns:
+            The trained model.
+
+        Raises:
+            ValueError: If a label is unknown or the inputs differ in length.
+        """
+        if len(queries) != len(labels):
+            raise ValueError("queries and labels must have the same length")
+        unknown = set(labels) - set(ROUTE_LABELS)
+        if unknown:
+            raise ValueError(f"Unknown route labels {sorted(unknown)}. Available: {list(ROUTE_LABELS)}")
+
+        features = np.stack([query_features(query) for query in queries])
+        targets = np.zeros((len(labels), len(ROUTE_LABELS)))
+        targets[np.arange(len(labels)), [ROUTE_LABELS.index(label) for label in labels]] = 1.0
+
+        for _ in range(epochs):
+            error = (_softmax(features @ self.weights + self.bias) - targets) / len(labels)
+            self.weights -= learning_rate * (features.T @ error + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        return self
+
+    def predict_proba(self, query: str) -> np.ndarray:
+        """Returns the probability of every label in `ROUTE_LABELS` for a query."""
+        return _softmax(query_features(query) @ self.weights + self.bias)
+
+    def save(self, path: str) -> None:
+        """Saves the weights to a `.npz` file."""
+        np.savez(path, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "RouterModel":
+        """Loads a model saved with `save`."""
+        with np.load(path) as data:
+            return cls(weights=data["weights"], bias=data["bias"])
+
+    @classmethod
+    def pretrained(cls) -> "RouterModel":
+        """
+        Returns a model fitted on `SEED_QUERIES`.
+
+        Fitting is deterministic and takes milliseconds, so the weights are fitted
+        on first use instead of being shipped as a binary file. Models fitted on
+        labeled production queries route better; see `main`.
+        """
+        global _pretrained_weights
+        if _pretrained_weights is None:
+            queries, labels = zip(*SEED_QUERIES)
+            model = cls().fit(queries, labels, epochs=2000)
+            _pretrained_weights = (model.weights, model.bias)
+        weights, bias = _pretrained_weights
+        return cls(weights=weights.copy(), bias=bias.copy())
+
+
+_pretrained_weights: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+
+def load_labeled_queries(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads labeled queries from a JSON Lines file.
+
+    Args:
+        path: A file with one {"query": ..., "label": ...} object per line, where the
+              label is a key of `ROUTES`.
+
+    Returns:
+        The (query, label) pairs in file order.
+    """
+    with open(path, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return [(record["query"], record["label"]) for record in records]
+
+
+class QueryRouter:
+    """
+    Decides per query which HybridRetriever branches are worth running.
+
+    Rules handle the clear cases first: queries made only of identifiers, error
+    codes, numbers or file names go to BM25 alone, and long natural-language
+    questions without any identifier go to the vector search alone. Everything
+    else is scored by the optional RouterModel, and only a confident prediction
+    skips a branch; otherwise both branches run.
+    """
+    def __init__(
+        self,
+        model: Optional[RouterModel] = None,
+        min_confidence: float = 0.7,
+        long_query_tokens: int = 8,
+        use_rules: bool = True
+    ):
+        """
+        Initializes the router.
+
+        Args:
+            model: An optional trained RouterModel for queries the rules do not decide.
+            min_confidence: The minimum model probability required to skip a branch.
+            long_query_tokens: The token count from which an identifier-free query is
+                               routed to the vector branch only.
+            use_rules: Whether the rules are applied before the model.
+        """
+        self.model = model
+        self.min_confidence = min_confidence
+        self.long_query_tokens = long_query_tokens
+        self.use_rules = use_rules
+        self._lock = threading.Lock()
+        self.route_counts: Counter = Counter()
+        self.source_counts: Counter = Counter()
+
+    def route(self, query: str) -> FrozenSet[str]:
+        """
+        Returns the set of branches to run for a query.
+
+        Args:
+            query: The query string.
+
+        Returns:
+            A subset of {VECTOR, BM25} with at least one branch.
+        """
+        label, source = None, "default"
+        if self.use_rules:
+            label = self._apply_rules(query)
+            if label is not None:
+                source = "rule"
+        if label is None and self.model is not None:
+            probabilities = self.model.predict_proba(query)
+            best = int(np.argmax(probabilities))
+            if probabilities[best] >= self.min_confidence:
+                label, source = ROUTE_LABELS[best], "model"
+        if label is None:
+            label = "both"
+
+        with self._lock:
+            self.route_counts[label] += 1
+            self.source_counts[source] += 1
+        logger.debug(f"Routed query '{query}' to '{label}' by {source}")
+        return ROUTES[label]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns how often each route was chosen and what decided it."""
+        with self._lock:
+            return {
+                "route_counts": dict(self.route_counts),
+                "source_counts": dict(self.source_counts),
+            }
+
+    def _apply_rules(self, query: str) -> Optional[str]:
+        tokens = _TOKEN_PATTERN.findall(query)
+        if not tokens:
+            return None
+        identifiers = sum(is_identifier(token) for token in tokens)
+        if identifiers == len(tokens) and len(tokens) <= 3:
+            return "bm25"
+        if identifiers == 0 and len(tokens) >= self.long_query_tokens:
+            return "vector"
+        return None
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trains a RouterModel on labeled queries.")
+    parser.add_argument("labeled", nargs="*", help="JSON Lines files of {\"query\", \"label\"} records")
+    parser.add_argument("--out", required=True, help="the .npz file the weights are saved to")
+    parser.add_argument("--no-seed", action="store_true", help="train without the bundled SEED_QUERIES")
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    examples = [] if args.no_seed else list(SEED_QUERIES)
+    for path in args.labeled:
+        examples.extend(load_labeled_queries(path))
+    if not examples:
+        parser.error("no training queries: pass labeled files or drop --no-seed")
+    queries, labels = zip(*examples)
+    model = RouterModel().fit(queries, labels, epochs=args.epochs, learning_rate=args.learning_rate, l2=args.l2)
+    predictions = [ROUTE_LABELS[int(np.argmax(model.predict_proba(query)))] for query in queries]
+    accuracy = np.mean([prediction == label for prediction, label in zip(predictions, labels)])
+    model.save(args.out)
+    logger.info(f"Trained on {len(queries)} queries, training accuracy {accuracy:.2f}, saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import numpy as np
+from .reranker import Reranker
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+_OK = b"\x00"
+_ERROR = b"\x01"
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class _Request:
+    __slots__ = ("pairs", "future")
+
+    def __init__(self, pairs: List[List[str]]):
+        self.pairs = pairs
+        self.future: Future = Future()
+
+
+class MicroBatcher:
+    """
+    Merges the pairs of concurrent rerank requests into large model batches.
+
+    Requests are queued; a worker thread takes the first waiting request, keeps
+    collecting until `max_wait_ms` have passed or `max_batch_pairs` pairs are
+    gathered, scores everything with one `predict_fn` call and hands every
+    request its slice of the scores. A lone request waits at most `max_wait_ms`,
+    while under load the model sees few large batches instead of many small ones.
+
+    It has the `predict(pairs, batch_size)` method of a cross-encoder, so it can
+    be set as the model of a Reranker to share batches between the threads of a
+    process.
+    """
+    def __init__(
+        self,
+        predict_fn: Callable[[List[List[str]]], Sequence[float]],
+        max_batch_pairs: int = 256,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Initializes the batcher and starts its worker thread.
+
+        Args:
+            predict_fn: Scores a list of (query, passage) pairs, e.g. Reranker._predict.
+            max_batch_pairs: The number of pairs that closes a batch early. A single
+                             larger request is scored as one batch of its own.
+            max_wait_ms: How long the first request of a batch waits for others.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_pairs = max_batch_pairs
+        self.max_wait_ms = max_wait_ms
+        self.tokenizer = None
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.pairs = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="rerank-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, pairs: List[List[str]]) -> Future:
+        """Queues the pairs of one request; the future resolves to their scores."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        request = _Request([list(pair) for pair in pairs])
+        if not request.pairs:
+            request.future.set_result(np.empty(0, dtype=np.float64))
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def predict(self, pairs: List[List[str]], batch_size: Optional[int] = None) -> np.ndarray:
+        """Scores the pairs together with those of concurrent callers; blocks until done."""
+        return self.submit(pairs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of batches, requests and pairs scored so far."""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "pairs": self.pairs,
+                "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            }
+
+    def close(self) -> None:
+        """Scores the queued requests and stops the worker thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def _run(self) -> None:
+        pending: Optional[_Request] = None
+        while True:
+            request = pending if pending is not None else self._queue.get()
+            pending = None
+            if request is None:
+                return
+            batch = [request]
+            num_pairs = len(request.pairs)
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            stop = False
+            while num_pairs < self.max_batch_pairs:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                if num_pairs + len(request.pairs) > self.max_batch_pairs:
+                    # Too large for this batch; it opens the next one
+                    pending = request
+                    break
+                batch.append(request)
+                num_pairs += len(request.pairs)
+            self._score(batch)
+            if stop:
+                return
+
+    def _score(self, batch: List[_Request]) -> None:
+        pairs = [pair for request in batch for pair in request.pairs]
+        try:
+            scores = np.asarray(self.predict_fn(pairs), dtype=np.float64)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.pairs += len(pairs)
+        offset = 0
+        for request in batch:
+            request.future.set_result(scores[offset:offset + len(request.pairs)])
+            offset += len(request.pairs)
+
+
+class _RerankHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        # One connection carries many requests of one client thread
+        while True:
+            try:
+                payload = _recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                pairs = json.loads(payload)["pairs"]
+                scores = self.server.batcher.predict(pairs)
+                response = _OK + np.asarray(scores, dtype="<f8").tobytes()
+            except Exception as e:
+                logger.exception("Rerank request failed")
+                response = _ERROR + str(e).encode("utf-8")
+            try:
+                _send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every thread of every worker opens a connection; the default backlog of 5 refuses bursts
+    request_queue_size = socket.SOMAXCONN
+
+
+class RerankServer:
+    """
+    Serves a Reranker to other processes over a UNIX socket, with micro-batching.
+
+    The API workers of a host connect with RerankClient, so the model weights are
+    loaded once per host, and the pairs of concurrent requests from all workers are
+    merged into large batches by a MicroBatcher. Each batch goes through
+    Reranker._predict, so it is also sorted by length and can use a score cache.
+    The model only ever runs on the batcher thread, which also keeps it safe from
+    concurrent use; Hugging Face fast tokenizers fail when called from several threads.
+    """
+    def __init__(
+        self,
+        reranker: Reranker,
+        socket_path: str,
+        max_batch_pairs: int = 256,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Initializes the server and binds its socket; call `start` to serve.
+
+        Args:
+            reranker: The reranker whose model scores the pairs.
+            socket_path: The path of the UNIX socket; a stale socket file is replaced.
+            max_batch_pairs: The number of pairs that closes a batch early.
+            max_wait_ms: How long the first request of a batch waits for others.
+        """
+        self.reranker = reranker
+        self.socket_path = socket_path
+        self.batcher = MicroBatcher(reranker._predict, max_batch_pairs=max_batch_pairs, max_wait_ms=max_wait_ms)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self._server = _UnixServer(socket_path, _RerankHandler)
+        self._server.batcher = self.batcher
+        self._thread: Optional[threading.Thread] = None
+        self._served = False
+
+    def start(self) -> "RerankServer":
+        """Starts serving in a background thread."""
+        self._served = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="rerank-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Rerank service listening on {self.socket_path}")
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves in the calling thread until `close` is called from another thread."""
+        logger.info(f"Rerank service listening on {self.socket_path}")
+        self._served = True
+        self._server.serve_forever()
+
+    def close(self) -> None:
+        """Stops serving, scores queued requests and removes the socket file."""
+        if self._served:
+            # shutdown waits for serve_forever, so it would block if serving never started
+            self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class RerankClient:
+    """
+    Scores pairs with a RerankServer; usable as the model of a Reranker.
+
+    Every thread keeps its own connection, so concurrent requests of one process
+    reach the server concurrently and can share a batch.
+    """
+    def __init__(self, socket_path: str, timeout: Optional[float] = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.tokenizer = None
+        self._local = threading.local()
+
+    def predict(self, pairs: List[List[str]], batch_size: Optional[int] = None) -> np.ndarray:
+        """Returns the scores of the pairs; raises RuntimeError if the server failed to score them."""
+        if not len(pairs):
+            return np.empty(0, dtype=np.float64)
+        payload = json.dumps({"pairs": [list(pair) for pair in pairs]}).encode("utf-8")
+        try:
+            response = self._roundtrip(payload)
+        except (ConnectionError, FileNotFoundError):
+            # The server may have restarted; retry once on a fresh connection
+            self._disconnect()
+            response = self._roundtrip(payload)
+        except OSError:
+            # A timed-out request is not retried, it would only add to the server's backlog;
+            # its late response would be read by the next request, so the connection is dropped
+            self._disconnect()
+            raise
+        if response[:1] != _OK:
+            raise RuntimeError(f"Rerank service error: {response[1:].decode('utf-8', 'replace')}")
+        return np.frombuffer(response[1:], dtype="<f8").astype(np.float64)
+
+    def close(self) -> None:
+        """Closes the calling thread's connection."""
+        self._disconnect()
+
+    def _roundtrip(self, payload: bytes) -> bytes:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        _send_frame(sock, payload)
+        return _recv_frame(sock)
+
+    def _disconnect(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+def remote_reranker(socket_path: str, **kwargs: Any) -> Reranker:
+    """
+    Returns a Reranker that scores through the RerankServer on `socket_path`.
+
+    The server sorts its merged batches by length, so the client does not.
+    Other keyword arguments, e.g. a score_cache, are passed to Reranker.
+    """
+    reranker = Reranker(sort_by_length=False, **kwargs)
+    reranker.model = RerankClient(socket_path)
+    return reranker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serves a cross-encoder reranker over a UNIX socket.")
+    parser.add_argument("--socket", required=True, help="the UNIX socket path")
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-batch-pairs", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    reranker = Reranker(args.model, batch_size=args.batch_size, backend=args.backend)
+    reranker.load()
+    server = RerankServer(reranker, args.socket, max_batch_pairs=args.max_batch_pairs, max_wait_ms=args.max_wait_ms)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,146 @@
 from sentence_transformers import CrossEncoder
-from typing import List
+from transformers import PreTrainedTokenizerBase
+from typing import List, Optional, Sequence, Tuple
 from llama_index.core.schema import NodeWithScore
+from .candidates import CandidateBatch
+from .onnx_cross_encoder import (
+    EXPORT_INFO_FILENAME,
+    MODEL_FILENAME,
+    QUANTIZED_MODEL_FILENAME,
+    OnnxCrossEncoder,
+    default_export_path,
+    export_onnx,
+)
+from .model_registry import ModelRegistry, default_registry
+from .pooled_cross_encoder import ProcessPoolCrossEncoder
+from .score_cache import PairScoreCache
 import logging
+import os
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 class Reranker:
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        self.model = CrossEncoder(model_name)
-        logger.info(f"Reranker initialized with model: {model_name}")
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 32,
+        sort_by_length: bool = True,
+        backend: str = "torch",
+        onnx_path: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        registry: Optional[ModelRegistry] = None,
+        score_cache: Optional[PairScoreCache] = None,
+        num_workers: Optional[int] = None
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        if backend not in ("torch", "onnx", "onnx-int8"):
+            raise ValueError(f"Unknown reranker backend: {backend}")
+        if num_workers is not None and backend != "torch":
+            # An ONNX Runtime session does not survive fork, so it cannot be shared with workers
+            raise ValueError("num_workers requires the torch backend")
+        if num_workers is not None and num_workers < 1:
+            raise ValueError("num_workers must be positive")
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_path = onnx_path or (default_export_path(model_name) if backend != "torch" else None)
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.registry = registry if registry is not None else default_registry
+        self.score_cache = score_cache
+        self.num_workers = num_workers
+        # Loading is deferred to the first use, so constructing a Reranker is free
+        self._model = None
+        if num_workers:
+            # Except for a process pool: its workers are forked, and forking on the first
+            # query would happen on a retriever thread of an already multi-threaded process.
+            # Construct a pooled Reranker at startup, before the server starts its threads.
+            self._model = self.registry.get(self.model_key, self._load_model)
+        logger.info(f"Reranker initialized with model: {model_name} ({backend})")
+
+    @property
+    def model_key(self) -> Tuple:
+        return (self.backend, self.model_name, self.onnx_path, self.num_threads, self.num_workers)
+
+    @property
+    def model(self):
+        if self._model is not None:
+            return self._model
+        return self.registry.get(self.model_key, self._load_model)
+
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    def load(self):
+        """Loads the model now instead of on the first query, e.g. while a server starts."""
+        return self.model
+
+    def _load_model(self):
+        if self.backend == "torch":
+            model = CrossEncoder(self.model_name)
+            if self.num_workers:
+                # The workers are forked from the loaded model and share its weights
+                return ProcessPoolCrossEncoder(model, num_workers=self.num_workers, threads_per_worker=self.num_threads or 1)
+            return model
+        # The model is exported once and the export is reused by every later process
+        quantized = self.backend == "onnx-int8"
+        required = [EXPORT_INFO_FILENAME, QUANTIZED_MODEL_FILENAME if quantized else MODEL_FILENAME]
+        if not all(os.path.exists(os.path.join(self.onnx_path, name)) for name in required):
+            export_onnx(self.model_name, self.onnx_path, quantize=quantized)
+        return OnnxCrossEncoder(self.onnx_path, quantized=quantized, num_threads=self.num_threads)
+
+    def _pair_lengths(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if isinstance(tokenizer, PreTrainedTokenizerBase):
+            encoded = tokenizer(
+                [query for query, _ in pairs],
+                [text for _, text in pairs],
+                truncation=True,
+                return_length=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )
+            return np.asarray(encoded["length"])
+        # Without a Hugging Face tokenizer the character count is a close enough proxy
+        return np.asarray([len(query) + len(text) for query, text in pairs])
+
+    def _predict(self, pairs: List[List[str]]) -> np.ndarray:
+        if self.score_cache is None:
+            return self._infer(pairs)
+
+        namespace = f"{self.backend}:{self.model_name}"
+        keys = [PairScoreCache.make_key(namespace, query, text) for query, text in pairs]
+        cached = self.score_cache.get_many(keys)
+        # Each distinct missing pair goes to the model once, even if a batch repeats it
+        missing = {}
+        for i, (key, score) in enumerate(zip(keys, cached)):
+            if score is None:
+                missing.setdefault(key, i)
+        scores = np.array([np.nan if score is None else score for score in cached], dtype=np.float64)
+        if missing:
+            computed = np.asarray(self._infer([pairs[i] for i in missing.values()]), dtype=np.float64)
+            self.score_cache.put_many(list(missing), computed)
+            computed_by_key = dict(zip(missing, computed))
+            for i, (key, score) in enumerate(zip(keys, cached)):
+                if score is None:
+                    scores[i] = computed_by_key[key]
+        logger.debug(f"Pair score cache: {len(pairs) - len(missing)} of {len(pairs)} pairs served from cache")
+        return scores
+
+    def _infer(self, pairs: List[List[str]]) -> np.ndarray:
+        if not self.sort_by_length or len(pairs) <= 1:
+            return np.asarray(self.model.predict(pairs, batch_size=self.batch_size))
+
+        # CrossEncoder pads every batch to its longest pair. Sorted by token length,
+        # consecutive batches hold pairs of similar length and little padding.
+        order = np.argsort(self._pair_lengths(pairs), kind="stable")
+        sorted_scores = np.asarray(self.model.predict([pairs[i] for i in order], batch_size=self.batch_size))
+        scores = np.empty_like(sorted_scores)
+        scores[order] = sorted_scores
+        return scores
 
     def rerank(self, query: str, nodes: List[NodeWithScore], top_k: int = 5) -> List[NodeWithScore]:
         if not nodes:
@@ -18,7 +150,7 @@ class Reranker:
 
         pairs = [[query, node.text] for node in nodes]
 
-        scores = self.model.predict(pairs)
+        scores = self._predict(pairs)
 
         for node, score in zip(nodes, scores):
             node.score = float(score)
@@ -30,3 +162,43 @@ class Reranker:
             logger.debug(f"  Rank {i+1}: Node ID: {node.node_id}, Score: {node.score}")
 
         return reranked
+
+    def rerank_candidates(self, query: str, candidates: CandidateBatch, top_k: int = 5) -> List[NodeWithScore]:
+        if not len(candidates):
+            return []
+
+        logger.debug(f"Reranking {len(candidates)} candidates for query: {query}")
+
+        scores = self._predict([[query, text] for text in candidates.texts])
+
+        # Sorting and top-k run on the score array; only the returned rows become nodes
+        reranked = candidates.with_scores(scores).top_k(top_k)
+
+        logger.info(f"Reranked and returned top {len(reranked)} documents.")
+        return reranked.to_nodes()
+
+    def rerank_candidates_batch(
+        self,
+        queries: List[str],
+        candidates_per_query: List[CandidateBatch],
+        top_k: int = 5
+    ) -> List[List[NodeWithScore]]:
+        if len(queries) != len(candidates_per_query):
+            raise ValueError("queries and candidates_per_query must have the same length")
+
+        pairs = [[query, text] for query, candidates in zip(queries, candidates_per_query) for text in candidates.texts]
+        if not pairs:
+            return [[] for _ in queries]
+
+        logger.debug(f"Reranking {len(pairs)} pairs for {len(queries)} queries in one batch")
+
+        scores = np.asarray(self._predict(pairs), dtype=np.float64)
+        offsets = np.cumsum([0] + [len(candidates) for candidates in candidates_per_query])
+
+        results = [
+            candidates.with_scores(scores[start:end]).top_k(top_k).to_nodes()
+            for candidates, start, end in zip(candidates_per_query, offsets[:-1], offsets[1:])
+        ]
+
+        logger.info(f"Reranked {len(queries)} queries in one batch.")
+        return results
@@ -0,0 +1,237 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class PairScoreCache:
+    """
+    A content-addressed, thread-safe LRU cache of cross-encoder pair scores.
+
+    A score is keyed by a hash of the model, the normalized query and the passage
+    text, so it is found again whichever node, retriever or request the passage
+    comes from, and a changed passage is simply a new key. Popular questions and
+    retries therefore only send unseen pairs to the model.
+
+    An optional on-disk tier in SQLite keeps scores across restarts and can be
+    shared by worker processes. It is consulted on memory misses, its hits are
+    promoted to memory, and it is bounded by evicting the least recently used rows.
+    The disk tier has its own lock, so memory hits never wait for SQLite, and the
+    recency of disk hits is written in batches with the next write.
+    """
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 10_000_000
+    ):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries: The maximum number of scores kept in memory.
+            disk_path: An optional SQLite file for the on-disk tier.
+            max_disk_entries: The maximum number of scores kept on disk; it is enforced
+                              every few thousand writes, so it can be exceeded briefly.
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.disk_path = disk_path
+        self._db = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        # Last use of disk hits not yet written back, flushed with the next write
+        self._pending_used: Dict[bytes, float] = {}
+        if disk_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, timeout=30.0)
+            # WAL lets several processes read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, score REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS scores_used ON scores (used)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(namespace: str, query: str, text: str) -> bytes:
+        """
+        Builds the key of a (query, passage) pair scored by the model `namespace`.
+
+        Returns:
+            A 16-byte BLAKE2b digest.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (namespace, normalize_query(query), text):
+            encoded = part.encode("utf-8")
+            # Length prefixes keep ("ab", "c") and ("a", "bc") apart
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[float]]:
+        """
+        Looks up many keys at once.
+
+        Returns:
+            The cached score of every key, or None for misses.
+        """
+        scores: List[Optional[float]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._entries.get(key)
+                if score is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    scores[i] = score
+            self.hits += len(keys) - len(missing)
+        if not missing:
+            return scores
+
+        found: Dict[bytes, float] = {}
+        if self._db is not None:
+            try:
+                found = self._disk_get([keys[i] for i in missing])
+            except sqlite3.Error as e:
+                # A busy or broken disk tier only costs cache hits
+                logger.warning(f"Pair score cache lookup in {self.disk_path} failed: {e}")
+        with self._lock:
+            still_missing = 0
+            for i in missing:
+                score = found.get(keys[i])
+                if score is None:
+                    still_missing += 1
+                else:
+                    scores[i] = score
+                    self._insert(keys[i], score)
+            self.disk_hits += len(missing) - still_missing
+            self.misses += still_missing
+        return scores
+
+    def put_many(self, keys: Sequence[bytes], scores: Sequence[float]) -> None:
+        """Stores the scores of many keys in memory and, if configured, on disk."""
+        if len(keys) != len(scores):
+            raise ValueError("keys and scores must have the same length")
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._insert(key, float(score))
+        if self._db is not None and len(keys):
+            try:
+                self._disk_put(keys, scores)
+            except sqlite3.Error as e:
+                logger.warning(f"Pair score cache write to {self.disk_path} failed: {e}")
+
+    def clear(self) -> None:
+        """Removes every score from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+        with self._disk_lock:
+            self._pending_used.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM scores")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit, disk hit, miss and eviction counters and the current occupancy."""
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+        with self._disk_lock:
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        """Writes back the pending recency updates and closes the on-disk tier."""
+        with self._disk_lock:
+            if self._db is not None:
+                try:
+                    self._flush_used()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Pair score cache write to {self.disk_path} failed: {e}")
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _insert(self, key: bytes, score: float) -> None:
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, keys: List[bytes]) -> Dict[bytes, float]:
+        found: Dict[bytes, float] = {}
+        with self._disk_lock:
+            if self._db is None:
+                return found
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._db.execute(f"SELECT key, score FROM scores WHERE key IN ({placeholders})", chunk))
+            now = time.time()
+            for key in found:
+                self._pending_used[key] = now
+            # Readers that never write still bound the backlog of recency updates
+            if len(self._pending_used) >= 4096:
+                self._flush_used()
+                self._db.commit()
+        return found
+
+    def _disk_put(self, keys: Sequence[bytes], scores: Sequence[float]) -> None:
+        now = time.time()
+        with self._disk_lock:
+            if self._db is None:
+                return
+            self._flush_used()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scores (key, score, used) VALUES (?, ?, ?)",
+                [(key, float(score), now) for key, score in zip(keys, scores)],
+            )
+            self._disk_writes += len(keys)
+            # Counting rows scans the table, so the bound is enforced every few thousand writes
+            if self._disk_writes >= min(4096, self.max_disk_entries // 16 + 1):
+                self._evict_disk()
+                self._disk_writes = 0
+            self._db.commit()
+
+    def _flush_used(self) -> None:
+        """Writes the pending last-use times of disk hits; the caller holds the disk lock and commits."""
+        if self._pending_used:
+            pending = self._pending_used
+            self._pending_used = {}
+            self._db.executemany("UPDATE scores SET used = ? WHERE key = ?", [(used, key) for key, used in pending.items()])
+
+    def _evict_disk(self) -> None:
+        excess = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY used LIMIT ?)", (excess,)
+            )
+            logger.debug(f"Evicted {excess} pair scores from {self.disk_path}")
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from llama_index.core.schema import NodeWithScore
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+from .cache import copy_nodes, get_index_version
+import logging
+import random
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _SemanticEntry:
+    __slots__ = ("query", "config", "nodes", "index_version", "expires_at")
+
+    def __init__(
+        self,
+        query: str,
+        config: Hashable,
+        nodes: List[NodeWithScore],
+        index_version: int,
+        expires_at: Optional[float]
+    ):
+        self.query = query
+        self.config = config
+        self.nodes = nodes
+        self.index_version = index_version
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    A cache of reranked retrieval results looked up by query-embedding similarity.
+
+    Past query embeddings are kept L2-normalized in a preallocated float32 matrix, so
+    a lookup is one matrix-vector product over at most `max_entries` rows. A new
+    query reuses the results of the most similar cached query when the cosine
+    similarity reaches `similarity_threshold`, which lets paraphrased questions skip
+    BM25, the vector search and the cross-encoder.
+
+    A fraction of hits (`verify_sample_rate`) can be re-run through the full pipeline
+    by the retriever; hits whose fresh results overlap too little with the cached
+    ones are counted as false hits.
+    """
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 3600.0,
+        verify_sample_rate: float = 0.0,
+        min_overlap: float = 0.5
+    ):
+        """
+        Initializes the semantic cache.
+
+        Args:
+            similarity_threshold: The minimum cosine similarity for a query to reuse a cached result.
+            max_entries: The maximum number of cached queries; the least recently used is evicted.
+            ttl_seconds: How long an entry is served after it was stored. None disables expiry.
+            verify_sample_rate: The fraction of hits re-run through the full pipeline to
+                                measure the false-hit rate.
+            min_overlap: The minimum Jaccard overlap between cached and fresh node IDs for a
+                         verified hit to count as correct.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.verify_sample_rate = verify_sample_rate
+        self.min_overlap = min_overlap
+        self._embeddings: Optional[np.ndarray] = None
+        self._entries: "OrderedDict[int, _SemanticEntry]" = OrderedDict()
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.verified_hits = 0
+        self.false_hits = 0
+
+    def lookup(self, embedding: Sequence[float], config: Hashable) -> Optional[List[NodeWithScore]]:
+        """
+        Returns the cached nodes of the most similar query, or None on a miss.
+
+        Args:
+            embedding: The query embedding.
+            config: The retriever configuration the result must have been produced with.
+
+        Returns:
+            A copy of the cached node list, or None.
+        """
+        query_vector = _normalize(embedding)
+        with self._lock:
+            slot = self._best_slot(query_vector, config)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return copy_nodes(self._entries[slot].nodes)
+
+    def add(self, embedding: Sequence[float], query: str, config: Hashable, nodes: List[NodeWithScore]) -> None:
+        """
+        Stores the reranked nodes of a query.
+
+        Args:
+            embedding: The query embedding.
+            query: The query text, kept for debugging.
+            config: The retriever configuration the result was produced with.
+            nodes: The reranked nodes.
+        """
+        query_vector = _normalize(embedding)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        entry = _SemanticEntry(query, config, copy_nodes(nodes), get_index_version(), expires_at)
+
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != len(query_vector):
+                self._reset(len(query_vector))
+            if not self._free_slots:
+                oldest_slot, _ = self._entries.popitem(last=False)
+                self._free_slots.append(oldest_slot)
+            slot = self._free_slots.pop()
+            self._embeddings[slot] = query_vector
+            self._entries[slot] = entry
+
+    def should_verify(self) -> bool:
+        """Returns True if the current hit should be re-run to measure false hits."""
+        return self.verify_sample_rate > 0 and random.random() < self.verify_sample_rate
+
+    def verify(self, cached_nodes: List[NodeWithScore], fresh_nodes: List[NodeWithScore]) -> bool:
+        """
+        Compares a served hit with the result of the full pipeline.
+
+        Args:
+            cached_nodes: The nodes the cache returned.
+            fresh_nodes: The nodes the full pipeline returned for the same query.
+
+        Returns:
+            True if the hit was correct, False if it is counted as a false hit.
+        """
+        cached_ids = {node.node_id for node in cached_nodes}
+        fresh_ids = {node.node_id for node in fresh_nodes}
+        union = cached_ids | fresh_ids
+        overlap = len(cached_ids & fresh_ids) / len(union) if union else 1.0
+        correct = overlap >= self.min_overlap
+        with self._lock:
+            self.verified_hits += 1
+            if not correct:
+                self.false_hits += 1
+        if not correct:
+            logger.debug(f"Semantic cache false hit: overlap {overlap:.2f} below {self.min_overlap}")
+        return correct
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._embeddings = None
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit, miss and false-hit counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "verified_hits": self.verified_hits,
+                "false_hits": self.false_hits,
+                "false_hit_rate": self.false_hits / self.verified_hits if self.verified_hits else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _best_slot(self, query_vector: np.ndarray, config: Hashable) -> Optional[int]:
+        """Finds the most similar live entry above the threshold, dropping stale ones."""
+        if not self._entries or self._embeddings is None or self._embeddings.shape[1] != len(query_vector):
+            return None
+
+        slots = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+        similarities = self._embeddings[slots] @ query_vector
+        now = time.monotonic()
+        index_version = get_index_version()
+        for position in np.argsort(-similarities):
+            if similarities[position] < self.similarity_threshold:
+                return None
+            slot = int(slots[position])
+            entry = self._entries[slot]
+            if entry.index_version != index_version or (entry.expires_at is not None and entry.expires_at <= now):
+                del self._entries[slot]
+                self._free_slots.append(slot)
+                continue
+            if entry.config == config:
+                return slot
+        return None
+
+    def _reset(self, dimension: int) -> None:
+        self._embeddings = np.zeros((self.max_entries, dimension), dtype=np.float32)
+        self._entries.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+
+def _normalize(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,109 @@
+# tests/rag_agent/vector_search/test_adaptive_depth.py
+
+import unittest
+from llama_index.core.schema import NodeWithScore, TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.adaptive_depth import AdaptiveDepth
+
+
+def make_nodes(ids_scores):
+    return [NodeWithScore(node=TextNode(text=f"{node_id} content", id_=node_id), score=score) for node_id, score in ids_scores]
+
+
+class TestAdaptiveDepth(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a policy with small depths."""
+        self.policy = AdaptiveDepth(depths=(2, 4), min_overlap=0.5, min_score_gap=0.2, rerank_top_k=3)
+
+    def test_invalid_depths(self):
+        """Test depths must be non-empty and strictly increasing."""
+        with self.assertRaises(ValueError):
+            AdaptiveDepth(depths=())
+        with self.assertRaises(ValueError):
+            AdaptiveDepth(depths=(10, 5))
+
+    def test_strong_pool_is_not_weak(self):
+        """Test agreeing branches with decisive scores stay at the current depth."""
+        vector = make_nodes([("a", 0.9), ("b", 0.5)])
+        bm25 = make_nodes([("a", 8.0), ("b", 2.0)])
+
+        self.assertFalse(self.policy.is_weak(2, {"vector": vector, "bm25": bm25}))
+
+    def test_low_overlap_is_weak(self):
+        """Test branches that return disjoint nodes widen the search."""
+        vector = make_nodes([("a", 0.9), ("b", 0.5)])
+        bm25 = make_nodes([("c", 8.0), ("d", 2.0)])
+
+        self.assertTrue(self.policy.is_weak(2, {"vector": vector, "bm25": bm25}))
+
+    def test_flat_scores_are_weak(self):
+        """Test a branch whose scores barely differ widens the search."""
+        vector = make_nodes([("a", 0.80), ("b", 0.79)])
+        bm25 = make_nodes([("a", 8.0), ("b", 2.0)])
+
+        self.assertTrue(self.policy.is_weak(2, {"vector": vector, "bm25": bm25}))
+
+    def test_only_the_flat_branch_is_widened(self):
+        """Test flat scores widen their own branch while low overlap widens every branch."""
+        flat = {"vector": make_nodes([("a", 0.80), ("b", 0.79)]), "bm25": make_nodes([("a", 8.0), ("b", 2.0)])}
+        disjoint = {"vector": make_nodes([("a", 0.9), ("b", 0.5)]), "bm25": make_nodes([("c", 8.0), ("d", 2.0)])}
+
+        self.assertEqual(self.policy.weak_branches(2, flat), {"vector"})
+        self.assertEqual(self.policy.weak_branches(2, disjoint), {"vector", "bm25"})
+
+    def test_calibrated_threshold_follows_the_branch_scores(self):
+        """Test the default rule flags only gaps that are unusually small for the branch."""
+        policy = AdaptiveDepth(depths=(2, 4), min_calibration=10, flat_quantile=0.2)
+        # Dense scores always sit within a few percent of each other
+        for i in range(10):
+            vector = make_nodes([("a", 0.80), ("b", 0.78 - 0.002 * i)])
+            self.assertFalse(policy.is_weak(2, {"vector": vector}))
+
+        typical = make_nodes([("a", 0.80), ("b", 0.77)])
+        flat = make_nodes([("a", 0.80), ("b", 0.7999)])
+        self.assertFalse(policy.is_weak(2, {"vector": typical}))
+        self.assertTrue(policy.is_weak(2, {"vector": flat}))
+        # Another depth keeps its own calibration
+        self.assertFalse(policy.is_weak(4, {"vector": make_nodes([("a", 0.80), ("b", 0.7999), ("c", 0.79), ("d", 0.78)])}))
+
+    def test_exhausted_branches_are_not_weak(self):
+        """Test a deeper query is skipped when every branch returned fewer nodes than asked."""
+        vector = make_nodes([("a", 0.9)])
+        bm25 = make_nodes([("c", 8.0)])
+
+        self.assertFalse(self.policy.is_weak(2, {"vector": vector, "bm25": bm25}))
+
+    def test_cut_at_elbow(self):
+        """Test the reranked list is cut after a clear score drop."""
+        reranked = make_nodes([("a", 9.0), ("b", 8.5), ("c", 1.0)])
+
+        kept = self.policy.cut(reranked)
+
+        self.assertEqual([node.node_id for node in kept], ["a", "b"])
+        self.assertEqual(self.policy.stats()["rerank_cut_counts"], {2: 1})
+
+    def test_cut_without_elbow_keeps_all(self):
+        """Test evenly spaced scores are not cut."""
+        reranked = make_nodes([("a", 3.0), ("b", 2.0), ("c", 1.0)])
+
+        self.assertEqual(len(self.policy.cut(reranked)), 3)
+
+    def test_cut_respects_min_rerank_k(self):
+        """Test the cut never keeps fewer than min_rerank_k nodes."""
+        policy = AdaptiveDepth(min_rerank_k=2)
+        reranked = make_nodes([("a", 9.0), ("b", 1.0), ("c", 0.9)])
+
+        self.assertEqual([node.node_id for node in policy.cut(reranked)], ["a", "b", "c"])
+
+    def test_record_depth(self):
+        """Test the depth counters."""
+        self.policy.record_depth(2)
+        self.policy.record_depth(2)
+        self.policy.record_depth(4)
+
+        self.assertEqual(self.policy.stats()["depth_counts"], {2: 2, 4: 1})
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,80 @@
+# tests/rag_agent/vector_search/test_bm25_batch.py
+
+import unittest
+import bm25s
+import Stemmer
+from llama_index.core.schema import MetadataMode, TextNode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from llama_index.retrievers.bm25 import BM25Retriever
+# Adjust import path based on your project structure
+from rag_agent.vector_search.bm25_batch import bm25_retrieve_batch
+
+
+class TestBM25RetrieveBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Build a small real BM25 index."""
+        texts = [
+            "Investment opportunities in MENA region: tech startups are booming.",
+            "Real estate investment trends in the MENA region.",
+            "LLAMA 2 uses reinforcement learning from human feedback.",
+            "Reinforcement learning helps models produce human-like answers.",
+            "Neural networks are used for translation and classification.",
+        ]
+        self.nodes = [TextNode(text=text, id_=f"node{i}") for i, text in enumerate(texts)]
+        self.retriever = BM25Retriever.from_defaults(nodes=self.nodes, similarity_top_k=3)
+
+    def test_matches_single_query_retrieval(self):
+        """Test the batched scores match one-by-one BM25Retriever results."""
+        queries = ["investment in MENA", "reinforcement learning feedback", "human answers"]
+
+        batch_results = bm25_retrieve_batch(self.retriever, queries)
+
+        self.assertEqual(len(batch_results), len(queries))
+        for query, batch_nodes in zip(queries, batch_results):
+            expected = [node for node in self.retriever.retrieve(query) if node.score > 0]
+            self.assertEqual([n.node_id for n in batch_nodes], [n.node_id for n in expected])
+            for batch_node, expected_node in zip(batch_nodes, expected):
+                self.assertAlmostEqual(batch_node.score, expected_node.score, places=5)
+
+    def test_respects_similarity_top_k(self):
+        """Test no more than similarity_top_k nodes are returned per query."""
+        batch_results = bm25_retrieve_batch(self.retriever, ["investment region learning human"])
+
+        self.assertEqual(len(batch_results[0]), 3)
+
+    def test_unknown_terms(self):
+        """Test a query sharing no terms with the corpus returns no nodes."""
+        batch_results = bm25_retrieve_batch(self.retriever, ["zebra", "investment"])
+
+        self.assertEqual(batch_results[0], [])
+        self.assertTrue(batch_results[1])
+
+    def test_mask_removes_baseline_scores(self):
+        """Test masked documents are not returned by BM25L/BM25+ indexes, whose baseline scores every document."""
+        for method in ("bm25l", "bm25+"):
+            with self.subTest(method=method):
+                bm25 = bm25s.BM25(
+                    method=method,
+                    corpus=[node_to_metadata_dict(node) | {"node_id": node.node_id} for node in self.nodes]
+                )
+                bm25.index(bm25s.tokenize(
+                    [node.get_content(metadata_mode=MetadataMode.EMBED) for node in self.nodes],
+                    stopwords="en",
+                    stemmer=Stemmer.Stemmer("english"),
+                    show_progress=False,
+                ), show_progress=False)
+                retriever = BM25Retriever(existing_bm25=bm25, similarity_top_k=5, corpus_weight_mask=[0, 1, 1, 0, 1])
+
+                batch_results = bm25_retrieve_batch(retriever, ["investment in MENA"])
+
+                self.assertEqual([node.node_id for node in batch_results[0]][0], "node1")
+                self.assertEqual({node.node_id for node in batch_results[0]}, {"node1", "node2", "node4"})
+
+    def test_empty_batch(self):
+        """Test an empty batch returns an empty list."""
+        self.assertEqual(bm25_retrieve_batch(self.retriever, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
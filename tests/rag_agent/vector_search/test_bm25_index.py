@@ -0,0 +1,118 @@
+# tests/rag_agent/vector_search/test_bm25_index.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from unittest.mock import patch
+from llama_index.core.schema import TextNode
+from llama_index.retrievers.bm25 import BM25Retriever
+# Adjust import path based on your project structure
+from rag_agent.vector_search.bm25_index import MmapBM25Index, MmapBM25Retriever
+
+
+class TestMmapBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [
+            TextNode(text="Qdrant stores dense vectors for semantic search", id_="doc0", metadata={"file_name": "a.md"}),
+            TextNode(text="BM25 ranks documents by term frequency and inverse document frequency", id_="doc1"),
+            TextNode(text="The reranker reorders search results with a cross encoder", id_="doc2"),
+            TextNode(text="Hybrid search combines dense vectors and BM25 search", id_="doc3"),
+            TextNode(text="Startup time matters for every worker process", id_="doc4"),
+        ]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "bm25")
+        self.index = MmapBM25Index.build(self.nodes, self.path)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_layout(self):
+        """Test the postings are CSR arrays mapped from disk with a sorted term dictionary."""
+        self.assertIsInstance(self.index.postings_docs, np.memmap)
+        self.assertIsInstance(self.index.doc_lengths, np.memmap)
+        self.assertEqual(self.index.num_docs, 5)
+        self.assertEqual(len(self.index.postings_indptr), self.index.vocab_size + 1)
+        self.assertEqual(self.index.postings_indptr[-1], len(self.index.postings_docs))
+        terms = [self.index.term(i) for i in range(self.index.vocab_size)]
+        self.assertEqual(terms, sorted(terms))
+        self.assertEqual(self.index.term_id(terms[3]), 3)
+        self.assertIsNone(self.index.term_id("unknownterm"))
+
+    def test_scores_match_bm25_retriever(self):
+        """Test the scores equal those of BM25Retriever on the same nodes."""
+        retriever = BM25Retriever.from_defaults(nodes=self.nodes, similarity_top_k=5)
+        mmap_retriever = MmapBM25Retriever(self.index, similarity_top_k=5)
+
+        for query in ["dense vectors search", "BM25 document frequency", "worker startup"]:
+            expected = {node.node_id: node.score for node in retriever.retrieve(query) if node.score > 0}
+            actual = {node.node_id: node.score for node in mmap_retriever.retrieve(query)}
+            self.assertEqual(actual.keys(), expected.keys(), query)
+            for node_id, score in expected.items():
+                self.assertAlmostEqual(actual[node_id], score, places=5)
+
+    def test_reopen_from_disk(self):
+        """Test a reopened index returns the stored nodes with their metadata."""
+        retriever = MmapBM25Retriever.from_persist_dir(self.path, similarity_top_k=2)
+
+        results = retriever.retrieve("semantic search with dense vectors")
+
+        self.assertEqual([node.node_id for node in results], ["doc0", "doc3"])
+        self.assertEqual(results[0].node.metadata, {"file_name": "a.md"})
+        self.assertEqual(results[0].node.get_content(), self.nodes[0].text)
+        self.assertEqual(retriever.retrieve("completely unrelated words"), [])
+        retriever.index.close()
+
+    def test_weight_mask_and_rebuild(self):
+        """Test masked documents are skipped and a rebuild replaces the index in place."""
+        retriever = MmapBM25Retriever(self.index, corpus_weight_mask=[0, 1, 1, 1, 1])
+        self.assertEqual([node.node_id for node in retriever.retrieve("dense vectors")], ["doc3"])
+
+        rebuilt = MmapBM25Index.build(self.nodes[:2], self.path)
+        self.assertEqual(rebuilt.num_docs, 2)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["bm25"])
+        rebuilt.close()
+
+    def test_failed_swap_keeps_the_old_index(self):
+        """Test the old index is moved back if the new one cannot take its place."""
+        real_replace = os.replace
+        calls = []
+
+        def failing_replace(src, dst):
+            calls.append(dst)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            real_replace(src, dst)
+
+        with patch("rag_agent.vector_search.bm25_index.os.replace", side_effect=failing_replace):
+            with self.assertRaises(OSError):
+                MmapBM25Index.build(self.nodes[:2], self.path)
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["bm25"])
+        reopened = MmapBM25Index(self.path)
+        self.assertEqual(reopened.num_docs, 5)
+        reopened.close()
+
+    def test_non_ascii_vocabulary_is_sorted_by_bytes(self):
+        """Test the incrementally built vocabulary is sorted like its UTF-8 keys for the binary search."""
+        nodes = [TextNode(text="über zebra äpfel", id_="de"), TextNode(text="поиск zebra apple", id_="ru")]
+        index = MmapBM25Index.build(nodes, os.path.join(self.tmp_dir.name, "utf8"), stemmer_language=None)
+        try:
+            terms = [index.term(i) for i in range(index.vocab_size)]
+            self.assertEqual(terms, sorted(terms, key=lambda term: term.encode("utf-8")))
+            self.assertEqual({terms[index.term_id(term)] for term in ["über", "поиск", "zebra"]}, {"über", "поиск", "zebra"})
+            zebra = index.term_id("zebra")
+            self.assertEqual(index.postings_indptr[zebra + 1] - index.postings_indptr[zebra], 2)
+        finally:
+            index.close()
+
+    def test_build_rejects_empty_input(self):
+        """Test building an index without nodes raises ValueError."""
+        with self.assertRaises(ValueError):
+            MmapBM25Index.build([], os.path.join(self.tmp_dir.name, "empty"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# tests/rag_agent/vector_search/test_bm25_pruning.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from llama_index.core.schema import TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.bm25_index import MmapBM25Index, MmapBM25Retriever, write_index
+from rag_agent.vector_search.bm25_pruning import BlockMaxBM25, BlockMaxBM25Retriever
+
+
+def write_random_index(path, num_docs=3000, vocab_size=400, seed=0):
+    """Writes an index of random documents with a skewed vocabulary, without tokenizing text."""
+    rng = np.random.default_rng(seed)
+    probabilities = 1.0 / np.arange(1, vocab_size + 1)
+    probabilities /= probabilities.sum()
+    doc_lengths = rng.integers(5, 40, size=num_docs)
+    token_terms = rng.choice(vocab_size, size=int(doc_lengths.sum()), p=probabilities)
+    token_docs = np.repeat(np.arange(num_docs), doc_lengths)
+    pairs, term_freqs = np.unique(token_terms * num_docs + token_docs, return_counts=True)
+    postings_indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs // num_docs, minlength=vocab_size), out=postings_indptr[1:])
+    write_index(
+        path,
+        terms=[f"t{term_id:04d}".encode("utf-8") for term_id in range(vocab_size)],
+        postings_indptr=postings_indptr,
+        postings_docs=pairs % num_docs,
+        postings_tf=term_freqs,
+        doc_lengths=doc_lengths,
+        corpus_lines=[b'{"text": ""}\n'] * num_docs,
+        k1=1.5,
+        b=0.75,
+        language="en",
+        stemmer_language=None,
+        token_pattern=r"(?u)\b\w\w+\b",
+    )
+    return MmapBM25Index(path)
+
+
+class TestBlockMaxBM25(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "bm25")
+        self.index = write_random_index(self.path)
+        self.evaluator = BlockMaxBM25(self.index, block_size=64)
+        rng = np.random.default_rng(1)
+        self.queries = [
+            [int(rng.integers(0, 5))] + rng.integers(5, 200, size=2).tolist() for _ in range(50)
+        ] + [[0, 1, 2], [7, 7, 150], [399]]
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def assert_same_top_k(self, actual, expected):
+        """Asserts equal scores; documents may only differ among ties at the k-th score."""
+        (actual_docs, actual_scores), (expected_docs, expected_scores) = actual, expected
+        np.testing.assert_array_equal(actual_scores, expected_scores)
+        if len(expected_scores):
+            above = expected_scores > expected_scores[-1]
+            self.assertEqual(set(actual_docs[above]), set(expected_docs[above]))
+
+    def test_matches_exhaustive_scoring(self):
+        """Test the pruned top k equals exhaustive scoring, including repeated query terms."""
+        for term_ids in self.queries:
+            for k in (1, 10):
+                self.assert_same_top_k(self.evaluator.top_k(term_ids, k), self.index.top_k(term_ids, k))
+
+    def test_skips_postings(self):
+        """Test most postings of the frequent query terms are never read."""
+        for term_ids in self.queries:
+            self.evaluator.top_k(term_ids, 10)
+
+        stats = self.evaluator.stats()
+        self.assertEqual(stats["queries"], len(self.queries))
+        self.assertGreater(stats["skipped_postings_ratio"], 0.5)
+        self.assertGreater(stats["candidates_scored"], 0)
+
+    def test_weight_mask(self):
+        """Test weights in [0, 1] are pruned exactly and larger weights fall back to exhaustive scoring."""
+        rng = np.random.default_rng(2)
+        for weight_mask in (rng.random(self.index.num_docs), rng.random(self.index.num_docs) * 3):
+            for term_ids in self.queries[:10]:
+                self.assert_same_top_k(
+                    self.evaluator.top_k(term_ids, 10, weight_mask=weight_mask),
+                    self.index.top_k(term_ids, 10, weight_mask=weight_mask),
+                )
+
+    def test_block_maxima_are_cached(self):
+        """Test the block maxima are written next to the index and reused."""
+        cached = [name for name in os.listdir(self.path) if name.startswith("block_max_64_")]
+        self.assertEqual(len(cached), 4)
+
+        reopened = BlockMaxBM25(self.index, block_size=64)
+        self.assertIsInstance(reopened.block_max, np.memmap)
+        np.testing.assert_array_equal(reopened.block_max, self.evaluator.block_max)
+        with self.assertRaises(ValueError):
+            BlockMaxBM25(self.index, block_size=0)
+
+    def test_retriever(self):
+        """Test the retriever returns the same nodes as MmapBM25Retriever."""
+        nodes = [
+            TextNode(text="Qdrant stores dense vectors for semantic search", id_="doc0"),
+            TextNode(text="BM25 ranks documents by term frequency", id_="doc1"),
+            TextNode(text="Hybrid search combines dense vectors and BM25 search", id_="doc2"),
+        ]
+        index = MmapBM25Index.build(nodes, os.path.join(self.tmp_dir.name, "nodes"))
+        expected = MmapBM25Retriever(index, similarity_top_k=2).retrieve("dense vectors search")
+        actual = BlockMaxBM25Retriever(index, similarity_top_k=2, block_size=2).retrieve("dense vectors search")
+
+        self.assertEqual([node.node_id for node in actual], [node.node_id for node in expected])
+        self.assertEqual([node.score for node in actual], [node.score for node in expected])
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
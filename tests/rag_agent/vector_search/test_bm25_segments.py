@@ -0,0 +1,165 @@
+# tests/rag_agent/vector_search/test_bm25_segments.py
+
+import os
+import tempfile
+import time
+import unittest
+from llama_index.core.schema import TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.bm25_index import MmapBM25Index, MmapBM25Retriever
+from rag_agent.vector_search.bm25_segments import SegmentedBM25Index, SegmentedBM25Retriever
+from rag_agent.vector_search.cache import bump_index_version
+
+
+TEXTS = [
+    "Qdrant stores dense vectors for semantic search",
+    "BM25 ranks documents by term frequency and inverse document frequency",
+    "The reranker reorders search results with a cross encoder",
+    "Hybrid search combines dense vectors and BM25 search",
+    "Startup time matters for every worker process",
+    "Segments are merged in the background to keep search fast",
+]
+
+
+def make_nodes(texts, start=0):
+    return [TextNode(text=text, id_=f"doc{start + i}") for i, text in enumerate(texts)]
+
+
+class TestSegmentedBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "segmented")
+        self.index = SegmentedBM25Index(self.path, background_merge=False)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def assert_matches_full_rebuild(self, nodes, queries):
+        """Checks the segmented scores equal those of one index built from `nodes`."""
+        full = MmapBM25Retriever(MmapBM25Index.build(nodes, os.path.join(self.tmp_dir.name, "full")), similarity_top_k=10)
+        segmented = SegmentedBM25Retriever(self.index, similarity_top_k=10)
+        for query in queries:
+            expected = {node.node_id: node.score for node in full.retrieve(query)}
+            actual = {node.node_id: node.score for node in segmented.retrieve(query)}
+            self.assertEqual(actual.keys(), expected.keys(), query)
+            for node_id, score in expected.items():
+                self.assertAlmostEqual(actual[node_id], score, places=5)
+        full.index.close()
+
+    def test_segments_use_global_statistics(self):
+        """Test documents spread over segments score as if they were indexed together."""
+        nodes = make_nodes(TEXTS)
+        self.index.add_nodes(nodes[:2])
+        self.index.add_nodes(nodes[2:5])
+        self.index.add_nodes(nodes[5:])
+
+        self.assertEqual(len(self.index.segments), 3)
+        self.assert_matches_full_rebuild(nodes, ["dense vectors search", "BM25 frequency", "background worker"])
+
+    def test_delete_and_upsert(self):
+        """Test deleted documents disappear and re-added IDs replace the old version."""
+        self.index.add_nodes(make_nodes(TEXTS))
+
+        self.assertEqual(self.index.delete(["doc0", "unknown"]), 1)
+        self.index.add_nodes([TextNode(text="Qdrant payload filters narrow the search", id_="doc3")])
+
+        retriever = SegmentedBM25Retriever(self.index)
+        self.assertNotIn("doc0", [node.node_id for node in retriever.retrieve("semantic")])
+        results = retriever.retrieve("payload filters")
+        self.assertEqual([node.node_id for node in results], ["doc3"])
+        self.assertEqual(retriever.retrieve("hybrid combines"), [])
+        self.assertEqual(self.index.stats(), {"segments": 2, "num_docs": 7, "live_docs": 5, "deleted_docs": 2})
+
+    def test_merge_compacts_segments(self):
+        """Test merging drops tombstones and keeps the scores of a full rebuild."""
+        index = SegmentedBM25Index(os.path.join(self.tmp_dir.name, "merging"), max_segments=2, background_merge=False)
+        nodes = make_nodes(TEXTS)
+        for node in nodes:
+            index.add_nodes([node])
+        index.delete(["doc1"])
+        self.index.close()
+        self.index = index
+
+        while index.maybe_merge():
+            pass
+
+        self.assertLessEqual(len(index.segments), 2)
+        self.assertEqual(index.stats()["deleted_docs"], 0)
+        self.assertEqual(index.stats()["live_docs"], 5)
+        self.assert_matches_full_rebuild([node for node in nodes if node.node_id != "doc1"], ["search", "BM25 dense"])
+        segment_dirs = os.listdir(os.path.join(index.path, "segments"))
+        self.assertEqual(sorted(segment_dirs), sorted(segment.name for segment in index.segments))
+
+    def test_merged_segments_are_closed_after_their_readers(self):
+        """Test a merged-away segment stays readable while pinned and is closed and deleted on release."""
+        index = SegmentedBM25Index(os.path.join(self.tmp_dir.name, "pinned"), max_segments=1, background_merge=False)
+        self.index.close()
+        self.index = index
+        index.add_nodes(make_nodes(TEXTS[:3]))
+        index.add_nodes(make_nodes(TEXTS[3:], start=3))
+        first, second = index.segments
+
+        with index.acquire() as pinned:
+            self.assertTrue(index.maybe_merge())
+            # The reader still scores and reads the old segments
+            hits = index.top_k("dense vectors", 2, pinned)
+            self.assertLessEqual({segment.name for segment, _, _ in hits}, {first.name, second.name})
+            self.assertTrue(all(segment.index.document(doc_id) for segment, doc_id, _ in hits))
+            self.assertFalse(first.index._terms.closed)
+            self.assertTrue(os.path.isdir(index._segment_path(first.name)))
+
+        self.assertTrue(first.index._terms.closed)
+        self.assertTrue(second.index._terms.closed)
+        self.assertEqual(os.listdir(os.path.join(index.path, "segments")), [index.segments[0].name])
+
+    def test_changes_bump_the_index_version(self):
+        """Test inserts and deletes invalidate cached retrieval results."""
+        version = bump_index_version()
+        self.index.add_nodes(make_nodes(TEXTS[:2]))
+        after_add = bump_index_version()
+        self.index.delete(["doc0"])
+        after_delete = bump_index_version()
+        self.index.delete(["unknown"])
+
+        self.assertEqual(after_add, version + 2)
+        self.assertEqual(after_delete, after_add + 2)
+        self.assertEqual(bump_index_version(), after_delete + 1)
+
+    def test_reopen(self):
+        """Test segments and tombstones survive reopening the index."""
+        self.index.add_nodes(make_nodes(TEXTS[:3]))
+        self.index.add_nodes(make_nodes(TEXTS[3:], start=3))
+        self.index.delete(["doc3"])
+        self.index.close()
+
+        self.index = SegmentedBM25Index(self.path, background_merge=False)
+
+        self.assertEqual(self.index.stats(), {"segments": 2, "num_docs": 6, "live_docs": 5, "deleted_docs": 1})
+        self.assertEqual(self.index.delete(["doc3"]), 0)
+        self.assertEqual(self.index.delete(["doc4"]), 1)
+
+    def test_background_merge(self):
+        """Test the background merger keeps the segment count bounded."""
+        index = SegmentedBM25Index(os.path.join(self.tmp_dir.name, "background"), max_segments=2, merge_factor=2)
+        try:
+            for node in make_nodes(TEXTS):
+                index.add_nodes([node])
+            deadline = time.monotonic() + 10
+            while len(index.segments) > 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            self.assertLessEqual(len(index.segments), 2)
+            self.assertEqual(index.stats()["live_docs"], len(TEXTS))
+        finally:
+            index.close()
+
+    def test_invalid_merge_settings(self):
+        """Test invalid merge settings raise ValueError."""
+        with self.assertRaises(ValueError):
+            SegmentedBM25Index(os.path.join(self.tmp_dir.name, "invalid"), merge_factor=1, background_merge=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# tests/rag_agent/vector_search/test_bm25_shards.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from llama_index.core.schema import TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.bm25_index import MmapBM25Index, MmapBM25Retriever
+from rag_agent.vector_search.bm25_shards import ShardedBM25, ShardedBM25Retriever, merge_shard_results
+
+
+class TestShardedBM25(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        words = [f"word{i}" for i in range(60)]
+        cls.nodes = [
+            TextNode(text=" ".join(rng.choice(words, size=rng.integers(3, 15))), id_=f"doc{i}")
+            for i in range(200)
+        ]
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.index = MmapBM25Index.build(cls.nodes, os.path.join(cls.tmp_dir.name, "bm25"))
+        cls.weight_mask = rng.random(cls.index.num_docs)
+        # Worker processes are slow to start, so all tests share one pool
+        cls.shards = ShardedBM25(cls.index, num_shards=3, weight_mask=cls.weight_mask, start_method="fork")
+        cls.queries = cls.index.tokenize(["word1 word2", "word3 word3 word40", "word7", "missing"])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.shards.close()
+        cls.index.close()
+        cls.tmp_dir.cleanup()
+
+    def test_doc_ranges_cover_index(self):
+        """Test the shards are contiguous document ranges covering the whole index."""
+        self.assertEqual(len(self.shards.doc_ranges), 3)
+        self.assertEqual(self.shards.doc_ranges[0][0], 0)
+        self.assertEqual(self.shards.doc_ranges[-1][1], self.index.num_docs)
+        for (_, high), (low, _) in zip(self.shards.doc_ranges, self.shards.doc_ranges[1:]):
+            self.assertEqual(high, low)
+
+    def test_matches_single_process_scoring(self):
+        """Test the merged top k equals scoring the whole index with the shared weight mask."""
+        for term_ids in self.queries:
+            for k in (1, 5, 500):
+                doc_ids, scores = self.shards.top_k(term_ids, k)
+                expected_docs, expected_scores = self.index.top_k(term_ids, k, weight_mask=self.weight_mask)
+                np.testing.assert_array_equal(doc_ids, expected_docs)
+                np.testing.assert_array_equal(scores, expected_scores)
+
+    def test_batch(self):
+        """Test a batch returns the same results as single queries."""
+        results = self.shards.top_k_batch(self.queries, 5)
+
+        self.assertEqual(len(results), len(self.queries))
+        for term_ids, (doc_ids, scores) in zip(self.queries, results):
+            np.testing.assert_array_equal(doc_ids, self.shards.top_k(term_ids, 5)[0])
+        self.assertEqual(self.shards.top_k_batch([], 5), [])
+
+    def test_merge_breaks_ties_by_doc_id(self):
+        """Test equal scores from different shards are ordered by document ID."""
+        doc_ids, scores = merge_shard_results([
+            (np.array([7, 8]), np.array([2.0, 1.0], dtype=np.float32)),
+            (np.array([3, 4]), np.array([2.0, 0.5], dtype=np.float32)),
+        ], 3)
+
+        self.assertEqual(doc_ids.tolist(), [3, 7, 8])
+        self.assertEqual(scores.tolist(), [2.0, 2.0, 1.0])
+
+    def test_invalid_arguments(self):
+        """Test invalid shard counts and weight masks raise ValueError."""
+        with self.assertRaises(ValueError):
+            ShardedBM25(self.index, num_shards=0)
+        with self.assertRaises(ValueError):
+            ShardedBM25(self.index, num_shards=1, weight_mask=[1.0, 0.0])
+
+    def test_retriever(self):
+        """Test the retriever returns the same nodes as MmapBM25Retriever."""
+        retriever = ShardedBM25Retriever(self.index, similarity_top_k=4, num_shards=2)
+        try:
+            for query in ["word1 word2", "word5 word9 word9"]:
+                expected = MmapBM25Retriever(self.index, similarity_top_k=4).retrieve(query)
+                actual = retriever.retrieve(query)
+                self.assertEqual([node.node_id for node in actual], [node.node_id for node in expected])
+                self.assertEqual([node.score for node in actual], [node.score for node in expected])
+        finally:
+            retriever.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
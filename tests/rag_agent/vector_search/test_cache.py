@@ -0,0 +1,123 @@
+# tests/rag_agent/vector_search/test_cache.py
+
+import unittest
+from unittest.mock import patch
+from llama_index.core.schema import NodeWithScore, TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.cache import (
+    RetrievalCache,
+    bump_index_version,
+    get_index_version,
+    normalize_query,
+)
+
+
+class TestRetrievalCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a cache and a couple of nodes."""
+        self.cache = RetrievalCache(max_entries=2, ttl_seconds=60, max_bytes=None)
+        self.nodes = [
+            NodeWithScore(node=TextNode(text="Node 1 content", id_="node1"), score=0.9),
+            NodeWithScore(node=TextNode(text="Node 2 content", id_="node2"), score=0.4),
+        ]
+
+    def test_normalize_query(self):
+        """Test case and whitespace differences map to the same query."""
+        self.assertEqual(normalize_query("  How does  LLAMA 2\tuse RL? "), "how does llama 2 use rl?")
+
+    def test_put_and_get(self):
+        """Test a stored result is returned for a query that normalizes the same."""
+        self.cache.put(self.cache.make_key("What is RLHF?", "config"), self.nodes)
+
+        cached = self.cache.get(self.cache.make_key("what is  rlhf?", "config"))
+
+        self.assertEqual([node.node_id for node in cached], ["node1", "node2"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_returned_nodes_are_copies(self):
+        """Test callers changing scores do not change the cached entry."""
+        key = self.cache.make_key("query", "config")
+        self.cache.put(key, self.nodes)
+
+        self.cache.get(key)[0].score = -1.0
+        self.nodes[1].score = -1.0
+
+        cached = self.cache.get(key)
+        self.assertAlmostEqual(cached[0].score, 0.9)
+        self.assertAlmostEqual(cached[1].score, 0.4)
+
+    def test_config_is_part_of_key(self):
+        """Test a different retriever configuration misses."""
+        self.cache.put(self.cache.make_key("query", "config-a"), self.nodes)
+
+        self.assertIsNone(self.cache.get(self.cache.make_key("query", "config-b")))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_index_version_bump_invalidates(self):
+        """Test entries stored before an index version bump are not served."""
+        self.cache.put(self.cache.make_key("query", "config"), self.nodes)
+        version = get_index_version()
+
+        self.assertEqual(bump_index_version(), version + 1)
+
+        self.assertIsNone(self.cache.get(self.cache.make_key("query", "config")))
+
+    def test_put_after_version_change_is_dropped(self):
+        """Test a result computed against an older index version is not stored."""
+        key = self.cache.make_key("query", "config")
+        bump_index_version()
+
+        self.cache.put(key, self.nodes)
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when the cache is full."""
+        key_a = self.cache.make_key("a", "config")
+        key_b = self.cache.make_key("b", "config")
+        key_c = self.cache.make_key("c", "config")
+        self.cache.put(key_a, self.nodes)
+        self.cache.put(key_b, self.nodes)
+        self.cache.get(key_a)  # a becomes the most recently used entry
+
+        self.cache.put(key_c, self.nodes)
+
+        self.assertIsNotNone(self.cache.get(key_a))
+        self.assertIsNone(self.cache.get(key_b))
+        self.assertIsNotNone(self.cache.get(key_c))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    @patch('rag_agent.vector_search.cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """Test entries expire after the TTL."""
+        mock_monotonic.return_value = 100.0
+        key = self.cache.make_key("query", "config")
+        self.cache.put(key, self.nodes)
+
+        mock_monotonic.return_value = 159.0
+        self.assertIsNotNone(self.cache.get(key))
+        mock_monotonic.return_value = 161.0
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_memory_cap(self):
+        """Test entries are evicted to stay under the memory budget."""
+        cache = RetrievalCache(max_entries=100, ttl_seconds=None, max_bytes=1000)
+        cache.put(cache.make_key("a", "config"), self.nodes)
+        cache.put(cache.make_key("b", "config"), self.nodes)
+
+        self.assertEqual(len(cache), 1)
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+        self.assertIsNotNone(cache.get(cache.make_key("b", "config")))
+
+    def test_oversized_result_not_cached(self):
+        """Test a result larger than the whole budget is skipped."""
+        cache = RetrievalCache(max_bytes=10)
+        cache.put(cache.make_key("a", "config"), self.nodes)
+
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
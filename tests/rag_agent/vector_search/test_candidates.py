@@ -0,0 +1,80 @@
+# tests/rag_agent/vector_search/test_candidates.py
+
+import unittest
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.candidates import CandidateBatch, top_indices
+from rag_agent.vector_search.fusion import FusedNodeWithScore
+
+
+class TestTopIndices(unittest.TestCase):
+
+    def test_descending_with_stable_ties(self):
+        """Test the top indices come back best first and ties keep their order."""
+        scores = np.array([0.2, 0.9, 0.5, 0.9, 0.1])
+
+        self.assertEqual(top_indices(scores, 3).tolist(), [1, 3, 2])
+        self.assertEqual(top_indices(scores).tolist(), [1, 3, 2, 0, 4])
+        self.assertEqual(top_indices(scores, 10).tolist(), [1, 3, 2, 0, 4])
+        self.assertEqual(top_indices(scores, 0).tolist(), [])
+
+
+class TestCandidateBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.node1 = NodeWithScore(node=TextNode(text="Node 1 content", id_="node1"), score=0.8)
+        self.node2 = NodeWithScore(node=TextNode(text="Node 2 content", id_="node2"), score=None)
+        self.node3 = NodeWithScore(node=TextNode(text="Node 3 content", id_="node3"), score=0.9)
+        self.node1_duplicate = NodeWithScore(node=TextNode(text="Node 1 content", id_="node1"), score=0.5)
+        self.batch = CandidateBatch.from_branches(
+            ["vector", "bm25"], [[self.node1, self.node2], [self.node3, self.node1_duplicate, self.node1]]
+        )
+
+    def test_from_branches(self):
+        """Test unique nodes become rows with their raw branch scores and best ranks."""
+        self.assertEqual(len(self.batch), 3)
+        self.assertEqual(self.batch.ids.tolist(), ["node1", "node2", "node3"])
+        self.assertEqual(self.batch.texts, ["Node 1 content", "Node 2 content", "Node 3 content"])
+        np.testing.assert_array_equal(self.batch.branch_scores, [[0.8, 0.5], [np.nan, np.nan], [np.nan, 0.9]])
+        np.testing.assert_array_equal(self.batch.branch_ranks, [[0, 1], [1, -1], [-1, 0]])
+        self.assertTrue(np.isnan(self.batch.scores).all())
+        self.assertEqual(self.node1.score, 0.8)
+
+    def test_top_k_and_take(self):
+        """Test top_k keeps the best rows in order without changing the original batch."""
+        scored = self.batch.with_scores([0.3, 0.1, 0.7])
+
+        top = scored.top_k(2)
+
+        self.assertEqual(top.ids.tolist(), ["node3", "node1"])
+        self.assertEqual(top.texts, ["Node 3 content", "Node 1 content"])
+        np.testing.assert_array_equal(top.scores, [0.7, 0.3])
+        np.testing.assert_array_equal(top.branch_ranks, [[-1, 0], [0, 1]])
+        self.assertEqual(scored.ids.tolist(), ["node1", "node2", "node3"])
+        with self.assertRaises(ValueError):
+            self.batch.with_scores([1.0])
+
+    def test_to_nodes(self):
+        """Test rows convert to fresh FusedNodeWithScore objects with per-branch details."""
+        nodes = self.batch.with_scores([0.3, 0.1, 0.7]).to_nodes()
+
+        self.assertTrue(all(isinstance(node, FusedNodeWithScore) for node in nodes))
+        self.assertEqual([node.node_id for node in nodes], ["node1", "node2", "node3"])
+        self.assertAlmostEqual(nodes[0].score, 0.3)
+        self.assertEqual(nodes[0].branch_scores, {"vector": 0.8, "bm25": 0.5})
+        self.assertEqual(nodes[0].branch_ranks, {"vector": 0, "bm25": 1})
+        self.assertEqual(nodes[1].branch_scores, {"vector": None})
+        self.assertIs(nodes[0].node, self.node1.node)
+        self.assertIsNone(self.batch.to_nodes()[0].score)
+
+    def test_empty(self):
+        """Test a batch without nodes has no rows and converts to no nodes."""
+        batch = CandidateBatch.from_branches(["vector"], [[]])
+
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.top_k(5).to_nodes(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
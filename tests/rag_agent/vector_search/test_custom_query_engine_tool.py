@@ -1,10 +1,31 @@
 # tests/rag_agent/vector_search/test_custom_query_engine_tool.py
 
+import asyncio
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.llms import MockLLM
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore, TextNode
 from llama_index.core.tools import ToolOutput
 # Adjust import path based on your project structure
 from rag_agent.vector_search.custom_query_engine_tool import CustomQueryEngineTool
+from rag_agent.vector_search.hybrid_retriever import RetrievalUpdate
+from rag_agent.vector_search.metrics import RetrievalMetrics
+
+
+class _NestedRetriever(BaseRetriever):
+    """Retriever that delegates to an inner retriever, as a HybridRetriever branch does."""
+
+    def __init__(self, inner=None):
+        super().__init__()
+        self.inner = inner
+
+    def _retrieve(self, query_bundle):
+        if self.inner is not None:
+            return self.inner.retrieve(query_bundle)
+        return [NodeWithScore(node=TextNode(text="Paris is the capital of France."), score=1.0)]
+
 
 class TestCustomQueryEngineTool(unittest.TestCase):
 
@@ -60,6 +81,47 @@ class TestCustomQueryEngineTool(unittest.TestCase):
         self.assertIsNone(result.raw_output)
 
 
+    def test_call_records_metrics(self):
+        """Test the query engine latency and failures are recorded."""
+        self.tool.metrics = RetrievalMetrics()
+        self.tool._get_query_str.return_value = "test query"
+
+        self.tool.call("test query")
+        self.mock_query_engine.query.side_effect = Exception("Query Failed")
+        self.tool.call("test query")
+
+        snapshot = self.tool.metrics.snapshot()
+        self.assertEqual(snapshot["latency_seconds"]["query"]["count"], 2)
+        self.assertEqual(snapshot["counters"], {"query_errors": 1})
+
+
+    def test_call_times_retrieval_and_synthesis(self):
+        """Test the public query path is kept and its callback events time retrieval and synthesis."""
+        engine = RetrieverQueryEngine.from_args(_NestedRetriever(inner=_NestedRetriever()), llm=MockLLM())
+        tool = CustomQueryEngineTool(query_engine=engine, metadata=self.mock_metadata, metrics=RetrievalMetrics())
+
+        with patch.object(engine, "query", wraps=engine.query) as query:
+            result = tool.call("test query")
+            tool.call("test query")
+
+        self.assertEqual(query.call_count, 2)
+        self.assertIsNotNone(result.raw_output)
+        latency = tool.metrics.snapshot()["latency_seconds"]
+        self.assertEqual({stage: latency[stage]["count"] for stage in latency}, {"query": 2, "retrieval": 2, "synthesis": 2})
+
+    def test_acall_times_retrieval_and_synthesis(self):
+        """Test the async call records the same stages through aquery."""
+        engine = RetrieverQueryEngine.from_args(_NestedRetriever(), llm=MockLLM())
+        tool = CustomQueryEngineTool(query_engine=engine, metadata=self.mock_metadata, metrics=RetrievalMetrics())
+
+        with patch.object(engine, "aquery", wraps=engine.aquery) as aquery:
+            result = asyncio.run(tool.acall("test query"))
+
+        aquery.assert_called_once_with("test query")
+        self.assertIsNotNone(result.raw_output)
+        latency = tool.metrics.snapshot()["latency_seconds"]
+        self.assertEqual({stage: latency[stage]["count"] for stage in latency}, {"query": 1, "retrieval": 1, "synthesis": 1})
+
     @patch('rag_agent.vector_search.custom_query_engine_tool.CustomQueryEngineTool.acall') # Patch acall if needed for mocking
     def test_acall_async_success(self, mock_acall_method):
         """Test asynchronous call when query engine succeeds."""
@@ -70,6 +132,37 @@ class TestCustomQueryEngineTool(unittest.TestCase):
         pass # Skipping detailed acall test in a standard unittest context
 
 
+    def test_astream_nodes_from_streaming_retriever(self):
+        """Test astream_nodes forwards the updates of a streaming retriever."""
+        self.tool._get_query_str.return_value = "test query"
+        updates = [RetrievalUpdate("bm25", ["provisional"], is_final=False), RetrievalUpdate("final", ["final"], is_final=True)]
+
+        async def astream(query):
+            for update in updates:
+                yield update
+
+        self.mock_query_engine.retriever.astream = astream
+
+        async def collect():
+            return [update async for update in self.tool.astream_nodes("test query")]
+
+        self.assertEqual(asyncio.run(collect()), updates)
+
+    def test_astream_nodes_from_plain_retriever(self):
+        """Test astream_nodes yields one final update for a retriever without astream."""
+        self.tool._get_query_str.return_value = "test query"
+        self.mock_query_engine.retriever = MagicMock(spec=["aretrieve"])
+        self.mock_query_engine.retriever.aretrieve = AsyncMock(return_value=["node"])
+
+        async def collect():
+            return [update async for update in self.tool.astream_nodes("test query")]
+
+        updates = asyncio.run(collect())
+
+        self.assertEqual([(u.stage, u.nodes, u.is_final) for u in updates], [("final", ["node"], True)])
+        self.mock_query_engine.retriever.aretrieve.assert_awaited_once_with("test query")
+
+
     def test_get_response_with_metadata_valid(self):
         """Test metadata formatting with valid metadata."""
         metadata = {
@@ -79,22 +172,15 @@ class TestCustomQueryEngineTool(unittest.TestCase):
             "_": {"irrelevant_field": "value"} # Irrelevant metadata
         }
         response_text = "This is the generated answer."
-        expected_output_start = f"{response_text}
-
-Source documents:
-"
+        expected_output_start = f"{response_text}\n\nSource documents:\n"
         # Expected to contain info for doc_a.txt and doc_b.txt, de-duplicated by file_name
         expected_output_contains = [
-            "  Document name: doc_a.txt
-  Document link: http://example.com/doc_a",
-            "  Document name: doc_b.txt
-  Document link: http://example.com/doc_b"
+            "  Document name: doc_a.txt\n  Document link: http://example.com/doc_a",
+            "  Document name: doc_b.txt\n  Document link: http://example.com/doc_b"
         ]
 
-        # Temporarily disable the mock get_response_with_metadata
-        original_method = self.tool.get_response_with_metadata
+        # Drop the instance mock from setUp so the real method runs
         del self.tool.get_response_with_metadata
-        self.tool.get_response_with_metadata = original_method
 
         formatted_response = self.tool.get_response_with_metadata(response_text, metadata)
 
@@ -109,16 +195,10 @@ Source documents:
         """Test metadata formatting with no metadata."""
         response_text = "This is the generated answer."
         metadata = None
-        expected_output = f"{response_text}
+        expected_output = f"{response_text}\n\nSource documents:\n  No relevant documents found.\n"
 
-Source documents:
-  No relevant documents found.
-"
-
-        # Temporarily disable the mock get_response_with_metadata
-        original_method = self.tool.get_response_with_metadata
+        # Drop the instance mock from setUp so the real method runs
         del self.tool.get_response_with_metadata
-        self.tool.get_response_with_metadata = original_method
 
         formatted_response = self.tool.get_response_with_metadata(response_text, metadata)
         self.assertEqual(formatted_response, expected_output)
@@ -127,16 +207,10 @@ Source documents:
         """Test metadata formatting with empty metadata dictionary."""
         response_text = "This is the generated answer."
         metadata = {}
-        expected_output = f"{response_text}
-
-Source documents:
-  No relevant documents found.
-"
+        expected_output = f"{response_text}\n\nSource documents:\n  No relevant documents found.\n"
 
-        # Temporarily disable the mock get_response_with_metadata
-        original_method = self.tool.get_response_with_metadata
+        # Drop the instance mock from setUp so the real method runs
         del self.tool.get_response_with_metadata
-        self.tool.get_response_with_metadata = original_method
 
         formatted_response = self.tool.get_response_with_metadata(response_text, metadata)
         self.assertEqual(formatted_response, expected_output)
@@ -6,6 +6,7 @@ import os
 from typing import List
 from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Document
 # Adjust import path based on your project structure
+from rag_agent.vector_search.cache import get_index_version
 from rag_agent.vector_search.document_loader import DocumentLoader
 
 class TestDocumentLoader(unittest.TestCase):
@@ -95,6 +96,19 @@ class TestDocumentLoader(unittest.TestCase):
         )
         self.assertEqual(index, mock_index)
 
+    @patch('rag_agent.vector_search.document_loader.VectorStoreIndex')
+    def test_create_index_bumps_index_version(self, MockVectorStoreIndex):
+        """Test a successful ingest bumps the index version, a skipped one does not."""
+        version = get_index_version()
+
+        self.loader.create_index(documents=[MagicMock(spec=Document)], vector_store=MagicMock())
+        self.assertEqual(get_index_version(), version + 1)
+
+        self.loader.create_index(documents=[], vector_store=MagicMock())
+        MockVectorStoreIndex.from_documents.side_effect = Exception("Qdrant unavailable")
+        self.loader.create_index(documents=[MagicMock(spec=Document)], vector_store=MagicMock())
+        self.assertEqual(get_index_version(), version + 1)
+
     @patch('rag_agent.vector_search.document_loader.DocumentLoader.load_documents')
     def test_create_index_no_documents(self, mock_load_documents):
         """Test creating index with no documents."""
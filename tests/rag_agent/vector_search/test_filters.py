@@ -0,0 +1,124 @@
+# tests/rag_agent/vector_search/test_filters.py
+
+import unittest
+from datetime import date
+from llama_index.core.schema import TextNode
+from llama_index.retrievers.bm25 import BM25Retriever
+from qdrant_client.http import models as rest
+# Adjust import path based on your project structure
+from rag_agent.vector_search.filters import (
+    BM25FilterIndex,
+    Match,
+    MatchAny,
+    Range,
+    RetrievalFilter,
+    combine_qdrant_filters,
+)
+
+
+class TestRetrievalFilter(unittest.TestCase):
+
+    def test_conditions(self):
+        """Test match, match-any and range conditions against metadata."""
+        metadata = {"file_name": "a.txt", "tenant": "acme", "pages": 12, "creation_date": "2024-05-01"}
+
+        self.assertTrue(Match("tenant", "acme").matches(metadata))
+        self.assertFalse(Match("tenant", "other").matches(metadata))
+        self.assertTrue(MatchAny("file_name", ["a.txt", "b.txt"]).matches(metadata))
+        self.assertTrue(Range("pages", gte=10, lt=20).matches(metadata))
+        self.assertFalse(Range("pages", gt=12).matches(metadata))
+        self.assertTrue(Range("creation_date", gte=date(2024, 1, 1)).matches(metadata))
+        self.assertFalse(Range("creation_date", lt=date(2024, 1, 1)).matches(metadata))
+        self.assertFalse(Range("missing", gte=1).matches(metadata))
+
+    def test_invalid_filters(self):
+        """Test empty filters and unbounded ranges are rejected."""
+        with self.assertRaises(ValueError):
+            RetrievalFilter()
+        with self.assertRaises(ValueError):
+            Range("pages")
+
+    def test_must_not(self):
+        """Test must_not conditions exclude matching metadata."""
+        retrieval_filter = RetrievalFilter(must=[Match("tenant", "acme")], must_not=[Match("file_name", "a.txt")])
+
+        self.assertFalse(retrieval_filter.matches({"tenant": "acme", "file_name": "a.txt"}))
+        self.assertTrue(retrieval_filter.matches({"tenant": "acme", "file_name": "b.txt"}))
+
+    def test_to_qdrant(self):
+        """Test the filter compiles into the equivalent Qdrant payload filter."""
+        retrieval_filter = RetrievalFilter(
+            must=[MatchAny("file_name", ["b.txt", "a.txt"]), Range("creation_date", gte=date(2024, 1, 1))],
+            must_not=[Match("tenant", "other")]
+        )
+
+        compiled = retrieval_filter.to_qdrant()
+
+        self.assertEqual(compiled.must[0], rest.FieldCondition(key="file_name", match=rest.MatchAny(any=["a.txt", "b.txt"])))
+        self.assertIsInstance(compiled.must[1].range, rest.DatetimeRange)
+        self.assertEqual(compiled.must_not[0].match, rest.MatchValue(value="other"))
+
+        existing = rest.Filter(must=[rest.FieldCondition(key="lang", match=rest.MatchValue(value="en"))])
+        self.assertEqual(combine_qdrant_filters(existing, retrieval_filter).must, [existing, compiled])
+
+    def test_cache_key_ignores_condition_order(self):
+        """Test equal filters built in a different order share a cache key."""
+        first = RetrievalFilter(must=[Match("tenant", "acme"), MatchAny("file_name", ["a", "b"])])
+        second = RetrievalFilter(must=[MatchAny("file_name", ["b", "a"]), Match("tenant", "acme")])
+
+        self.assertEqual(first.cache_key(), second.cache_key())
+
+
+class TestBM25FilterIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Build a small real BM25 index with tenant metadata."""
+        texts = [
+            "Investment opportunities in MENA region: tech startups are booming.",
+            "Real estate investment trends in the MENA region.",
+            "LLAMA 2 uses reinforcement learning from human feedback.",
+            "Reinforcement learning helps models produce human-like answers.",
+            "Investment in reinforcement learning research is growing.",
+        ]
+        self.nodes = [
+            TextNode(text=text, id_=f"node{i}", metadata={"tenant": "acme" if i % 2 == 0 else "other"})
+            for i, text in enumerate(texts)
+        ]
+        self.retriever = BM25Retriever.from_defaults(nodes=self.nodes, similarity_top_k=5)
+        self.index = BM25FilterIndex(self.retriever, max_filters=1)
+        self.filter = RetrievalFilter(must=[Match("tenant", "acme")])
+
+    def test_matches_post_filtered_retrieval(self):
+        """Test subset scoring returns the post-filtered full results with the same scores."""
+        for query in ["investment in MENA", "reinforcement learning", "human answers"]:
+            expected = [
+                node for node in self.retriever.retrieve(query)
+                if node.score > 0 and node.node.metadata["tenant"] == "acme"
+            ]
+
+            filtered = self.index.retrieve(query, self.filter, top_k=5)
+
+            self.assertEqual([n.node_id for n in filtered], [n.node_id for n in expected])
+            for node, expected_node in zip(filtered, expected):
+                self.assertAlmostEqual(node.score, expected_node.score, places=5)
+
+    def test_top_k_and_empty_subset(self):
+        """Test top_k is respected and a filter matching nothing returns no nodes."""
+        self.assertEqual(len(self.index.retrieve("investment learning", self.filter, top_k=1)), 1)
+        self.assertEqual(self.index.retrieve("investment", RetrievalFilter(must=[Match("tenant", "none")]), top_k=5), [])
+
+    def test_subsets_are_cached_and_evicted(self):
+        """Test a subset is computed once and the least recently used one is evicted."""
+        other = RetrievalFilter(must=[Match("tenant", "other")])
+
+        self.index.retrieve("investment", self.filter, top_k=5)
+        subset = self.index._subsets[self.filter.cache_key()]
+        self.index.retrieve("learning", self.filter, top_k=5)
+        self.assertIs(self.index._subsets[self.filter.cache_key()], subset)
+
+        self.index.retrieve("investment", other, top_k=5)
+        self.assertEqual(list(self.index._subsets), [other.cache_key()])
+
+
+if __name__ == '__main__':
+    unittest.main()
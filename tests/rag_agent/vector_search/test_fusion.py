@@ -0,0 +1,96 @@
+# tests/rag_agent/vector_search/test_fusion.py
+
+import unittest
+import numpy as np
+# Adjust import path based on your project structure
+from rag_agent.vector_search.fusion import (
+    DistributionBasedFusion,
+    MinMaxFusion,
+    ReciprocalRankFusion,
+    ZScoreFusion,
+    get_fusion_strategy,
+)
+
+
+class TestFusionStrategies(unittest.TestCase):
+
+    def setUp(self):
+        """Three candidates: the first found by both branches, the others by one each."""
+        nan = np.nan
+        self.scores = np.array([
+            [0.9, 12.0],
+            [0.5, nan],
+            [nan, 4.0],
+        ])
+        self.ranks = np.array([
+            [0, 0],
+            [1, -1],
+            [-1, 1],
+        ])
+        self.weights = [0.7, 0.3]
+
+    def test_rrf(self):
+        """Test reciprocal rank fusion ignores raw scores and sums 1 / (k + rank)."""
+        fused = ReciprocalRankFusion(k=60).fuse(self.scores, self.ranks, self.weights)
+
+        self.assertAlmostEqual(fused[0], 0.7 / 61 + 0.3 / 61)
+        self.assertAlmostEqual(fused[1], 0.7 / 62)
+        self.assertAlmostEqual(fused[2], 0.3 / 62)
+
+    def test_min_max(self):
+        """Test min-max scales every branch to [0, 1] and missing entries add nothing."""
+        fused = MinMaxFusion().fuse(self.scores, self.ranks, self.weights)
+
+        # Vector column: 0.9 -> 1.0, 0.5 -> 0.0; BM25 column: 12 -> 1.0, 4 -> 0.0
+        np.testing.assert_allclose(fused, [1.0, 0.0, 0.0])
+
+    def test_min_max_constant_branch(self):
+        """Test a branch with equal scores gives full credit instead of dividing by zero."""
+        scores = np.array([[1.0], [1.0]])
+        ranks = np.array([[0], [1]])
+
+        fused = MinMaxFusion().fuse(scores, ranks, [1.0])
+
+        np.testing.assert_allclose(fused, [1.0, 1.0])
+
+    def test_z_score(self):
+        """Test z-score standardizes every branch and ranks missing entries lowest."""
+        fused = ZScoreFusion().fuse(self.scores, self.ranks, self.weights)
+
+        # Each column has two values, so they standardize to +1 and -1
+        np.testing.assert_allclose(fused, [0.7 + 0.3, -0.7 - 0.3, -0.7 - 0.3])
+
+    def test_distribution_based(self):
+        """Test distribution-based fusion maps mean +/- 3 std onto [0, 1]."""
+        fused = DistributionBasedFusion().fuse(self.scores, self.ranks, self.weights)
+
+        # With two values per column, mean + std maps to 4/6 and mean - std to 2/6
+        np.testing.assert_allclose(fused, [4 / 6, 0.7 * 2 / 6, 0.3 * 2 / 6])
+
+    def test_missing_score_treated_as_weakest_hit(self):
+        """Test a returned candidate without a score gets the branch minimum."""
+        scores = np.array([[3.0], [np.nan], [1.0]])
+        ranks = np.array([[0], [1], [2]])
+
+        fused = MinMaxFusion().fuse(scores, ranks, [1.0])
+
+        np.testing.assert_allclose(fused, [1.0, 0.0, 0.0])
+
+    def test_empty(self):
+        """Test fusing no candidates returns an empty array."""
+        fused = ReciprocalRankFusion().fuse(np.empty((0, 2)), np.empty((0, 2)), self.weights)
+
+        self.assertEqual(fused.shape, (0,))
+
+    def test_get_fusion_strategy(self):
+        """Test strategies resolve by name and instances pass through."""
+        self.assertIsInstance(get_fusion_strategy("rrf"), ReciprocalRankFusion)
+        self.assertIsInstance(get_fusion_strategy("dbsf"), DistributionBasedFusion)
+        strategy = MinMaxFusion()
+        self.assertIs(get_fusion_strategy(strategy), strategy)
+        with self.assertRaisesRegex(ValueError, "Unknown fusion strategy"):
+            get_fusion_strategy("unknown")
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,86 @@
+# tests/rag_agent/vector_search/test_hedging.py
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+# Adjust import path based on your project structure
+from rag_agent.vector_search.hedging import HedgePolicy
+
+
+class TestHedgePolicy(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a thread pool for the attempts."""
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=False)
+
+    def warm_up(self, policy, seconds=0.01):
+        for _ in range(policy.min_samples):
+            policy._latency.record(seconds)
+
+    def test_invalid_quantile(self):
+        """Test the quantile must be in (0, 1]."""
+        with self.assertRaises(ValueError):
+            HedgePolicy(quantile=0.0)
+
+    def test_no_hedge_before_min_samples(self):
+        """Test a cold policy never hedges."""
+        policy = HedgePolicy(min_samples=5)
+
+        self.assertIsNone(policy.delay())
+        self.assertEqual(policy.submit(self.executor, lambda: "result").result(timeout=5), "result")
+        self.assertEqual(policy.stats()["hedges_sent"], 0)
+
+    def test_hedge_wins_over_stuck_attempt(self):
+        """Test a slow first attempt is overtaken by the hedged duplicate."""
+        policy = HedgePolicy(min_samples=5, min_delay=0.0)
+        self.warm_up(policy)
+        release = threading.Event()
+        attempts = []
+
+        def call():
+            attempts.append(len(attempts))
+            if attempts[-1] == 0:
+                release.wait(timeout=5)
+                return "slow"
+            return "hedged"
+
+        result = policy.submit(self.executor, call).result(timeout=5)
+        release.set()
+
+        self.assertEqual(result, "hedged")
+        stats = policy.stats()
+        self.assertEqual((stats["calls"], stats["hedges_sent"], stats["hedges_won"]), (1, 1, 1))
+
+    def test_error_waits_for_other_attempt(self):
+        """Test a failed attempt does not fail the call while the other one may succeed."""
+        policy = HedgePolicy(min_samples=5, min_delay=0.0)
+        self.warm_up(policy)
+        release = threading.Event()
+        attempts = []
+
+        def call():
+            attempts.append(len(attempts))
+            if attempts[-1] == 0:
+                release.wait(timeout=5)
+                raise RuntimeError("first attempt failed")
+            release.set()
+            return "hedged"
+
+        self.assertEqual(policy.submit(self.executor, call).result(timeout=5), "hedged")
+
+    def test_error_without_hedge(self):
+        """Test the error of the only attempt is raised."""
+        policy = HedgePolicy()
+
+        def call():
+            raise RuntimeError("failed")
+
+        with self.assertRaises(RuntimeError):
+            policy.submit(self.executor, call).result(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
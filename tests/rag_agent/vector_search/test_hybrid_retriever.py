@@ -1,16 +1,67 @@
 # tests/rag_agent/vector_search/test_hybrid_retriever.py
 
+import asyncio
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from unittest.mock import MagicMock, patch
-from typing import List
+from typing import List, Optional
 from llama_index.core.retrievers import VectorIndexRetriever # Need the actual type for spec
 from llama_index.retrievers.bm25 import BM25Retriever # Need the actual type for spec
-from llama_index.core.schema import NodeWithScore, TextNode # Need actual types
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode # Need actual types
+from llama_index.core.vector_stores.types import ExactMatchFilter, MetadataFilters, VectorStoreQuery, VectorStoreQueryResult
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
 # Adjust import path based on your project structure
-from rag_agent.vector_search.hybrid_retriever import HybridRetriever
+from rag_agent.vector_search.adaptive_depth import AdaptiveDepth
+from rag_agent.vector_search.cache import RetrievalCache, bump_index_version
+from rag_agent.vector_search.candidates import CandidateBatch
+from rag_agent.vector_search.filters import Match, RetrievalFilter
+from rag_agent.vector_search.fusion import FusedNodeWithScore
+from rag_agent.vector_search.hedging import HedgePolicy
+from rag_agent.vector_search.hybrid_retriever import DEGRADED_METADATA_KEY, HybridRetriever
+from rag_agent.vector_search.metrics import RetrievalMetrics
+from rag_agent.vector_search.query_router import QueryRouter
+from rag_agent.vector_search.score_cache import PairScoreCache
+from rag_agent.vector_search.semantic_cache import SemanticCache
+from rag_agent.vector_search.model_registry import default_registry
 from rag_agent.vector_search.reranker import Reranker # Need the actual type for spec
 
 
+class DepthRecordingRetriever:
+    """A stand-in retriever returning the top `similarity_top_k` of a fixed ranking."""
+
+    def __init__(self, ranking: List[NodeWithScore], calls: List[int], similarity_top_k: int = 10):
+        self.ranking = ranking
+        self.calls = calls
+        self.similarity_top_k = similarity_top_k
+
+    def retrieve(self, query):
+        self.calls.append(self.similarity_top_k)
+        return self.ranking[:self.similarity_top_k]
+
+
+class FilterRecordingRetriever:
+    """A stand-in Qdrant-backed vector retriever recording the filters of every call."""
+
+    def __init__(self, results: List[NodeWithScore], calls: List[dict], filters: Optional[MetadataFilters] = None):
+        self._vector_store = QdrantVectorStore(collection_name="test", client=QdrantClient(":memory:"))
+        self._kwargs = {}
+        self._filters = filters
+        self.results = results
+        self.calls = calls
+
+    def _build_vector_store_query(self, query_bundle):
+        return VectorStoreQuery(query_str=query_bundle.query_str, filters=self._filters)
+
+    def retrieve(self, query):
+        self.calls.append(self._kwargs)
+        return self.results
+
+
 class TestHybridRetriever(unittest.TestCase):
 
     def setUp(self):
@@ -36,6 +87,14 @@ class TestHybridRetriever(unittest.TestCase):
         self.mock_reranked_results = [self.node3, self.node4, self.node1] # Example reranked order
 
         self.mock_reranker.rerank.return_value = self.mock_reranked_results
+        # The retriever hands the reranker columnar CandidateBatches; route them through the
+        # list API so the tests can inspect the candidates as nodes
+        self.mock_reranker.rerank_candidates.side_effect = lambda query, candidates, top_k: (
+            self.mock_reranker.rerank(query, candidates.to_nodes(), top_k=top_k)
+        )
+        self.mock_reranker.rerank_candidates_batch.side_effect = lambda queries, candidates, top_k: (
+            [batch.to_nodes()[:top_k] for batch in candidates]
+        )
 
         self.retriever = HybridRetriever(
             vector_retriever=self.mock_vector_retriever,
@@ -60,8 +119,7 @@ class TestHybridRetriever(unittest.TestCase):
         # Weighted: node1=0.8*0.7=0.56, node2=0.6*0.7=0.42
         #           node3=0.9*0.3=0.27, node4=0.7*0.3=0.21, node5_duplicate=0.5*0.3=0.15
 
-        # Since node1 (id_="node1") is in both, the one from bm25_results (last seen)
-        # might overwrite the score if using a dictionary for unique.
+        # node1 (id_="node1") is in both branches, so its weighted scores are summed.
         # Let's check the nodes passed to reranker - it should be unique nodes.
         combined_nodes_passed_to_reranker = self.mock_reranker.rerank.call_args[0][1] # Second argument to rerank
 
@@ -74,11 +132,13 @@ class TestHybridRetriever(unittest.TestCase):
         self.assertIn("node4", node_ids_passed_to_reranker)
         # Check the scores passed to reranker - scores should have weights applied
         # We can't assert the exact list order passed to rerank, but we can check if the scores are correct
-        # for the unique nodes. The score for node1 passed to reranker should be the weighted score
-        # from the LAST appearance in the combined list (bm25_results in this case).
+        # for the unique nodes. The score for node1 passed to reranker should keep the weighted
+        # vector score and add the weighted score of its BM25 duplicate.
         found_node1_in_combined = next((n for n in combined_nodes_passed_to_reranker if n.node_id == "node1"), None)
         self.assertIsNotNone(found_node1_in_combined)
-        self.assertAlmostEqual(found_node1_in_combined.score, 0.15) # Weighted score from node5_duplicate
+        self.assertAlmostEqual(found_node1_in_combined.score, 0.56 + 0.15)
+        self.assertEqual(found_node1_in_combined.branch_scores, {"vector": 0.8, "bm25": 0.5})
+        self.assertEqual(found_node1_in_combined.branch_ranks, {"vector": 0, "bm25": 2})
 
         # Check that the reranker was called with the correct query and combined nodes
         self.mock_reranker.rerank.assert_called_once()
@@ -92,6 +152,56 @@ class TestHybridRetriever(unittest.TestCase):
         self.assertEqual(retrieved_nodes, self.mock_reranked_results)
 
 
+    def test_retrieve_query_bundle_with_real_reranker(self):
+        """Test the public retrieve path hands the query text to a real Reranker and its score cache."""
+        model = MagicMock()
+        model.tokenizer = None
+        model.predict.side_effect = lambda pairs, batch_size: np.array([float(len(text)) for _, text in pairs])
+        reranker = Reranker(score_cache=PairScoreCache())
+        reranker.model = model
+        retriever = HybridRetriever(self.mock_vector_retriever, self.mock_bm25_retriever, reranker=reranker)
+
+        first = retriever.retrieve(QueryBundle("test query"))
+        second = retriever.retrieve(QueryBundle("test query"))
+
+        self.assertTrue(all(query == "test query" for query, _ in model.predict.call_args[0][0]))
+        # The second call is served from the pair score cache
+        model.predict.assert_called_once()
+        self.assertEqual([n.node_id for n in second], [n.node_id for n in first])
+
+    def test_merge_does_not_mutate_branch_results(self):
+        """Test the branch outputs keep their scores and the reranker gets fresh candidates."""
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: [
+            NodeWithScore(node=node.node, score=10.0) for node in nodes
+        ]
+        for fusion in (None, "rrf"):
+            retriever = HybridRetriever(
+                self.mock_vector_retriever, self.mock_bm25_retriever, reranker=self.mock_reranker, fusion=fusion
+            )
+
+            retriever._retrieve("test query")
+
+            candidate_nodes = self.mock_reranker.rerank.call_args[0][1]
+            branch_nodes = self.mock_vector_results + self.mock_bm25_results
+            self.assertFalse(any(candidate is node for candidate in candidate_nodes for node in branch_nodes))
+            self.assertEqual([n.score for n in self.mock_vector_results], [0.8, 0.6])
+            self.assertEqual([n.score for n in self.mock_bm25_results], [0.9, 0.7, 0.5])
+
+    def test_reranker_receives_candidate_batch(self):
+        """Test the reranker gets the budgeted candidates as one sorted columnar batch."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever, self.mock_bm25_retriever, reranker=self.mock_reranker, rerank_candidates=3
+        )
+
+        retriever._retrieve("test query")
+
+        candidates = self.mock_reranker.rerank_candidates.call_args[0][1]
+        self.assertIsInstance(candidates, CandidateBatch)
+        self.assertEqual(candidates.branch_names, ("vector", "bm25"))
+        self.assertEqual(candidates.ids.tolist(), ["node1", "node2", "node3"])
+        np.testing.assert_allclose(candidates.scores, [0.56 + 0.15, 0.42, 0.27])
+        self.assertEqual(candidates.texts, ["Node 1 content", "Node 2 content", "Node 3 content"])
+
     def test_retrieve_hybrid_empty_results(self):
         """Test _retrieve when underlying retrievers return empty lists."""
         self.mock_vector_retriever.retrieve.return_value = []
@@ -107,6 +217,709 @@ class TestHybridRetriever(unittest.TestCase):
         self.assertEqual(retrieved_nodes, [])
 
 
+    def test_retrieve_runs_branches_concurrently(self):
+        """Test that both retrievers are in flight at the same time."""
+        # Each branch waits for the other one; a sequential implementation would time out
+        barrier = threading.Barrier(2, timeout=5)
+
+        def vector_side_effect(query):
+            barrier.wait()
+            return self.mock_vector_results
+
+        def bm25_side_effect(query):
+            barrier.wait()
+            return self.mock_bm25_results
+
+        self.mock_vector_retriever.retrieve.side_effect = vector_side_effect
+        self.mock_bm25_retriever.retrieve.side_effect = bm25_side_effect
+
+        retrieved_nodes = self.retriever._retrieve("test query")
+
+        self.assertEqual(retrieved_nodes, self.mock_reranked_results)
+        self.assertFalse(barrier.broken)
+
+
+    def test_concurrent_queries_do_not_queue_on_the_branch_pool(self):
+        """Test concurrent queries run their branches in parallel instead of waiting for pool threads."""
+        def slow(results):
+            def retrieve(query):
+                time.sleep(0.1)
+                return results
+            return retrieve
+
+        self.mock_vector_retriever.retrieve.side_effect = slow(self.mock_vector_results)
+        self.mock_bm25_retriever.retrieve.side_effect = slow(self.mock_bm25_results)
+
+        with ThreadPoolExecutor(max_workers=8) as callers:
+            start = time.perf_counter()
+            results = list(callers.map(self.retriever._retrieve, [f"query {i}" for i in range(8)]))
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, [self.mock_reranked_results] * 8)
+        # Eight queries queued on a two-thread pool need four rounds of 0.1 s branches
+        self.assertLess(elapsed, 0.3)
+
+    def test_async_rerank_runs_off_the_branch_pool(self):
+        """Test the async path reranks outside the thread pool reserved for branch searches."""
+        rerank_threads = []
+
+        def rerank(query, nodes, top_k):
+            rerank_threads.append(threading.current_thread().name)
+            return nodes[:top_k]
+
+        self.mock_reranker.rerank.side_effect = rerank
+
+        asyncio.run(self.retriever.aretrieve("test query"))
+
+        self.assertEqual(len(rerank_threads), 1)
+        self.assertFalse(rerank_threads[0].startswith("hybrid-retriever"))
+
+
+    def test_aretrieve_hybrid(self):
+        """Test the async path gathers both branches and reranks the combined nodes."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def vector_side_effect(query):
+            barrier.wait()
+            return self.mock_vector_results
+
+        def bm25_side_effect(query):
+            barrier.wait()
+            return self.mock_bm25_results
+
+        self.mock_vector_retriever.retrieve.side_effect = vector_side_effect
+        self.mock_bm25_retriever.retrieve.side_effect = bm25_side_effect
+
+        query = "test query"
+        retrieved_nodes = asyncio.run(self.retriever._aretrieve(query))
+
+        self.mock_vector_retriever.retrieve.assert_called_once_with(query)
+        self.mock_bm25_retriever.retrieve.assert_called_once_with(query)
+        combined_nodes_passed_to_reranker = self.mock_reranker.rerank.call_args[0][1]
+        self.assertEqual(len(combined_nodes_passed_to_reranker), 4)
+        self.assertEqual(retrieved_nodes, self.mock_reranked_results)
+
+
+    def test_retrieve_with_fusion_strategy(self):
+        """Test a fusion strategy combines the scores of nodes found by both branches."""
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            vector_weight=0.5,
+            bm25_weight=0.5,
+            fusion="rrf"
+        )
+
+        retriever._retrieve("test query")
+
+        combined_nodes = self.mock_reranker.rerank.call_args[0][1]
+        self.assertEqual([node.node_id for node in combined_nodes], ["node1", "node3", "node2", "node4"])
+        # node1 is first in the vector results and third in the BM25 results
+        self.assertAlmostEqual(combined_nodes[0].score, 0.5 / 61 + 0.5 / 63)
+        self.assertAlmostEqual(combined_nodes[1].score, 0.5 / 61)
+
+
+    def test_retrieve_rerank_candidate_budget(self):
+        """Test only the strongest fused candidates reach the reranker."""
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            vector_weight=0.7,
+            bm25_weight=0.3,
+            rerank_candidates=2
+        )
+
+        retriever._retrieve("test query")
+
+        # Weighted: node1=0.56+0.15, node2=0.42, node3=0.27, node4=0.21
+        candidate_nodes = self.mock_reranker.rerank.call_args[0][1]
+        self.assertEqual([node.node_id for node in candidate_nodes], ["node1", "node2"])
+
+
+    def test_retrieve_min_fused_score(self):
+        """Test candidates below the fused-score cutoff are dropped before reranking."""
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            vector_weight=0.7,
+            bm25_weight=0.3,
+            min_fused_score=0.25
+        )
+
+        retriever._retrieve("test query")
+
+        candidate_nodes = self.mock_reranker.rerank.call_args[0][1]
+        self.assertEqual({node.node_id for node in candidate_nodes}, {"node1", "node2", "node3"})
+
+
+    def test_invalid_rerank_candidates(self):
+        """Test a non-positive candidate budget is rejected."""
+        with self.assertRaises(ValueError):
+            HybridRetriever(
+                vector_retriever=self.mock_vector_retriever,
+                bm25_retriever=self.mock_bm25_retriever,
+                reranker=self.mock_reranker,
+                rerank_candidates=0
+            )
+
+
+    @patch('rag_agent.vector_search.hybrid_retriever.bm25_retrieve_batch')
+    def test_retrieve_batch(self, mock_bm25_retrieve_batch):
+        """Test a batch is embedded, searched and reranked with one call per stage."""
+        queries = ["first query", "second query"]
+        mock_embed_model = MagicMock()
+        mock_embed_model.get_text_embedding_batch.return_value = [[0.1, 0.2], [0.3, 0.4]]
+        mock_vector_store = MagicMock(spec=QdrantVectorStore)
+        mock_vector_store.collection_name = "test_collection"
+        mock_vector_store.dense_vector_name = "text-dense"
+        mock_vector_store._build_query_filter.return_value = None
+        mock_vector_store.client.query_batch_points.return_value = [MagicMock(), MagicMock()]
+        mock_vector_store.parse_to_query_result.side_effect = [
+            VectorStoreQueryResult(nodes=[self.node1.node], similarities=[0.8], ids=["node1"]),
+            VectorStoreQueryResult(nodes=[self.node2.node], similarities=[0.6], ids=["node2"]),
+        ]
+        self.mock_vector_retriever._embed_model = mock_embed_model
+        self.mock_vector_retriever._vector_store = mock_vector_store
+        self.mock_vector_retriever._kwargs = {}
+        self.mock_vector_retriever._build_vector_store_query.return_value = MagicMock(similarity_top_k=10)
+        mock_bm25_retrieve_batch.return_value = [[self.node3], [self.node4]]
+        self.mock_reranker.rerank_candidates_batch.side_effect = None
+        self.mock_reranker.rerank_candidates_batch.return_value = [[self.node3], [self.node4]]
+
+        results = self.retriever.retrieve_batch(queries)
+
+        mock_embed_model.get_text_embedding_batch.assert_called_once_with(queries)
+        mock_vector_store.client.query_batch_points.assert_called_once()
+        requests = mock_vector_store.client.query_batch_points.call_args.kwargs["requests"]
+        self.assertEqual([request.query for request in requests], [[0.1, 0.2], [0.3, 0.4]])
+        mock_bm25_retrieve_batch.assert_called_once_with(self.mock_bm25_retriever, queries)
+        self.mock_vector_retriever.retrieve.assert_not_called()
+        self.mock_reranker.rerank.assert_not_called()
+
+        self.mock_reranker.rerank_candidates_batch.assert_called_once()
+        rerank_queries, rerank_candidates = self.mock_reranker.rerank_candidates_batch.call_args[0]
+        self.assertEqual(rerank_queries, queries)
+        self.assertEqual([{n.node_id for n in batch.to_nodes()} for batch in rerank_candidates],
+                         [{"node1", "node3"}, {"node2", "node4"}])
+        self.assertEqual(results, [[self.node3], [self.node4]])
+
+
+    def test_retrieve_batch_empty(self):
+        """Test an empty batch does no work."""
+        self.assertEqual(self.retriever.retrieve_batch([]), [])
+        self.mock_reranker.rerank_candidates_batch.assert_not_called()
+
+
+    def test_retrieve_served_from_cache(self):
+        """Test a repeated query skips both retrievers and the reranker."""
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache()
+        )
+
+        first = retriever._retrieve("What is RLHF?")
+        second = retriever._retrieve("what is   RLHF?")
+
+        self.mock_vector_retriever.retrieve.assert_called_once()
+        self.mock_bm25_retriever.retrieve.assert_called_once()
+        self.mock_reranker.rerank.assert_called_once()
+        self.assertEqual([n.node_id for n in second], [n.node_id for n in first])
+
+
+    def test_cache_hit_keeps_fused_nodes(self):
+        """Test a cache hit returns the same fused nodes, with their branch evidence, as the fresh result."""
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache()
+        )
+
+        fresh = retriever._retrieve("test query")
+        cached = retriever._retrieve("test query")
+
+        self.mock_reranker.rerank.assert_called_once()
+        self.assertTrue(all(isinstance(node, FusedNodeWithScore) for node in fresh))
+        self.assertEqual([type(node) for node in cached], [type(node) for node in fresh])
+        self.assertEqual(cached, fresh)
+        self.assertIsNot(cached[0], fresh[0])
+
+
+    def test_retrieve_cache_invalidated_by_index_version(self):
+        """Test an index version bump forces a fresh retrieval."""
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache()
+        )
+
+        retriever._retrieve("test query")
+        bump_index_version()
+        retriever._retrieve("test query")
+
+        self.assertEqual(self.mock_reranker.rerank.call_count, 2)
+
+
+    def test_retrieve_with_kwargs_bypasses_cache(self):
+        """Test calls with extra retriever arguments are not cached."""
+        cache = RetrievalCache()
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=cache
+        )
+
+        retriever._retrieve("test query", extra="value")
+
+        self.assertEqual(len(cache), 0)
+
+
+    def test_retrieve_served_from_semantic_cache(self):
+        """Test a paraphrased query with a close embedding skips the pipeline."""
+        mock_embed_model = MagicMock()
+        mock_embed_model.get_query_embedding.side_effect = [[1.0, 0.0], [0.99, 0.05]]
+        self.mock_vector_retriever._embed_model = mock_embed_model
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            semantic_cache=SemanticCache(similarity_threshold=0.95)
+        )
+
+        first = retriever._retrieve("How does LLAMA 2 use RL?")
+        second = retriever._retrieve("How does LLAMA 2 use reinforcement learning?")
+
+        # The vector branch receives the precomputed embedding instead of embedding again
+        vector_query = self.mock_vector_retriever.retrieve.call_args[0][0]
+        self.assertEqual(vector_query.embedding, [1.0, 0.0])
+        self.mock_vector_retriever.retrieve.assert_called_once()
+        self.mock_reranker.rerank.assert_called_once()
+        self.assertEqual([n.node_id for n in second], [n.node_id for n in first])
+        self.assertEqual(retriever.semantic_cache.stats()["hits"], 1)
+
+
+    def test_semantic_cache_hit_verification(self):
+        """Test a sampled semantic hit re-runs the pipeline and records a false hit."""
+        mock_embed_model = MagicMock()
+        mock_embed_model.get_query_embedding.side_effect = [[1.0, 0.0], [1.0, 0.0]]
+        self.mock_vector_retriever._embed_model = mock_embed_model
+        self.mock_reranker.rerank.side_effect = [[self.node1], [self.node2]]
+        retriever = HybridRetriever(
+            vector_retriever=self.mock_vector_retriever,
+            bm25_retriever=self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            semantic_cache=SemanticCache(verify_sample_rate=1.0)
+        )
+
+        retriever._retrieve("first")
+        second = retriever._retrieve("second")
+
+        self.assertEqual(self.mock_reranker.rerank.call_count, 2)
+        self.assertEqual([n.node_id for n in second], ["node2"])
+        stats = retriever.semantic_cache.stats()
+        self.assertEqual(stats["verified_hits"], 1)
+        self.assertEqual(stats["false_hits"], 1)
+
+    def test_adaptive_depth_stops_on_strong_pool(self):
+        """Test a strong shallow pool is not widened and the shared retrievers are untouched."""
+        vector_calls, bm25_calls = [], []
+        ranking = [self.node1, self.node2, self.node3, self.node4]
+        vector_retriever = DepthRecordingRetriever(ranking, vector_calls)
+        bm25_retriever = DepthRecordingRetriever(ranking, bm25_calls)
+        policy = AdaptiveDepth(depths=(2, 4), min_overlap=0.5, min_score_gap=0.0)
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker, adaptive_depth=policy)
+
+        retriever._retrieve("test query")
+
+        self.assertEqual(vector_calls, [2])
+        # BM25 scores every document anyway, so it is fetched at the deepest depth once
+        self.assertEqual(bm25_calls, [4])
+        self.assertEqual(vector_retriever.similarity_top_k, 10)
+        self.assertEqual(policy.stats()["depth_counts"], {2: 1})
+
+    def test_adaptive_depth_widens_weak_pool(self):
+        """Test disjoint shallow results trigger a deeper retrieval."""
+        vector_calls, bm25_calls = [], []
+        vector_retriever = DepthRecordingRetriever([self.node1, self.node2, self.node3, self.node4], vector_calls)
+        bm25_retriever = DepthRecordingRetriever([self.node3, self.node4, self.node1, self.node2], bm25_calls)
+        policy = AdaptiveDepth(depths=(2, 4), min_overlap=0.5, min_score_gap=0.0)
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker, adaptive_depth=policy)
+
+        asyncio.run(retriever.aretrieve("test query"))
+
+        self.assertEqual(vector_calls, [2, 4])
+        # BM25 is fetched once at the deepest depth and revealed a depth at a time
+        self.assertEqual(bm25_calls, [4])
+        self.assertEqual(policy.stats()["depth_counts"], {4: 1})
+
+    def test_adaptive_depth_widens_only_the_flat_branch(self):
+        """Test a flat BM25 branch is revealed deeper without searching the vector store again."""
+        vector_calls, bm25_calls = [], []
+        vector_retriever = DepthRecordingRetriever([self.node1, self.node2, self.node3, self.node4], vector_calls)
+        flat_bm25 = [NodeWithScore(node=node.node, score=1.0) for node in (self.node1, self.node2, self.node3, self.node4)]
+        bm25_retriever = DepthRecordingRetriever(flat_bm25, bm25_calls)
+        policy = AdaptiveDepth(depths=(2, 4), min_overlap=0.5, min_score_gap=0.1)
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker, adaptive_depth=policy)
+
+        retriever._retrieve("test query")
+
+        self.assertEqual(vector_calls, [2])
+        self.assertEqual(bm25_calls, [4])
+        self.assertEqual(policy.stats()["depth_counts"], {4: 1})
+        candidates = self.mock_reranker.rerank.call_args[0][1]
+        self.assertEqual({n.node_id for n in candidates}, {"node1", "node2", "node3", "node4"})
+
+    def test_adaptive_depth_embeds_the_query_once(self):
+        """Test a widened vector search reuses the embedding computed on the first pass."""
+        queries = []
+
+        class EmbeddingRetriever(DepthRecordingRetriever):
+            def retrieve(self, query):
+                queries.append(query)
+                if query.embedding is None:
+                    query.embedding = [float(len(queries))]
+                return super().retrieve(query)
+
+        vector_retriever = EmbeddingRetriever([self.node1, self.node2, self.node3, self.node4], [])
+        bm25_retriever = DepthRecordingRetriever([self.node3, self.node4, self.node1, self.node2], [])
+        policy = AdaptiveDepth(depths=(2, 4), min_overlap=0.5, min_score_gap=0.0)
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker, adaptive_depth=policy)
+
+        retriever._retrieve("test query")
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(queries[1].embedding, [1.0])
+
+    def test_adaptive_depth_cuts_reranked_output(self):
+        """Test the reranked list is cut at an elbow and reranked with the policy's top_k."""
+        calls = []
+        ranking = [self.node1, self.node2]
+        policy = AdaptiveDepth(depths=(2,), rerank_top_k=3)
+        self.mock_reranker.rerank.return_value = [
+            NodeWithScore(node=self.node3.node, score=9.0),
+            NodeWithScore(node=self.node4.node, score=8.8),
+            NodeWithScore(node=self.node1.node, score=-2.0),
+        ]
+        retriever = HybridRetriever(
+            DepthRecordingRetriever(ranking, calls),
+            DepthRecordingRetriever(ranking, calls),
+            reranker=self.mock_reranker,
+            adaptive_depth=policy
+        )
+
+        retrieved_nodes = retriever._retrieve("test query")
+
+        self.assertEqual(self.mock_reranker.rerank.call_args.kwargs["top_k"], 3)
+        self.assertEqual([n.node_id for n in retrieved_nodes], ["node3", "node4"])
+
+    def test_router_skips_vector_branch(self):
+        """Test an identifier query runs BM25 only and keeps the full weight on it."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            router=QueryRouter()
+        )
+
+        retriever._retrieve("ERR-404 config.yaml")
+
+        self.mock_vector_retriever.retrieve.assert_not_called()
+        self.mock_bm25_retriever.retrieve.assert_called_once_with("ERR-404 config.yaml")
+        reranked_input = self.mock_reranker.rerank.call_args.args[1]
+        self.assertEqual({n.node_id for n in reranked_input}, {"node1", "node3", "node4"})
+        # bm25_weight 0.3 is scaled up to the total weight 1.0
+        self.assertAlmostEqual(next(n.score for n in reranked_input if n.node_id == "node3"), 0.9)
+        self.assertEqual(retriever.router.stats()["route_counts"], {"bm25": 1})
+
+    def test_router_skips_bm25_branch_async(self):
+        """Test a long natural-language question runs the vector branch only."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            fusion="rrf",
+            router=QueryRouter(long_query_tokens=6)
+        )
+
+        asyncio.run(retriever.aretrieve("how can I make the answers of the agent longer"))
+
+        self.mock_bm25_retriever.retrieve.assert_not_called()
+        self.mock_vector_retriever.retrieve.assert_called_once()
+        reranked_input = self.mock_reranker.rerank.call_args.args[1]
+        self.assertEqual([n.node_id for n in reranked_input], ["node1", "node2"])
+
+    def test_retrieve_batch_routes_per_query(self):
+        """Test batch retrieval sends each query only to its routed branches."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            router=QueryRouter(long_query_tokens=6)
+        )
+        retriever._vector_retrieve_batch = MagicMock(return_value=[[self.node1]])
+        retriever._bm25_retrieve_batch = MagicMock(return_value=[[self.node3]])
+
+        results = retriever.retrieve_batch(["E1234", "how can I make the answers of the agent longer"])
+
+        retriever._bm25_retrieve_batch.assert_called_once_with(["E1234"])
+        retriever._vector_retrieve_batch.assert_called_once_with(["how can I make the answers of the agent longer"])
+        self.assertEqual([[n.node_id for n in nodes] for nodes in results], [["node3"], ["node1"]])
+
+    def test_retrieve_batch_skips_unrouted_branch(self):
+        """Test a branch no query of the batch was routed to is not called at all."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            router=QueryRouter()
+        )
+        retriever._vector_retrieve_batch = MagicMock(return_value=[])
+        retriever._bm25_retrieve_batch = MagicMock(return_value=[[self.node3], [self.node4]])
+
+        results = retriever.retrieve_batch(["E1234", "config.yaml"])
+
+        retriever._vector_retrieve_batch.assert_not_called()
+        self.assertEqual([[n.node_id for n in nodes] for nodes in results], [["node3"], ["node4"]])
+
+    def test_astream_yields_provisional_then_final(self):
+        """Test the first finished branch is yielded before the reranked results."""
+        vector_released = threading.Event()
+
+        def slow_vector_retrieve(query):
+            vector_released.wait(timeout=5)
+            return [self.node1, self.node2]
+
+        self.mock_vector_retriever.retrieve.side_effect = slow_vector_retrieve
+
+        async def collect():
+            updates = []
+            async for update in self.retriever.astream("test query"):
+                updates.append(update)
+                vector_released.set()
+            return updates
+
+        updates = asyncio.run(collect())
+
+        self.assertEqual([(u.stage, u.is_final) for u in updates], [("bm25", False), ("final", True)])
+        self.assertEqual([n.node_id for n in updates[0].nodes], ["node3", "node4", "node1"])
+        # Provisional nodes are copies, fusion does not rewrite their scores
+        self.assertEqual(updates[0].nodes[0].score, 0.9)
+        self.assertEqual(updates[1].nodes, self.mock_reranked_results)
+
+    def test_astream_cache_hit(self):
+        """Test a cached query yields a single final update."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache()
+        )
+        retriever._retrieve("test query")
+
+        async def collect():
+            return [update async for update in retriever.astream("test query")]
+
+        updates = asyncio.run(collect())
+
+        self.assertEqual([(u.stage, u.is_final) for u in updates], [("cache", True)])
+        self.assertEqual(self.mock_vector_retriever.retrieve.call_count, 1)
+
+    def test_retrieve_records_metrics(self):
+        """Test every stage latency, the candidate gauges and the cache counters are recorded."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache(),
+            metrics=RetrievalMetrics()
+        )
+
+        retriever._retrieve("test query")
+        retriever._retrieve("test query")
+
+        snapshot = retriever.metrics.snapshot()
+        self.assertEqual(
+            {stage: summary["count"] for stage, summary in snapshot["latency_seconds"].items()},
+            {"vector": 1, "bm25": 1, "fusion": 1, "rerank": 1}
+        )
+        self.assertEqual(snapshot["gauges"], {
+            "vector_results": 2, "bm25_results": 3, "fused_candidates": 4, "rerank_candidates": 4, "reranked_nodes": 3,
+        })
+        self.assertEqual(snapshot["counters"], {"cache_hits": 1, "cache_misses": 1})
+
+    def test_vector_deadline_falls_back_to_bm25(self):
+        """Test a late vector branch is dropped, flagged in the metadata and counted."""
+        vector_released = threading.Event()
+        self.mock_vector_retriever.retrieve.side_effect = lambda query: vector_released.wait(timeout=5) and []
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache(),
+            metrics=RetrievalMetrics(),
+            vector_deadline=0.05
+        )
+
+        try:
+            retrieved_nodes = retriever._retrieve("test query")
+        finally:
+            vector_released.set()
+
+        self.assertEqual({n.node_id for n in retrieved_nodes}, {"node1", "node3", "node4"})
+        for node in retrieved_nodes:
+            self.assertEqual(node.node.metadata[DEGRADED_METADATA_KEY], ["vector"])
+            self.assertIn(DEGRADED_METADATA_KEY, node.node.excluded_llm_metadata_keys)
+            # Flagged nodes keep the fused type and the branch evidence
+            self.assertIsInstance(node, FusedNodeWithScore)
+            self.assertEqual(set(node.branch_scores), {"bm25"})
+        # The shared retriever nodes are not flagged
+        self.assertNotIn(DEGRADED_METADATA_KEY, self.node3.node.metadata)
+        counters = retriever.metrics.snapshot()["counters"]
+        self.assertEqual(counters["vector_deadline_missed"], 1)
+        self.assertEqual(counters["degraded_responses"], 1)
+        self.assertEqual(len(retriever.cache), 0)
+
+    def test_bm25_deadline_async(self):
+        """Test a late BM25 branch is dropped on the async path."""
+        bm25_released = threading.Event()
+        self.mock_bm25_retriever.retrieve.side_effect = lambda query: bm25_released.wait(timeout=5) and []
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            bm25_deadline=0.05
+        )
+
+        try:
+            retrieved_nodes = asyncio.run(retriever.aretrieve("test query"))
+        finally:
+            bm25_released.set()
+
+        self.assertEqual([n.node_id for n in retrieved_nodes], ["node1", "node2"])
+        self.assertEqual(retrieved_nodes[0].node.metadata[DEGRADED_METADATA_KEY], ["bm25"])
+
+    def test_branches_within_deadline_are_not_degraded(self):
+        """Test fast branches produce an unflagged response."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            vector_deadline=5.0,
+            bm25_deadline=5.0
+        )
+
+        retrieved_nodes = retriever._retrieve("test query")
+
+        self.assertEqual(retrieved_nodes, self.mock_reranked_results)
+
+    def test_hedged_vector_search(self):
+        """Test a stuck vector search is answered by the hedged duplicate."""
+        policy = HedgePolicy(min_samples=1, min_delay=0.0)
+        policy._latency.record(0.01)
+        released = threading.Event()
+        calls = []
+
+        def vector_retrieve(query):
+            calls.append(query)
+            if len(calls) == 1:
+                released.wait(timeout=5)
+            return [self.node1, self.node2]
+
+        self.mock_vector_retriever.retrieve.side_effect = vector_retrieve
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            hedge=policy
+        )
+
+        try:
+            retriever._retrieve("test query")
+        finally:
+            released.set()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(policy.stats()["hedges_won"], 1)
+
+    def test_with_filters_pushes_filter_into_branches(self):
+        """Test a filter reaches Qdrant as a payload filter and BM25 as a document subset."""
+        nodes = [
+            TextNode(text="investment in MENA", id_="acme1", metadata={"tenant": "acme"}),
+            TextNode(text="investment trends", id_="other1", metadata={"tenant": "other"}),
+            TextNode(text="reinforcement learning", id_="acme2", metadata={"tenant": "acme"}),
+        ]
+        bm25_retriever = BM25Retriever.from_defaults(nodes=nodes, similarity_top_k=3)
+        calls = []
+        vector_retriever = FilterRecordingRetriever([self.node1], calls)
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker)
+        retrieval_filter = RetrievalFilter(must=[Match("tenant", "acme")])
+
+        retrieved_nodes = retriever.with_filters(retrieval_filter)._retrieve("investment")
+
+        self.assertEqual(calls, [{"qdrant_filters": retrieval_filter.to_qdrant()}])
+        self.assertEqual(vector_retriever._kwargs, {})
+        self.assertEqual({n.node_id for n in retrieved_nodes}, {"node1", "acme1"})
+        self.assertIsNone(retriever.filters)
+
+    def test_with_filters_keeps_the_retriever_metadata_filters(self):
+        """Test a RetrievalFilter is combined with the vector retriever's own MetadataFilters."""
+        calls = []
+        metadata_filters = MetadataFilters(filters=[ExactMatchFilter(key="lang", value="en")])
+        vector_retriever = FilterRecordingRetriever([self.node1], calls, filters=metadata_filters)
+        bm25_retriever = BM25Retriever.from_defaults(
+            nodes=[TextNode(text="investment in MENA", id_="acme1", metadata={"tenant": "acme"})], similarity_top_k=1
+        )
+        self.mock_reranker.rerank.side_effect = lambda query, nodes, top_k: nodes[:top_k]
+        retriever = HybridRetriever(vector_retriever, bm25_retriever, reranker=self.mock_reranker)
+        retrieval_filter = RetrievalFilter(must=[Match("tenant", "acme")])
+
+        retriever.with_filters(retrieval_filter)._retrieve("investment")
+
+        own_filter = vector_retriever._vector_store._build_query_filter(VectorStoreQuery(filters=metadata_filters))
+        self.assertEqual(calls, [{"qdrant_filters": rest.Filter(must=[own_filter, retrieval_filter.to_qdrant()])}])
+
+    def test_filter_is_part_of_cache_key(self):
+        """Test filtered and unfiltered calls do not share cache entries."""
+        retriever = HybridRetriever(
+            self.mock_vector_retriever,
+            self.mock_bm25_retriever,
+            reranker=self.mock_reranker,
+            cache=RetrievalCache()
+        )
+        filtered = retriever.with_filters(RetrievalFilter(must=[Match("file_name", "a.txt")]))
+
+        self.assertNotEqual(retriever._cache_key("q", {}), filtered._cache_key("q", {}))
+        self.assertEqual(filtered._cache_key("q", {}), filtered.with_filters(filtered.filters)._cache_key("q", {}))
+
+    def test_default_rerankers_share_a_lazily_loaded_model(self):
+        """Test constructing retrievers loads no model and their default rerankers share one."""
+        default_registry.clear()
+        with patch('rag_agent.vector_search.reranker.CrossEncoder') as MockCrossEncoder:
+            retrievers = [
+                HybridRetriever(vector_retriever=self.mock_vector_retriever, bm25_retriever=self.mock_bm25_retriever)
+                for _ in range(3)
+            ]
+            MockCrossEncoder.assert_not_called()
+
+            self.assertIs(retrievers[0].reranker.model, retrievers[2].reranker.model)
+            MockCrossEncoder.assert_called_once()
+        default_registry.clear()
+
     def test_retrieve_hybrid_reranker_none(self):
         """Test _retrieve when no reranker is provided (uses default)."""
         # Create a new retriever instance without a provided reranker
@@ -0,0 +1,80 @@
+# tests/rag_agent/vector_search/test_metrics.py
+
+import json
+import unittest
+# Adjust import path based on your project structure
+from rag_agent.vector_search.metrics import LatencyHistogram, RetrievalMetrics
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_invalid_arguments(self):
+        """Test the relative error and minimum value are validated."""
+        with self.assertRaises(ValueError):
+            LatencyHistogram(relative_error=0.0)
+        with self.assertRaises(ValueError):
+            LatencyHistogram(min_value=0.0)
+
+    def test_quantiles_within_relative_error(self):
+        """Test quantiles of 1..1000 ms are reported within the relative error."""
+        histogram = LatencyHistogram(relative_error=0.01)
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000.0)
+
+        for q, expected in [(0.5, 0.5), (0.9, 0.9), (0.99, 0.99)]:
+            self.assertAlmostEqual(histogram.quantile(q), expected, delta=expected * 0.01)
+        self.assertEqual(histogram.quantile(1.0), 1.0)
+        self.assertEqual(histogram.count, 1000)
+
+    def test_empty_snapshot(self):
+        """Test an empty histogram reports zeros."""
+        snapshot = LatencyHistogram().snapshot(quantiles=(0.5,))
+
+        self.assertEqual(snapshot, {"count": 0, "sum": 0.0, "min": 0.0, "max": 0.0, "p50": 0.0})
+
+
+class TestRetrievalMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up metrics with a few recorded values."""
+        self.metrics = RetrievalMetrics(quantiles=(0.5, 0.99))
+        self.metrics.observe("vector", 0.02)
+        self.metrics.observe("vector", 0.04)
+        self.metrics.observe("bm25", 0.001)
+        self.metrics.set_gauge("rerank_candidates", 12)
+        self.metrics.increment("cache_hits")
+        self.metrics.increment("cache_hits", 2)
+
+    def test_snapshot(self):
+        """Test the snapshot lists every stage, gauge and counter."""
+        snapshot = json.loads(self.metrics.to_json())
+
+        self.assertEqual(sorted(snapshot["latency_seconds"]), ["bm25", "vector"])
+        self.assertEqual(snapshot["latency_seconds"]["vector"]["count"], 2)
+        self.assertAlmostEqual(snapshot["latency_seconds"]["vector"]["p99"], 0.04, delta=0.0004)
+        self.assertEqual(snapshot["gauges"], {"rerank_candidates": 12})
+        self.assertEqual(snapshot["counters"], {"cache_hits": 3})
+
+    def test_time_records_on_error(self):
+        """Test the time context manager records the stage even if the block raises."""
+        with self.assertRaises(RuntimeError):
+            with self.metrics.time("rerank"):
+                raise RuntimeError("failed")
+
+        self.assertIsNotNone(self.metrics.quantile("rerank", 0.5))
+        self.assertIsNone(self.metrics.quantile("fusion", 0.5))
+
+    def test_to_prometheus(self):
+        """Test the Prometheus text format contains summaries, gauges and counters."""
+        text = self.metrics.to_prometheus()
+
+        self.assertIn("# TYPE rag_stage_latency_seconds summary", text)
+        self.assertIn('rag_stage_latency_seconds{stage="vector",quantile="0.99"}', text)
+        self.assertIn('rag_stage_latency_seconds_count{stage="vector"} 2', text)
+        self.assertIn('rag_gauge{name="rerank_candidates"} 12', text)
+        self.assertIn('rag_events_total{name="cache_hits"} 3', text)
+        self.assertTrue(text.endswith("\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# tests/rag_agent/vector_search/test_model_registry.py
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import torch
+# Adjust import path based on your project structure
+from rag_agent.vector_search.model_registry import ModelRegistry, model_nbytes
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.loads = []
+
+    def loader(self, name, delay=0.0):
+        def load():
+            self.loads.append(name)
+            time.sleep(delay)
+            return torch.nn.Linear(10, 4)
+        return load
+
+    def test_loads_once_on_first_use(self):
+        """Test a key is loaded on first get and the same object is returned afterwards."""
+        self.assertNotIn("a", self.registry)
+
+        model = self.registry.get("a", self.loader("a"))
+
+        self.assertIs(self.registry.get("a", self.loader("a")), model)
+        self.assertEqual(self.loads, ["a"])
+        self.assertIn("a", self.registry)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_concurrent_gets_share_one_load(self):
+        """Test threads asking for the same key wait for a single load."""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.registry.get("a", self.loader("a", delay=0.05))))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.loads, ["a"])
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_memory_usage_and_release(self):
+        """Test the weight memory is reported per model and released models are loaded again."""
+        self.registry.get("a", self.loader("a"))
+        self.registry.get("b", self.loader("b"))
+
+        # 10 x 4 weights and 4 biases in float32
+        self.assertEqual(self.registry.memory_usage(), {"a": 176, "b": 176})
+        stats = self.registry.stats()
+        self.assertEqual(stats["total_bytes"], 352)
+        self.assertEqual([model["key"] for model in stats["models"]], ["a", "b"])
+
+        self.assertTrue(self.registry.release("a"))
+        self.assertFalse(self.registry.release("a"))
+        self.registry.get("a", self.loader("a"))
+        self.assertEqual(self.loads, ["a", "b", "a"])
+        self.registry.clear()
+        self.assertEqual(len(self.registry), 0)
+
+    def test_release_and_clear_close_models(self):
+        """Test evicted models with a close method, like process pools, are closed."""
+        pools = {key: MagicMock() for key in ("a", "b", "c")}
+        for key, pool in pools.items():
+            self.registry.get(key, lambda pool=pool: pool)
+        self.registry.get("plain", self.loader("plain"))
+
+        self.registry.release("a")
+        pools["a"].close.assert_called_once_with()
+        pools["b"].close.assert_not_called()
+
+        self.registry.clear()
+        pools["a"].close.assert_called_once_with()
+        pools["b"].close.assert_called_once_with()
+        pools["c"].close.assert_called_once_with()
+        self.assertEqual(len(self.registry), 0)
+
+    def test_model_nbytes(self):
+        """Test models without parameters report nbytes or nothing."""
+        class Sized:
+            nbytes = 1234
+
+        self.assertEqual(model_nbytes(Sized()), 1234)
+        self.assertEqual(model_nbytes(object()), 0)
+        self.assertEqual(model_nbytes(torch.nn.Linear(2, 2, bias=False)), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# tests/rag_agent/vector_search/test_onnx_cross_encoder.py
+
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+# Adjust import path based on your project structure
+from rag_agent.vector_search.onnx_cross_encoder import (
+    EXPORT_INFO_FILENAME,
+    QUANTIZED_MODEL_FILENAME,
+    OnnxCrossEncoder,
+    default_export_path,
+    export_onnx,
+    score_deltas,
+)
+from rag_agent.vector_search.reranker import Reranker
+
+
+def build_tiny_cross_encoder(path):
+    """Saves a small randomly initialized BERT cross-encoder whose words are "w0", "w1", ..."""
+    os.makedirs(path)
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + [f"w{i}" for i in range(200)]))
+    BertTokenizerFast(vocab_file=vocab_file, model_max_length=128).save_pretrained(path)
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=205, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=128, num_labels=1,
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+class TestOnnxCrossEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.model_path = build_tiny_cross_encoder(os.path.join(cls.tmp_dir.name, "model"))
+        cls.onnx_path = os.path.join(cls.tmp_dir.name, "onnx")
+        rng = np.random.default_rng(0)
+        cls.pairs = [
+            [" ".join(f"w{i}" for i in rng.integers(0, 200, size=3)),
+             " ".join(f"w{i}" for i in rng.integers(0, 200, size=int(n)))]
+            for n in rng.integers(1, 60, size=20)
+        ]
+        cls.info = export_onnx(cls.model_path, cls.onnx_path, validation_pairs=cls.pairs)
+        cls.reference = CrossEncoder(cls.model_path).predict(cls.pairs)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_export_matches_pytorch(self):
+        """Test the full-precision ONNX model returns the CrossEncoder scores, activation included."""
+        scores = OnnxCrossEncoder(self.onnx_path).predict(self.pairs, batch_size=4)
+
+        self.assertEqual(scores.shape, (len(self.pairs),))
+        np.testing.assert_allclose(scores, self.reference, atol=1e-5)
+        self.assertTrue(os.path.exists(os.path.join(self.onnx_path, QUANTIZED_MODEL_FILENAME)))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["model", "onnx"])
+
+    def test_export_records_accuracy_deltas(self):
+        """Test export.json stores the deltas of both models against PyTorch."""
+        with open(os.path.join(self.onnx_path, EXPORT_INFO_FILENAME)) as f:
+            info = json.load(f)
+
+        self.assertEqual(info, self.info)
+        self.assertLess(info["fp32"]["max_abs_delta"], 1e-5)
+        self.assertGreater(info["int8"]["max_abs_delta"], 0.0)
+        self.assertGreater(info["int8"]["rank_correlation"], 0.5)
+
+    def test_score_deltas(self):
+        """Test the deltas and the rank correlation of two score lists."""
+        deltas = score_deltas([1.0, 2.0, 3.0], [1.5, 2.0, 2.75])
+
+        self.assertAlmostEqual(deltas["max_abs_delta"], 0.5)
+        self.assertAlmostEqual(deltas["mean_abs_delta"], 0.25)
+        self.assertAlmostEqual(deltas["rank_correlation"], 1.0)
+
+    def test_reranker_backends(self):
+        """Test the ONNX backends of Reranker reuse the export and rank like PyTorch."""
+        onnx_reranker = Reranker(self.model_path, backend="onnx", onnx_path=self.onnx_path, batch_size=8)
+        int8_reranker = Reranker(self.model_path, backend="onnx-int8", onnx_path=self.onnx_path, num_threads=1)
+
+        self.assertIsInstance(onnx_reranker.model, OnnxCrossEncoder)
+        self.assertTrue(int8_reranker.model.quantized)
+        np.testing.assert_allclose(onnx_reranker._predict(self.pairs), self.reference, atol=1e-5)
+        self.assertEqual(len(int8_reranker._predict(self.pairs)), len(self.pairs))
+        with self.assertRaises(ValueError):
+            Reranker(self.model_path, backend="tensorrt")
+
+    def test_default_export_path(self):
+        """Test model names map to one cache directory each."""
+        path = default_export_path("cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+        self.assertEqual(os.path.basename(path), "cross-encoder--ms-marco-MiniLM-L-6-v2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# tests/rag_agent/vector_search/test_pooled_cross_encoder.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from sentence_transformers import CrossEncoder
+# Adjust import path based on your project structure
+from rag_agent.vector_search.model_registry import ModelRegistry
+from rag_agent.vector_search.pooled_cross_encoder import ProcessPoolCrossEncoder
+from rag_agent.vector_search.reranker import Reranker
+from test_onnx_cross_encoder import build_tiny_cross_encoder
+
+
+class PidModel:
+    """A cross-encoder stand-in scoring a pair by the length of its passage and recording the worker."""
+    tokenizer = None
+
+    def predict(self, pairs, batch_size=32):
+        if any(text == "fail" for _, text in pairs):
+            raise ValueError("model failure")
+        return np.array([len(text) + os.getpid() * 1e-9 for _, text in pairs])
+
+
+class TestProcessPoolCrossEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ProcessPoolCrossEncoder(PidModel(), num_workers=2, min_pairs_per_worker=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_scores_come_back_in_order_from_several_chunks(self):
+        """Test texts travel through shared memory, including non-ASCII ones, and chunk scores are reassembled in order."""
+        texts = ["a", "ääää", "ccc", "日本語テキスト", "", "bb"]
+        pairs = [["запрос", text] for text in texts]
+        costs = np.array([len(query.encode("utf-8")) + len(text.encode("utf-8")) for query, text in pairs])
+        bounds = self.pool.chunk_bounds(costs)
+
+        scores = self.pool.predict(pairs)
+
+        # The call is split into one contiguous chunk per worker
+        self.assertEqual(len(bounds), 3)
+        np.testing.assert_array_equal(np.floor(scores), [len(text) for text in texts])
+        # Every score was computed in a worker, not in this process
+        pids = {round((score - np.floor(score)) * 1e9) for score in scores}
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(self.pool.predict([]).shape, (0,))
+
+    def test_chunks_balance_text_length(self):
+        """Test chunks are contiguous, cover every pair and hold similar amounts of text."""
+        bounds = self.pool.chunk_bounds(np.array([1, 1, 1, 1, 4, 4]))
+        np.testing.assert_array_equal(bounds, [0, 5, 6])
+        np.testing.assert_array_equal(self.pool.chunk_bounds(np.array([5, 5, 5])), [0, 3])
+
+    def test_worker_errors_are_raised(self):
+        """Test a failing chunk raises in the caller and the pool keeps working."""
+        with self.assertRaisesRegex(ValueError, "model failure"):
+            self.pool.predict([["q", "ok"], ["q", "ok"], ["q", "fail"], ["q", "ok"]])
+        self.assertEqual(np.floor(self.pool.predict([["q", "abc"]]))[0], 3)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            ProcessPoolCrossEncoder(PidModel(), num_workers=0)
+        with self.assertRaises(ValueError):
+            Reranker("test-model", backend="onnx", num_workers=2)
+        with self.assertRaises(ValueError):
+            Reranker("test-model", num_workers=0)
+
+
+class TestProcessPoolReranker(unittest.TestCase):
+
+    def test_matches_in_process_scores(self):
+        """Test a Reranker in process mode shares the weights with its workers and scores like the model itself."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = build_tiny_cross_encoder(os.path.join(tmp_dir, "model"))
+            rng = np.random.default_rng(0)
+            pairs = [
+                ["w1 w2", " ".join(f"w{i}" for i in rng.integers(0, 200, size=int(n)))]
+                for n in rng.integers(1, 60, size=24)
+            ]
+            reranker = Reranker(model_path, num_workers=2, registry=ModelRegistry())
+            # The workers were forked by the constructor, not by the first query
+            pool = reranker._model
+            try:
+                self.assertIsInstance(pool, ProcessPoolCrossEncoder)
+                self.assertIs(reranker.load(), pool)
+                self.assertTrue(all(p.is_shared() for p in pool.model.model.parameters()))
+
+                scores = reranker._predict(pairs)
+            finally:
+                pool.close()
+
+            np.testing.assert_allclose(scores, CrossEncoder(model_path).predict(pairs), atol=1e-6)
+            self.assertEqual(reranker.registry.stats()["total_bytes"], pool.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# tests/rag_agent/vector_search/test_qdrant_hybrid_retriever.py
+
+import unittest
+from unittest.mock import MagicMock
+from llama_index.core.schema import QueryBundle, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQueryResult
+from llama_index.vector_stores.qdrant import QdrantVectorStore # Need the actual type for spec
+from qdrant_client.http import models as rest
+# Adjust import path based on your project structure
+from rag_agent.vector_search.qdrant_hybrid_retriever import QdrantHybridRetriever
+from rag_agent.vector_search.reranker import Reranker # Need the actual type for spec
+
+
+class TestQdrantHybridRetriever(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock hybrid Qdrant store, embed model and reranker."""
+        self.mock_vector_store = MagicMock(spec=QdrantVectorStore)
+        self.mock_vector_store.enable_hybrid = True
+        self.mock_vector_store.collection_name = "test_collection"
+        self.mock_vector_store.dense_vector_name = "text-dense"
+        self.mock_vector_store.sparse_vector_name = "text-sparse"
+        self.mock_vector_store._sparse_query_fn = MagicMock(return_value=([[3, 7]], [[0.5, 1.2]]))
+        self.mock_vector_store._build_query_filter.return_value = None
+
+        self.node1 = TextNode(text="Node 1 content", id_="node1")
+        self.node2 = TextNode(text="Node 2 content", id_="node2")
+        self.mock_vector_store.parse_to_query_result.return_value = VectorStoreQueryResult(
+            nodes=[self.node1, self.node2], similarities=[0.5, 0.33], ids=["node1", "node2"]
+        )
+
+        self.mock_embed_model = MagicMock()
+        self.mock_embed_model.get_query_embedding.return_value = [0.1, 0.2]
+        self.mock_reranker = MagicMock(spec=Reranker)
+        self.mock_reranker.rerank.return_value = ["reranked"]
+
+        self.retriever = QdrantHybridRetriever(
+            vector_store=self.mock_vector_store,
+            embed_model=self.mock_embed_model,
+            reranker=self.mock_reranker,
+            similarity_top_k=10,
+            sparse_top_k=20
+        )
+
+    def test_single_round_trip(self):
+        """Test one query_points call carries both prefetches and server-side fusion."""
+        result = self.retriever._retrieve("test query")
+
+        self.mock_vector_store.client.query_points.assert_called_once()
+        kwargs = self.mock_vector_store.client.query_points.call_args.kwargs
+        self.assertEqual(kwargs["collection_name"], "test_collection")
+        self.assertEqual(kwargs["limit"], 10)
+        self.assertEqual(kwargs["query"], rest.FusionQuery(fusion=rest.Fusion.RRF))
+        dense, sparse = kwargs["prefetch"]
+        self.assertEqual(dense.using, "text-dense")
+        self.assertEqual(dense.query, [0.1, 0.2])
+        self.assertEqual(dense.limit, 10)
+        self.assertEqual(sparse.using, "text-sparse")
+        self.assertEqual(sparse.query, rest.SparseVector(indices=[3, 7], values=[0.5, 1.2]))
+        self.assertEqual(sparse.limit, 20)
+        self.mock_vector_store.client.query_batch_points.assert_not_called()
+
+        query, nodes = self.mock_reranker.rerank.call_args[0]
+        self.assertEqual(query, "test query")
+        self.assertEqual([node.node_id for node in nodes], ["node1", "node2"])
+        self.assertAlmostEqual(nodes[0].score, 0.5)
+        self.assertEqual(result, ["reranked"])
+
+    def test_precomputed_embedding_is_reused(self):
+        """Test a QueryBundle with an embedding is not embedded again."""
+        self.retriever._retrieve(QueryBundle(query_str="test query", embedding=[0.3, 0.4]))
+
+        self.mock_embed_model.get_query_embedding.assert_not_called()
+        dense, _ = self.mock_vector_store.client.query_points.call_args.kwargs["prefetch"]
+        self.assertEqual(dense.query, [0.3, 0.4])
+
+    def test_dbsf_fusion(self):
+        """Test distribution-based fusion can be selected."""
+        retriever = QdrantHybridRetriever(
+            vector_store=self.mock_vector_store,
+            embed_model=self.mock_embed_model,
+            reranker=self.mock_reranker,
+            fusion="dbsf"
+        )
+
+        retriever._retrieve("test query")
+
+        kwargs = self.mock_vector_store.client.query_points.call_args.kwargs
+        self.assertEqual(kwargs["query"], rest.FusionQuery(fusion=rest.Fusion.DBSF))
+
+    def test_requires_hybrid_store(self):
+        """Test a store without sparse vectors is rejected."""
+        self.mock_vector_store.enable_hybrid = False
+        with self.assertRaisesRegex(ValueError, "enable_hybrid=True"):
+            QdrantHybridRetriever(
+                vector_store=self.mock_vector_store,
+                embed_model=self.mock_embed_model,
+                reranker=self.mock_reranker
+            )
+
+    def test_unknown_fusion(self):
+        """Test an unsupported fusion name is rejected."""
+        with self.assertRaisesRegex(ValueError, "Unknown Qdrant fusion"):
+            QdrantHybridRetriever(
+                vector_store=self.mock_vector_store,
+                embed_model=self.mock_embed_model,
+                reranker=self.mock_reranker,
+                fusion="z_score"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,138 @@
+# tests/rag_agent/vector_search/test_query_router.py
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from unittest.mock import patch
+# Adjust import path based on your project structure
+from rag_agent.vector_search.query_router import (
+    BM25,
+    FEATURE_NAMES,
+    ROUTE_LABELS,
+    ROUTES,
+    VECTOR,
+    QueryRouter,
+    RouterModel,
+    is_identifier,
+    main,
+    query_features,
+)
+
+
+TRAINING_QUERIES = [
+    ("ERR-404 config.yaml", "bm25"),
+    ("E1234 in loader.py", "bm25"),
+    ("get_user_id KeyError", "bm25"),
+    ("0x7ff3 segfault", "bm25"),
+    ("how does the retriever combine scores", "vector"),
+    ("why are my answers so short", "vector"),
+    ("what is the difference between fusion strategies?", "vector"),
+    ("explain how the reranker works", "vector"),
+    ("qdrant timeout settings", "both"),
+    ("bm25 tokenizer stemming", "both"),
+    ("reranker batch size", "both"),
+    ("vector store collection name", "both"),
+]
+
+
+class TestQueryFeatures(unittest.TestCase):
+
+    def test_is_identifier(self):
+        """Test identifiers, error codes, numbers and file names are recognized."""
+        for token in ["ERR-404", "E1234", "0x7ff3", "1.2.3", "utils.py", "src/app", "get_user_id", "camelCase", "MAX_RETRIES", "Loader::load"]:
+            self.assertTrue(is_identifier(token), token)
+        for token in ["how", "retriever", "Qdrant", "?", "LLAMA", "RLHF", "HTTP"]:
+            self.assertFalse(is_identifier(token), token)
+
+    def test_query_features_shape(self):
+        """Test the feature vector has one value per feature name, also for empty queries."""
+        self.assertEqual(query_features("how does fusion work?").shape, (len(FEATURE_NAMES),))
+        self.assertFalse(query_features("   ").any())
+
+
+class TestRouterModel(unittest.TestCase):
+
+    def test_fit_separates_labels(self):
+        """Test a trained model prefers the training label for clear examples."""
+        queries, labels = zip(*TRAINING_QUERIES)
+        model = RouterModel().fit(queries, labels, epochs=2000)
+
+        self.assertEqual(ROUTE_LABELS[int(np.argmax(model.predict_proba("ERR-500 app.log")))], "bm25")
+        self.assertEqual(ROUTE_LABELS[int(np.argmax(model.predict_proba("how do I tune the answers?")))], "vector")
+        self.assertAlmostEqual(float(model.predict_proba("anything").sum()), 1.0)
+
+    def test_fit_rejects_unknown_labels(self):
+        """Test unknown labels and mismatched lengths raise ValueError."""
+        with self.assertRaises(ValueError):
+            RouterModel().fit(["a query"], ["sparse"])
+        with self.assertRaises(ValueError):
+            RouterModel().fit(["a query", "another"], ["both"])
+
+    def test_save_and_load(self):
+        """Test a saved model loads with the same predictions."""
+        queries, labels = zip(*TRAINING_QUERIES)
+        model = RouterModel().fit(queries, labels, epochs=50)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "router.npz")
+            model.save(path)
+            loaded = RouterModel.load(path)
+
+        np.testing.assert_allclose(loaded.predict_proba("config.yaml"), model.predict_proba("config.yaml"))
+
+    def test_pretrained_routes_clear_queries(self):
+        """Test the pretrained model is fitted, confident on clear queries and not shared between callers."""
+        model = RouterModel.pretrained()
+        router = QueryRouter(model=model, use_rules=False)
+
+        self.assertEqual(router.route("ERR-500 app.log"), ROUTES["bm25"])
+        self.assertEqual(router.route("how does RLHF change what the agent answers?"), ROUTES["vector"])
+        model.weights[:] = 0.0
+        self.assertTrue(RouterModel.pretrained().weights.any())
+
+    def test_training_entry_point(self):
+        """Test the command line trains on labeled files plus the seed queries and saves the weights."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            labeled = os.path.join(tmp_dir, "labeled.jsonl")
+            with open(labeled, "w", encoding="utf-8") as file:
+                for query, label in TRAINING_QUERIES:
+                    file.write(json.dumps({"query": query, "label": label}) + "\n")
+            out = os.path.join(tmp_dir, "router.npz")
+            with patch.object(sys, "argv", ["query_router", labeled, "--out", out, "--epochs", "200"]):
+                main()
+            model = RouterModel.load(out)
+
+        self.assertEqual(ROUTE_LABELS[int(np.argmax(model.predict_proba("E1234 in loader.py")))], "bm25")
+
+
+class TestQueryRouter(unittest.TestCase):
+
+    def test_rules(self):
+        """Test identifier-only queries go to BM25 and long questions to the vector branch."""
+        router = QueryRouter(long_query_tokens=6)
+
+        self.assertEqual(router.route("ERR-404 config.yaml"), ROUTES["bm25"])
+        self.assertEqual(router.route("how can I make the answers of the agent longer"), ROUTES["vector"])
+        self.assertEqual(router.route("qdrant timeout"), ROUTES["both"])
+        self.assertEqual(router.stats(), {
+            "route_counts": {"bm25": 1, "vector": 1, "both": 1},
+            "source_counts": {"rule": 2, "default": 1},
+        })
+
+    def test_model_needs_confidence(self):
+        """Test the model only skips a branch when it is confident enough."""
+        model = RouterModel()
+        model.bias = np.array([0.0, 0.0, 5.0])  # Strongly prefers "bm25"
+        confident = QueryRouter(model=model, min_confidence=0.9, use_rules=False)
+        unsure = QueryRouter(model=model, min_confidence=0.999, use_rules=False)
+
+        self.assertEqual(confident.route("qdrant timeout"), frozenset({BM25}))
+        self.assertEqual(unsure.route("qdrant timeout"), frozenset({VECTOR, BM25}))
+        self.assertEqual(confident.stats()["source_counts"], {"model": 1})
+        self.assertEqual(unsure.stats()["source_counts"], {"default": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
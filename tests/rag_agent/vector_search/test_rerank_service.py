@@ -0,0 +1,183 @@
+# tests/rag_agent/vector_search/test_rerank_service.py
+
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from typing import List
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.model_registry import ModelRegistry
+from rag_agent.vector_search.rerank_service import MicroBatcher, RerankClient, RerankServer, remote_reranker
+from rag_agent.vector_search.reranker import Reranker
+
+
+class LengthModel:
+    """A cross-encoder stand-in scoring a pair by the length of its passage."""
+    tokenizer = None
+
+    def __init__(self):
+        self.calls: List[int] = []
+
+    def predict(self, pairs, batch_size=32):
+        if any(text == "fail" for _, text in pairs):
+            raise ValueError("model failure")
+        self.calls.append(len(pairs))
+        return np.array([float(len(text)) for _, text in pairs], dtype=np.float32)
+
+
+def _score_in_child(socket_path, texts, conn):
+    conn.send(RerankClient(socket_path).predict([["q", text] for text in texts]).tolist())
+    conn.close()
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test requests arriving within the wait window are scored in one call and split back."""
+        model = LengthModel()
+        batcher = MicroBatcher(lambda pairs: model.predict(pairs), max_batch_pairs=100, max_wait_ms=500)
+        barrier = threading.Barrier(4)
+        results = {}
+
+        def request(i):
+            barrier.wait()
+            results[i] = batcher.predict([["q", "x" * (i + 1)]] * (i + 1))
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        for i in range(4):
+            np.testing.assert_array_equal(results[i], [float(i + 1)] * (i + 1))
+        self.assertEqual(model.calls, [10])
+        self.assertEqual(batcher.stats()["mean_requests_per_batch"], 4.0)
+
+    def test_max_batch_pairs_closes_a_batch(self):
+        """Test a batch is closed before it exceeds max_batch_pairs and the request opens the next one."""
+        model = LengthModel()
+        batcher = MicroBatcher(lambda pairs: model.predict(pairs), max_batch_pairs=4, max_wait_ms=200)
+        futures = [batcher.submit([["q", "ab"]] * 3) for _ in range(3)]
+        big = batcher.submit([["q", "abc"]] * 6)
+        self.assertEqual(batcher.predict([]).shape, (0,))
+
+        for future in futures:
+            np.testing.assert_array_equal(future.result(), [2.0, 2.0, 2.0])
+        np.testing.assert_array_equal(big.result(), [3.0] * 6)
+        batcher.close()
+        self.assertEqual(model.calls, [3, 3, 3, 6])
+        with self.assertRaises(RuntimeError):
+            batcher.submit([["q", "a"]])
+
+    def test_errors_reach_every_request_of_the_batch(self):
+        """Test a model failure is raised to every request of the batch, and later batches still run."""
+        model = LengthModel()
+        batcher = MicroBatcher(lambda pairs: model.predict(pairs), max_wait_ms=200)
+        failing = batcher.submit([["q", "fail"]])
+        other = batcher.submit([["q", "ok"]])
+
+        for future in (failing, other):
+            with self.assertRaises(ValueError):
+                future.result()
+        np.testing.assert_array_equal(batcher.predict([["q", "ok"]]), [2.0])
+        batcher.close()
+
+
+class TestRerankServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, "rerank.sock")
+        self.model = LengthModel()
+        reranker = Reranker("test-model", registry=ModelRegistry())
+        reranker.model = self.model
+        self.server = RerankServer(reranker, self.socket_path, max_wait_ms=50).start()
+
+    def tearDown(self):
+        self.server.close()
+        self.tmp_dir.cleanup()
+
+    def test_remote_reranker(self):
+        """Test a client Reranker scores through the server and ranks like a local one."""
+        reranker = remote_reranker(self.socket_path)
+        nodes = [NodeWithScore(node=TextNode(text=text, id_=text)) for text in ["bb", "dddd", "a", "ccc"]]
+
+        reranked = reranker.rerank("query", nodes, top_k=2)
+
+        self.assertEqual([node.node_id for node in reranked], ["dddd", "ccc"])
+        self.assertEqual([node.score for node in reranked], [4.0, 3.0])
+        self.assertEqual(self.model.calls, [4])
+        reranker.model.close()
+
+    def test_errors_are_raised_by_the_client(self):
+        """Test a failure on the server becomes a RuntimeError in the client, and the connection stays usable."""
+        client = RerankClient(self.socket_path)
+        with self.assertRaisesRegex(RuntimeError, "model failure"):
+            client.predict([["q", "fail"]])
+        np.testing.assert_array_equal(client.predict([["q", "ok"]]), [2.0])
+        client.close()
+
+    def test_timeouts_are_not_retried(self):
+        """Test a timed-out request raises without a second attempt and drops its connection."""
+        silent_path = os.path.join(self.tmp_dir.name, "silent.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(silent_path)
+        listener.listen(4)
+        client = RerankClient(silent_path, timeout=0.1)
+        try:
+            with self.assertRaises(socket.timeout):
+                client.predict([["q", "ok"]])
+            self.assertIsNone(client._local.sock)
+            # Only the first attempt connected
+            listener.settimeout(0.1)
+            listener.accept()[0].close()
+            with self.assertRaises(socket.timeout):
+                listener.accept()
+        finally:
+            listener.close()
+
+    def test_reconnects_after_a_dropped_connection(self):
+        """Test a connection closed by the server side is retried once on a fresh one."""
+        client = RerankClient(self.socket_path)
+        np.testing.assert_array_equal(client.predict([["q", "ok"]]), [2.0])
+        stale = client._local.sock
+        roundtrip = client._roundtrip
+        attempts = []
+
+        def drop_first(payload):
+            attempts.append(payload)
+            if len(attempts) == 1:
+                raise ConnectionResetError("connection reset by peer")
+            return roundtrip(payload)
+
+        client._roundtrip = drop_first
+        np.testing.assert_array_equal(client.predict([["q", "abc"]]), [3.0])
+        self.assertEqual(len(attempts), 2)
+        self.assertIsNot(client._local.sock, stale)
+        client.close()
+
+    def test_worker_processes_share_the_server(self):
+        """Test several processes are served by the one model of the server."""
+        context = multiprocessing.get_context("fork")
+        children = []
+        for texts in (["a", "bb"], ["ccc"], ["dddd", "e", "ff"]):
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(target=_score_in_child, args=(self.socket_path, texts, child_conn))
+            process.start()
+            children.append((process, parent_conn, texts))
+
+        for process, conn, texts in children:
+            self.assertEqual(conn.recv(), [float(len(text)) for text in texts])
+            process.join()
+        self.assertEqual(sum(self.model.calls), 6)
+        self.assertEqual(self.server.batcher.stats()["requests"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
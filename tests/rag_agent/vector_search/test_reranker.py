@@ -1,25 +1,57 @@
 # tests/rag_agent/vector_search/test_reranker.py
 
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 from typing import List
 from llama_index.core.schema import NodeWithScore, TextNode
 # Adjust import path based on your project structure
+from rag_agent.vector_search.candidates import CandidateBatch
+from rag_agent.vector_search.model_registry import ModelRegistry, default_registry
 from rag_agent.vector_search.reranker import Reranker
+from rag_agent.vector_search.score_cache import PairScoreCache
 # Need the actual type for spec and sometimes for instantiation if not fully mocked
 from sentence_transformers import CrossEncoder
+from transformers import BertTokenizerFast
 
 class TestReranker(unittest.TestCase):
 
+    def setUp(self):
+        # Models are shared process-wide; a mock loaded by one test must not leak into the next
+        default_registry.clear()
+
+    def tearDown(self):
+        default_registry.clear()
+
     @patch('rag_agent.vector_search.reranker.CrossEncoder')
     def test_reranker_init(self, MockCrossEncoder):
         """Test Reranker initialization."""
         model_name = "test-model"
         reranker = Reranker(model_name)
 
-        MockCrossEncoder.assert_called_once_with(model_name)
+        # The model is loaded on first use, not by the constructor
+        MockCrossEncoder.assert_not_called()
         self.assertEqual(reranker.model, MockCrossEncoder.return_value)
         self.assertIsNotNone(reranker.model) # Ensure model attribute is set
+        MockCrossEncoder.assert_called_once_with(model_name)
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_rerankers_share_one_model(self, MockCrossEncoder):
+        """Test rerankers of the same model share one instance and other models load separately."""
+        first = Reranker("test-model", batch_size=8)
+        second = Reranker("test-model", batch_size=64)
+        other = Reranker("other-model")
+
+        self.assertIs(first.load(), second.model)
+        self.assertIsNot(other.model, None)
+        self.assertEqual(MockCrossEncoder.call_count, 2)
+        self.assertIn(("torch", "test-model", None, None, None), default_registry)
+
+        isolated = Reranker("test-model", registry=ModelRegistry())
+        isolated.load()
+        self.assertEqual(MockCrossEncoder.call_count, 3)
 
 
     @patch('rag_agent.vector_search.reranker.CrossEncoder')
@@ -56,7 +88,7 @@ class TestReranker(unittest.TestCase):
             [query, node3.text],
             [query, node4.text],
         ]
-        mock_cross_encoder_instance.predict.assert_called_once_with(expected_pairs)
+        mock_cross_encoder_instance.predict.assert_called_once_with(expected_pairs, batch_size=32)
 
         # Check that the nodes' scores were updated
         self.assertAlmostEqual(node1.score, 0.9)
@@ -136,5 +168,137 @@ class TestReranker(unittest.TestCase):
         self.assertIsNone(reranked_nodes[2].score) # Still None
 
 
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_rerank_candidates(self, MockCrossEncoder):
+        """Test a candidate batch is scored from its texts and only the top rows become nodes."""
+        mock_cross_encoder_instance = MockCrossEncoder.return_value
+        mock_cross_encoder_instance.predict.return_value = [0.2, None, 0.7, 0.5]
+        nodes = [NodeWithScore(node=TextNode(text=f"Node {i}", id_=f"node{i}"), score=0.1 * i) for i in range(4)]
+        candidates = CandidateBatch.from_branches(["vector"], [nodes])
+
+        reranker = Reranker()
+        reranker.model = mock_cross_encoder_instance
+
+        reranked = reranker.rerank_candidates("test query", candidates, top_k=3)
+
+        mock_cross_encoder_instance.predict.assert_called_once_with(
+            [["test query", f"Node {i}"] for i in range(4)], batch_size=32
+        )
+        self.assertEqual([node.node_id for node in reranked], ["node2", "node3", "node0"])
+        self.assertAlmostEqual(reranked[0].score, 0.7)
+        self.assertEqual(reranked[0].branch_ranks, {"vector": 2})
+        # The branch nodes keep their scores
+        self.assertEqual([node.score for node in nodes], [0.0, 0.1, 0.2, 0.1 * 3])
+        self.assertEqual(reranker.rerank_candidates("test query", CandidateBatch.from_branches(["vector"], [[]])), [])
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_rerank_candidates_batch(self, MockCrossEncoder):
+        """Test the candidate batches of many queries are scored in one predict call."""
+        mock_cross_encoder_instance = MockCrossEncoder.return_value
+        mock_cross_encoder_instance.predict.return_value = [0.1, 0.9, 0.4, 0.8, 0.2]
+        nodes_a = [NodeWithScore(node=TextNode(text=f"A{i}", id_=f"a{i}"), score=0.0) for i in range(2)]
+        nodes_b = [NodeWithScore(node=TextNode(text=f"B{i}", id_=f"b{i}"), score=0.0) for i in range(3)]
+        empty = CandidateBatch.from_branches(["bm25"], [[]])
+
+        reranker = Reranker()
+        reranker.model = mock_cross_encoder_instance
+
+        reranked = reranker.rerank_candidates_batch(
+            ["qa", "qc", "qb"],
+            [CandidateBatch.from_branches(["bm25"], [nodes_a]), empty, CandidateBatch.from_branches(["bm25"], [nodes_b])],
+            top_k=2
+        )
+
+        mock_cross_encoder_instance.predict.assert_called_once_with([
+            ["qa", "A0"], ["qa", "A1"],
+            ["qb", "B0"], ["qb", "B1"], ["qb", "B2"],
+        ], batch_size=32)
+        self.assertEqual([[n.node.text for n in nodes] for nodes in reranked], [["A1", "A0"], [], ["B1", "B0"]])
+        self.assertAlmostEqual(reranked[2][0].score, 0.8)
+        # The branch nodes keep their scores
+        self.assertEqual([node.score for node in nodes_a + nodes_b], [0.0] * 5)
+        with self.assertRaises(ValueError):
+            reranker.rerank_candidates_batch(["qa"], [])
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_rerank_candidates_batch_empty(self, MockCrossEncoder):
+        """Test a batch without candidates skips the model."""
+        mock_cross_encoder_instance = MockCrossEncoder.return_value
+        reranker = Reranker()
+        reranker.model = mock_cross_encoder_instance
+        empty = CandidateBatch.from_branches(["bm25"], [[]])
+
+        reranked = reranker.rerank_candidates_batch(["qa", "qb"], [empty, empty])
+
+        mock_cross_encoder_instance.predict.assert_not_called()
+        self.assertEqual(reranked, [[], []])
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_pairs_are_sorted_by_length(self, MockCrossEncoder):
+        """Test pairs reach the model sorted by length and the scores come back in input order."""
+        mock_cross_encoder_instance = MockCrossEncoder.return_value
+        mock_cross_encoder_instance.tokenizer = None
+        # The mock score of a pair is the length of its passage
+        mock_cross_encoder_instance.predict.side_effect = lambda pairs, batch_size: [float(len(text)) for _, text in pairs]
+        texts = ["a" * 30, "a" * 5, "a" * 50, "a" * 10]
+        nodes = [NodeWithScore(node=TextNode(text=text, id_=f"node{i}"), score=0.0) for i, text in enumerate(texts)]
+
+        reranker = Reranker(batch_size=2)
+        reranked = reranker.rerank("q", nodes, top_k=4)
+
+        mock_cross_encoder_instance.predict.assert_called_once_with(
+            [["q", "a" * 5], ["q", "a" * 10], ["q", "a" * 30], ["q", "a" * 50]], batch_size=2
+        )
+        self.assertEqual([node.score for node in nodes], [30.0, 5.0, 50.0, 10.0])
+        self.assertEqual([node.node_id for node in reranked], ["node2", "node0", "node3", "node1"])
+
+        reranker.sort_by_length = False
+        reranker.rerank("q", nodes, top_k=4)
+        mock_cross_encoder_instance.predict.assert_called_with([["q", text] for text in texts], batch_size=2)
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_pair_lengths_use_tokenizer(self, MockCrossEncoder):
+        """Test pair lengths are counted in tokens when the model has a Hugging Face tokenizer."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab_file = os.path.join(tmp_dir, "vocab.txt")
+            with open(vocab_file, "w") as f:
+                f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "short", "long", "word"]))
+            MockCrossEncoder.return_value.tokenizer = BertTokenizerFast(vocab_file=vocab_file)
+
+            reranker = Reranker()
+            lengths = reranker._pair_lengths([["short", "word word word"], ["long", "word"]])
+
+        # [CLS] query [SEP] passage [SEP]
+        self.assertEqual(lengths.tolist(), [7, 5])
+        with self.assertRaises(ValueError):
+            Reranker(batch_size=0)
+
+
+    @patch('rag_agent.vector_search.reranker.CrossEncoder')
+    def test_score_cache_sends_only_misses(self, MockCrossEncoder):
+        """Test cached pairs skip the model and the scores are merged back in input order."""
+        mock_cross_encoder_instance = MockCrossEncoder.return_value
+        mock_cross_encoder_instance.tokenizer = None
+        mock_cross_encoder_instance.predict.side_effect = lambda pairs, batch_size: [float(len(text)) for _, text in pairs]
+        reranker = Reranker(score_cache=PairScoreCache())
+
+        first = reranker._predict([["q", "aaa"], ["q", "a"]])
+        second = reranker._predict([["Q ", "bb"], ["q", "aaa"], ["q", "bb"], ["q", "a"]])
+
+        self.assertEqual(first.tolist(), [3.0, 1.0])
+        self.assertEqual(second.tolist(), [2.0, 3.0, 2.0, 1.0])
+        # The repeated new pair is scored once; the normalized query matches the cached one
+        self.assertEqual(mock_cross_encoder_instance.predict.call_args_list[-1][0][0], [["Q ", "bb"]])
+        self.assertEqual(reranker.score_cache.stats()["hits"], 2)
+
+        reranked = reranker.rerank("q", [NodeWithScore(node=TextNode(text="aaa")), NodeWithScore(node=TextNode(text="a"))])
+        self.assertEqual(mock_cross_encoder_instance.predict.call_count, 2)
+        self.assertEqual([node.score for node in reranked], [3.0, 1.0])
+
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
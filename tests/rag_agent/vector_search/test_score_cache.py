@@ -0,0 +1,107 @@
+# tests/rag_agent/vector_search/test_score_cache.py
+
+import os
+import tempfile
+import threading
+import unittest
+# Adjust import path based on your project structure
+from rag_agent.vector_search.score_cache import PairScoreCache
+
+
+class TestPairScoreCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.disk_path = os.path.join(self.tmp_dir.name, "scores", "pairs.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_keys_are_content_addressed(self):
+        """Test keys depend on the model, the normalized query and the passage only."""
+        key = PairScoreCache.make_key("torch:model", "What is  BM25?", "BM25 ranks documents")
+
+        self.assertEqual(len(key), 16)
+        self.assertEqual(key, PairScoreCache.make_key("torch:model", "what is bm25?", "BM25 ranks documents"))
+        self.assertNotEqual(key, PairScoreCache.make_key("onnx:model", "what is bm25?", "BM25 ranks documents"))
+        self.assertNotEqual(key, PairScoreCache.make_key("torch:model", "what is bm25?", "BM25 ranks documents."))
+        self.assertNotEqual(
+            PairScoreCache.make_key("m", "ab", "c"), PairScoreCache.make_key("m", "a", "bc")
+        )
+
+    def test_lru_eviction(self):
+        """Test the least recently used scores are evicted beyond max_entries."""
+        cache = PairScoreCache(max_entries=2)
+        cache.put_many([b"a", b"b"], [1.0, 2.0])
+        self.assertEqual(cache.get_many([b"a"]), [1.0])
+
+        cache.put_many([b"c"], [3.0])
+
+        self.assertEqual(cache.get_many([b"a", b"b", b"c"]), [1.0, None, 3.0])
+        self.assertEqual(cache.stats(), {"hits": 3, "disk_hits": 0, "misses": 1, "evictions": 1, "entries": 2})
+        with self.assertRaises(ValueError):
+            cache.put_many([b"a"], [])
+
+    def test_disk_tier(self):
+        """Test scores survive a restart on disk and disk hits are promoted to memory."""
+        cache = PairScoreCache(max_entries=1, disk_path=self.disk_path)
+        cache.put_many([b"a", b"b"], [1.0, 2.0])
+        cache.close()
+
+        reopened = PairScoreCache(max_entries=10, disk_path=self.disk_path)
+        self.assertEqual(reopened.get_many([b"a", b"b", b"x"]), [1.0, 2.0, None])
+        self.assertEqual(reopened.get_many([b"a"]), [1.0])
+
+        stats = reopened.stats()
+        self.assertEqual((stats["hits"], stats["disk_hits"], stats["misses"]), (1, 2, 1))
+        self.assertEqual(stats["disk_entries"], 2)
+        reopened.clear()
+        self.assertEqual(reopened.get_many([b"a"]), [None])
+        reopened.close()
+
+    def test_disk_tier_is_bounded(self):
+        """Test the least recently used rows are deleted beyond max_disk_entries."""
+        cache = PairScoreCache(max_entries=10, disk_path=self.disk_path, max_disk_entries=2)
+        cache.put_many([b"a", b"b"], [1.0, 2.0])
+        cache.put_many([b"c"], [3.0])
+
+        self.assertEqual(cache.stats()["disk_entries"], 2)
+        cache.close()
+
+    def test_disk_hits_count_as_recent_use(self):
+        """Test the deferred last use of a disk hit is written before rows are evicted."""
+        cache = PairScoreCache(max_entries=10, disk_path=self.disk_path, max_disk_entries=2)
+        cache.put_many([b"a"], [1.0])
+        cache.put_many([b"b"], [2.0])
+        cache.close()
+
+        reopened = PairScoreCache(max_entries=10, disk_path=self.disk_path, max_disk_entries=2)
+        self.assertEqual(reopened.get_many([b"a"]), [1.0])
+        reopened.put_many([b"c"], [3.0])
+        reopened.close()
+
+        fresh = PairScoreCache(max_entries=10, disk_path=self.disk_path)
+        self.assertEqual(fresh.get_many([b"a", b"b", b"c"]), [1.0, None, 3.0])
+        fresh.close()
+
+    def test_memory_hits_do_not_wait_for_disk(self):
+        """Test a memory hit is served while another lookup is blocked on the disk tier."""
+        cache = PairScoreCache(max_entries=10, disk_path=self.disk_path)
+        cache.put_many([b"a"], [1.0])
+        results = {}
+
+        with cache._disk_lock:
+            disk_lookup = threading.Thread(target=lambda: results.update(disk=cache.get_many([b"x"])))
+            disk_lookup.start()
+            memory_lookup = threading.Thread(target=lambda: results.update(memory=cache.get_many([b"a"])))
+            memory_lookup.start()
+            memory_lookup.join(timeout=5)
+            self.assertFalse(memory_lookup.is_alive())
+            self.assertEqual(results, {"memory": [1.0]})
+        disk_lookup.join(timeout=5)
+        self.assertEqual(results["disk"], [None])
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# tests/rag_agent/vector_search/test_semantic_cache.py
+
+import unittest
+from unittest.mock import patch
+from llama_index.core.schema import NodeWithScore, TextNode
+# Adjust import path based on your project structure
+from rag_agent.vector_search.cache import bump_index_version
+from rag_agent.vector_search.semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a cache and some nodes."""
+        self.cache = SemanticCache(similarity_threshold=0.9, max_entries=2)
+        self.nodes = [
+            NodeWithScore(node=TextNode(text="RLHF content", id_="node1"), score=0.9),
+            NodeWithScore(node=TextNode(text="LLAMA content", id_="node2"), score=0.5),
+        ]
+
+    def test_hit_for_similar_embedding(self):
+        """Test a query embedding within the threshold reuses the cached nodes."""
+        self.cache.add([1.0, 0.0, 0.0], "How does LLAMA 2 use RL?", "config", self.nodes)
+
+        cached = self.cache.lookup([0.98, 0.1, 0.0], "config")
+
+        self.assertEqual([node.node_id for node in cached], ["node1", "node2"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_miss_below_threshold(self):
+        """Test a dissimilar embedding misses."""
+        self.cache.add([1.0, 0.0, 0.0], "query", "config", self.nodes)
+
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0], "config"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_miss_for_other_config(self):
+        """Test results produced with another retriever configuration are not reused."""
+        self.cache.add([1.0, 0.0], "query", "config-a", self.nodes)
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0], "config-b"))
+
+    def test_best_match_wins(self):
+        """Test the most similar cached query is returned."""
+        other_nodes = [NodeWithScore(node=TextNode(text="Other", id_="node3"), score=0.1)]
+        self.cache.add([1.0, 0.2], "first", "config", self.nodes)
+        self.cache.add([1.0, 0.0], "second", "config", other_nodes)
+
+        cached = self.cache.lookup([1.0, 0.01], "config")
+
+        self.assertEqual([node.node_id for node in cached], ["node3"])
+
+    def test_lru_eviction(self):
+        """Test the least recently used query is evicted at capacity."""
+        self.cache.add([1.0, 0.0, 0.0], "a", "config", self.nodes)
+        self.cache.add([0.0, 1.0, 0.0], "b", "config", self.nodes)
+        self.cache.lookup([1.0, 0.0, 0.0], "config")
+
+        self.cache.add([0.0, 0.0, 1.0], "c", "config", self.nodes)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNotNone(self.cache.lookup([1.0, 0.0, 0.0], "config"))
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0], "config"))
+
+    def test_index_version_bump_invalidates(self):
+        """Test entries from before an ingest are not served."""
+        self.cache.add([1.0, 0.0], "query", "config", self.nodes)
+        bump_index_version()
+
+        self.assertIsNone(self.cache.lookup([1.0, 0.0], "config"))
+        self.assertEqual(len(self.cache), 0)
+
+    @patch('rag_agent.vector_search.semantic_cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """Test entries expire after the TTL."""
+        cache = SemanticCache(ttl_seconds=10)
+        mock_monotonic.return_value = 0.0
+        cache.add([1.0, 0.0], "query", "config", self.nodes)
+
+        mock_monotonic.return_value = 11.0
+        self.assertIsNone(cache.lookup([1.0, 0.0], "config"))
+
+    def test_verify_counts_false_hits(self):
+        """Test verified hits with little overlap are counted as false hits."""
+        fresh_same = [NodeWithScore(node=TextNode(text="x", id_="node1"), score=1.0),
+                      NodeWithScore(node=TextNode(text="y", id_="node2"), score=1.0)]
+        fresh_other = [NodeWithScore(node=TextNode(text="z", id_="node9"), score=1.0)]
+
+        self.assertTrue(self.cache.verify(self.nodes, fresh_same))
+        self.assertFalse(self.cache.verify(self.nodes, fresh_other))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["verified_hits"], 2)
+        self.assertEqual(stats["false_hits"], 1)
+        self.assertAlmostEqual(stats["false_hit_rate"], 0.5)
+
+    def test_should_verify(self):
+        """Test the verification sample rate."""
+        self.assertFalse(SemanticCache(verify_sample_rate=0.0).should_verify())
+        self.assertTrue(SemanticCache(verify_sample_rate=1.0).should_verify())
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)